@@ -1,6 +1,7 @@
-import os, re, sqlite3, secrets, json
-from flask import Flask, request, jsonify, render_template, send_from_directory
-from difflib import SequenceMatcher
+import os, re, sqlite3, json, base64, hashlib
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
+import db_pool, data_versions, nlp_engine, nlp_index, listing_query, telemetry, sessions, prompt_budget, resilience, geo, gazetteer, fts_search, media, facets, kb, kb_search
+from cache import LRUCache
 
 # --- dotenv & OpenAI are OPTIONAL now ---
 try:
@@ -8,29 +9,23 @@ try:
 except Exception:
     def load_dotenv(*args, **kwargs):  # no-op if dotenv not installed
         return None
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
-
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "") or os.getenv("OPENAI_API_KEY_1", "")
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
-client = OpenAI(api_key=OPENAI_API_KEY) if (OpenAI and OPENAI_API_KEY) else None
+import llm   # reads OPENAI_* after .env is loaded
 
 RELAX_ON_EMPTY = True     # show similar options if exact search is empty
 RELAX_ON_MISSING = True   # show broad results when only city OR type is missing
+PAGE_SIZE = int(os.getenv("REALTY_PAGE_SIZE", "6"))   # cards per search reply; "show more" pages on
 
 # ---------- app/DB ----------
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.getenv("REALTY_DB", os.path.join(APP_DIR, "db", "realty.db"))
 app = Flask(__name__, static_folder="static", template_folder="templates")
+POOL = db_pool.get_pool(DB_PATH)   # shared with db.py
+TELEMETRY = telemetry.writer(POOL)  # messages + msg_intents, written off the request thread
 
-def conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    return c
+def conn(readonly: bool = False):
+    """Pooled connection lease; use as `with conn() as cnx:` (commits on exit, never closes)."""
+    return POOL.connection(readonly=readonly)
 
 # ---------- schema bootstrap (creates only if missing) ----------
 def table_exists(cnx, name: str) -> bool:
@@ -70,9 +65,12 @@ def ensure_schema():
                   role TEXT NOT NULL,
                   content TEXT NOT NULL,
                   model TEXT,
+                  tokens INTEGER,
                   created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+        else:
+            ensure_column(cnx, "messages", "tokens INTEGER")   # prompt tokens behind an LLM reply
         # msg_intents (telemetry; tolerant superset schema)
         if not table_exists(cnx, "msg_intents"):
             cnx.execute("""
@@ -101,6 +99,23 @@ def ensure_schema():
                 "result_count INTEGER","notes TEXT","created_at DATETIME"
             ]:
                 ensure_column(cnx, "msg_intents", col)
+        # persisted session filters (sessions.SQLiteBackend) + the session -> open conversation lookup
+        if not table_exists(cnx, "conversation_state"):
+            cnx.execute("""
+                CREATE TABLE conversation_state (
+                  conversation_id INTEGER PRIMARY KEY REFERENCES conversations(conversation_id) ON DELETE CASCADE,
+                  pending_field TEXT,
+                  slots_json TEXT,
+                  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        cnx.execute("CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id, status, started_at)")
+        listing_query.ensure_indexes(cnx)
+        fts_search.ensure(cnx)   # property_fts_vocab: term list for prefix expansion
+        geo.ensure_schema(cnx)   # areas.latitude/longitude + built-in centroids
+        facets.ensure(cnx)       # listing_facets + triggers (filled on first run)
+        kb.ensure(cnx)           # kb_chunks/kb_fts with in-place-update triggers
+        data_versions.ensure(cnx)
 
         # leads table (used by /api/contact); create if missing
         if not table_exists(cnx, "leads"):
@@ -120,20 +135,12 @@ def ensure_schema():
             """)
 
 ensure_schema()
+KB_ROLLUPS = kb.scheduler(POOL).start()   # featured/city/type/investment KB rollups, off the request path
 
-# ---------- in-memory session filters ----------
-class SessionStore(dict):
-    def new(self):
-        sid = secrets.token_hex(8); self[sid] = {}; return sid
-    def get(self, sid, default=None): return super().get(sid, default or {})
-    def set(self, sid, val): self[sid] = val
-STORE = SessionStore()
+# ---------- session filters (see sessions.py) ----------
+STORE = sessions.make_store(POOL)
 
 # ---------- helpers ----------
-def _norm(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip().lower())
-def _similar(a,b): return SequenceMatcher(a=_norm(a), b=_norm(b)).ratio()
-
 CANON_TYPES = {
     "apartment": {"apt","apartment","condo","flat","apartments"},
     "house": {"house","home","villa","houses"},
@@ -143,22 +150,59 @@ CANON_TYPES = {
 }
 CANON_CITIES = {"colombo","colombo 5","galle","kandy","mount lavinia","dehiwala","borella","colombo 8"}
 
+def _build_vocab():
+    db_aliases = {"city": [], "property_type": []}
+    try:
+        with POOL.reader(row_factory=None) as cnx:
+            db_aliases = nlp_engine.load_db_aliases(cnx)
+    except Exception:
+        pass
+    types = [(a, canon) for canon, aliases in CANON_TYPES.items() for a in sorted(aliases)]
+    cities = [(c, c.title()) for c in CANON_CITIES] + [(a, c) for a, c in db_aliases["city"]]
+    return {
+        "type": nlp_engine.Vocabulary(types + db_aliases["property_type"], plural=True),
+        # longest name wins, as before; built-in spellings first on ties
+        "city": nlp_engine.Vocabulary(sorted(cities, key=lambda e: len(e[0] or ""), reverse=True)),
+    }
+VOCAB = nlp_engine.VocabSet(_build_vocab, data_versions.watch(POOL))
+
+_RE_CITY_EXTRA = re.compile(r"\b(borella|galle fort|mt\.?\s?lavinia|mount lavinia|dehiwala|colombo\s?\d)\b")
+_RE_BEDS = (re.compile(r"\b(\d+)\s*br\b"), re.compile(r"\b(\d+)\s*bed"))
+
 def detect_type(t):
-    low = (t or "").lower()
-    for canon, aliases in CANON_TYPES.items():
-        for a in aliases:
-            if re.search(rf"\b{re.escape(a)}(es|s)?\b", low): return canon
-    return None
+    return VOCAB["type"].find((t or "").lower())
+
+# "in/near <place>" up to the next filter word or punctuation, for names the vocabulary does not know
+_RE_PLACE = re.compile(r"\b(?:in|near|around|at|close to)\s+(?:the\s+)?([a-z][a-z0-9.' -]*?)"
+                       r"(?=\s+(?:under|below|over|for|with|within|max|min|budget|and|or|to|from|by)\b|\s*[,.?!;]|\s*$)")
 
 def detect_city(t):
     low = (t or "").lower()
-    for c in sorted(CANON_CITIES, key=len, reverse=True):
-        if re.search(rf"\b{re.escape(c)}\b", low): return c.title()
-    m = re.search(r"\b(borella|galle fort|mt\.?\s?lavinia|mount lavinia|dehiwala|colombo\s?\d)\b", low)
-    return m.group(1).replace("mt","mount").title() if m else None
+    city = VOCAB["city"].find(low)
+    if city: return city
+    m = _RE_CITY_EXTRA.search(low)
+    if m: return m.group(1).replace("mt","mount").title()
+    m = _RE_PLACE.search(low)   # typos and prefixes ("nugegodaa", "mount lav") through the gazetteer
+    if m:
+        words = m.group(1).split()[:3]
+        try:
+            gaz = GAZETTEER.get()
+            for n in range(len(words), 0, -1):
+                hit = gaz.resolve(" ".join(words[:n]))
+                if hit: return hit
+        except Exception:
+            pass
+    return None
+
+_RE_KM = re.compile(r"(\d+(?:\.\d+)?)\s*(?:km|kms|kilomet(?:er|re)s?)\b")
+
+def detect_radius_km(t):
+    m = _RE_KM.search((t or "").lower())
+    return float(m.group(1)) if m else None
 
 def detect_beds(t):
-    m = re.search(r"\b(\d+)\s*br\b", (t or "").lower()) or re.search(r"\b(\d+)\s*bed", (t or "").lower())
+    low = (t or "").lower()
+    m = _RE_BEDS[0].search(low) or _RE_BEDS[1].search(low)
     return int(m.group(1)) if m else None
 
 def detect_tenure(t):
@@ -168,7 +212,7 @@ def detect_tenure(t):
     return None
 
 def parse_budget_value(text: str):
-    low = (text or "").lower().replace(",", "")
+    low = _RE_KM.sub(" ", (text or "").lower().replace(",", ""))   # "within 5 km" is a radius, not a price
     m = re.search(r"(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)(\s*(m|mn|million))?", low)
     if m:
         a, b = float(m.group(1)), float(m.group(2)); mul = 1_000_000 if m.group(4) else 1
@@ -187,36 +231,64 @@ def parse_budget_value(text: str):
         return {"price_max": int(v)}
     return None
 
-def cheapest_price_for(cnx, city, ptype, tenure=None, beds=None):
+# ---------- facets (see facets.py) ----------
+FACETS = facets.store_for(POOL)
+
+def cheapest_price_for(city, ptype, tenure=None, beds=None):
+    """(lowest price, listings) for city + type (+ tenure, ≥ beds) from the facet store."""
     try:
         if not city or not ptype: return None, 0
-        params, where = [city, city, ptype], ["(city = ? OR district = ?)", "property_type = ?"]
-        if tenure in ("rent","sale"):
-            where.append("purpose = ?"); params.append(tenure)
-        if beds:
-            where.append("bedrooms >= ?"); params.append(int(beds))
-        sql = f"SELECT MIN(price_lkr) AS min_price, COUNT(*) AS cnt FROM properties WHERE status='available' AND {' AND '.join(where)}"
-        row = cnx.execute(sql, params).fetchone()
-        return (row["min_price"], row["cnt"]) if row else (None, 0)
+        st = FACETS.get().price_stats(city, ptype, tenure, beds)
+        return (st["min"], st["listings"]) if st else (None, 0)
     except Exception:
         return None, 0
 
-def map_area_to_city(cnx, area_or_city: str | None):
-    if not area_or_city: return None
+def _plural(ptype: str) -> str:
+    return ptype if ptype in ("land", "commercial") else ptype + "s"
+
+def empty_hint(city, ptype) -> str:
+    """What we do list when city + type has nothing: other types in the city, or the type elsewhere."""
     try:
-        row = cnx.execute(
-            "SELECT a.city FROM area_aliases aa JOIN areas a ON a.area_id=aa.area_id WHERE LOWER(aa.alias)=LOWER(?)",
-            (area_or_city,)
-        ).fetchone()
-        if row and row["city"]: return row["city"]
+        st = FACETS.get()
+        here = [t for t in st.counts(0, city) if t != ptype][:3]
+        if here:
+            return f" In {city} we currently list {', '.join(_plural(t) for t in here)}."
+        elsewhere = [c for c, _ in st.cities(ptype)[:3]]
+        if elsewhere:
+            return f" {_plural(ptype).capitalize()} are listed in {', '.join(elsewhere)}."
     except Exception:
         pass
+    return ""
+
+def coverage_answer():
+    """Areas (districts with their cities) with live listings, most first; None when the facet store is empty."""
     try:
-        row = cnx.execute(
-            "SELECT city FROM properties WHERE LOWER(city)=LOWER(?) OR LOWER(district)=LOWER(?) LIMIT 1",
-            (area_or_city, area_or_city)
-        ).fetchone()
-        if row and row["city"]: return row["city"]
+        places = [(d, n, [c for c in cities if c != d]) for d, n, cities in FACETS.get().areas()]
+    except Exception:
+        return None
+    if not places: return None
+    def area(name, n, cities):
+        inside = ", ".join(cities[:3]) + (f" and {len(cities) - 3} more" if len(cities) > 3 else "")
+        return f"{name} ({n}{': ' + inside if inside else ''})"
+    top = ", ".join(area(*p) for p in places[:8])
+    more = f" and {len(places) - 8} more areas" if len(places) > 8 else ""
+    return f"We currently have listings in {top}{more}. Tell me the city, property type, and budget to start."
+
+def _load_gazetteer():
+    try:
+        with POOL.reader(row_factory=None) as cnx:
+            return gazetteer.load(cnx)
+    except Exception:
+        return gazetteer.Gazetteer([])
+# rebuilt after writes to areas/aliases/synonyms ("vocab") or listings ("catalog")
+GAZETTEER = data_versions.Versioned(_load_gazetteer, data_versions.watch(POOL), ("vocab", "catalog"))
+
+def map_area_to_city(area_or_city: str | None):
+    """Canonical city/area name for the city slot; no DB access per message (see gazetteer.py)."""
+    if not area_or_city: return None
+    try:
+        hit = GAZETTEER.get().resolve(area_or_city)
+        if hit: return hit
     except Exception:
         pass
     return str(area_or_city).title()
@@ -235,7 +307,11 @@ def _format_land_subtitle(r):
     if r.get("city"): parts.append(r["city"])
     return " · ".join(parts) if parts else (r.get("city") or "-")
 
-def list_cards(rows):
+MEDIA = media.cache_for(POOL)
+
+def list_cards(rows, cnx=None):
+    """Card dicts for listing rows; primary images for the whole page come from one cached lookup."""
+    images = MEDIA.primary_images([r["property_id"] for r in rows], cnx)
     out = []
     for r in rows:
         is_land = (r.get("property_type") == "land")
@@ -250,77 +326,141 @@ def list_cards(rows):
             "code": r.get("listing_code"),
             "area_sqm": r.get("area_sqm"),
             "land_perch": r.get("land_perch"),
+            "image": images.get(r["property_id"]),
         })
     return out
 
-def _base_search_sql(where):
-    return f"""SELECT property_id,title,city,property_type,price_lkr,bedrooms,bathrooms,area_sqm,land_perch,featured,description,listing_code
-               FROM properties WHERE {' AND '.join(where)}
-               ORDER BY featured DESC, price_lkr ASC LIMIT 20"""
-
-def search_listings(cnx, session):
+# ---------- search result cache ----------
+# Keyed on the canonical slot tuple and the catalog version (bumped by triggers on
+# properties), so any listing write retires every cached result; TTL bounds staleness
+# on DBs without the data_versions table.
+SEARCH_CACHE = LRUCache(int(os.getenv("REALTY_SEARCH_CACHE", "4096")),
+                        ttl=float(os.getenv("REALTY_SEARCH_CACHE_TTL", "300")) or None)
+
+def _cached_rows(kind, slots, run, *extra):
+    """Rows for `kind` + canonical `slots` at the current catalog version; `run()` on a miss."""
+    ver = data_versions.watch(POOL).version("catalog")
+    return SEARCH_CACHE.get_or_compute((kind, ver, listing_query.slot_key(slots), *extra), run)
+
+def _card_rows(cnx, slots, k=PAGE_SIZE, after=None):
+    q = listing_query.ListingQuery.from_slots(slots)
+    if after: q.after(*after)
+    sql, params = q.select(*listing_query.CARD_COLUMNS).limit(k).build()
+    return _cached_rows("search", slots, lambda: [dict(r) for r in cnx.execute(sql, params)], k, after)
+
+def search_listings(cnx, session, k=PAGE_SIZE):
     try:
         need = missing_for_search(session)
         if need: return [], need
-        params, where = [], ["status='available'"]
-        city = session.get("city")
-        if city:
-            where.append("(city = ? OR district = ?)"); params += [city, city]
-        if session.get("type"):
-            where.append("property_type = ?"); params.append(session["type"])
-        if session.get("tenure") in ("rent","sale"):
-            where.append("purpose = ?"); params.append(session["tenure"])
-        if session.get("beds"):
-            where.append("bedrooms >= ?"); params.append(int(session["beds"]))
-        if "price" in session:
-            where.append("price_lkr = ?"); params.append(int(session["price"]))
-        if "price_max" in session:
-            where.append("price_lkr <= ?"); params.append(int(session["price_max"]))
-        if "price_min" in session:
-            where.append("price_lkr >= ?"); params.append(int(session["price_min"]))
-        rows = [dict(r) for r in cnx.execute(_base_search_sql(where), params)]
-        return list_cards(rows), []
+        return list_cards(_card_rows(cnx, session, k), cnx), []
     except Exception:
         return [], []
 
+# ---------- "show more" (keyset pagination) ----------
+# A full page hands out an opaque cursor: the page kind, the relaxation tier it came from,
+# the last row's (featured, price_lkr, property_id) and a short hash of the filters. The
+# next page starts strictly after that key, so page 20 costs what page 2 does. A cursor
+# whose filters no longer match the session is ignored.
+def _filters_sig(slots) -> str:
+    return hashlib.blake2s(repr(listing_query.slot_key(slots)).encode(), digest_size=6).hexdigest()
+
+def _browse_slots(session) -> dict:
+    return {k: v for k, v in session.items() if k != "price"}
+
+def make_cursor(kind, slots, tier, rows, k=PAGE_SIZE):
+    """Cursor for the page after `rows`, or None when the page was not full (nothing left)."""
+    if len(rows) < k: return None
+    last = rows[-1]
+    raw = json.dumps([kind, tier, last.get("featured") or 0, last.get("price_lkr"), last["property_id"], _filters_sig(slots)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def read_cursor(token):
+    try:
+        kind, tier, featured, price, pid, sig = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return kind, int(tier), (featured, price, int(pid)), sig
+    except Exception:
+        return None
+
+def next_page(cnx, session, token):
+    """(cards, next cursor) for the page after `token`, or None when the cursor is unusable."""
+    cur = read_cursor(token) if isinstance(token, str) else None
+    if not cur: return None
+    kind, tier, after, sig = cur
+    slots = _browse_slots(session) if kind == "browse" else session
+    if sig != _filters_sig(slots): return None
+    try:
+        if kind == "browse":
+            rows = _card_rows(cnx, slots, PAGE_SIZE, after)
+        else:
+            rows = _cached_rows("page", slots, lambda: [dict(r) for r in cnx.execute(
+                *listing_query.page_query(slots, tier, after, PAGE_SIZE))], tier, after, PAGE_SIZE)
+    except Exception:
+        return None
+    cards = list_cards(rows, cnx)
+    mode = listing_query.RELAX_TIERS[tier] if kind == "relaxed" and 0 <= tier < len(listing_query.RELAX_TIERS) else None
+    for c in cards:
+        c["badge"] = c.get("badge") or RELAX_BADGES.get(mode)
+    return cards, make_cursor(kind, slots, tier, rows)
+
 def browse_any_listings(cnx, session):
     """
     Broad show:
       - City set only → show mixed types in that city.
       - Type set only → show that type across all cities.
+    Returns (cards, preface, cursor).
     """
     try:
         city, ptype = session.get("city"), session.get("type")
-        params, where = [], ["status='available'"]
-        preface = None
         if city and not ptype:
-            where.append("(city = ? OR district = ?)"); params += [city, city]
             preface = f"Showing a mix of property types in {city}. Tell me a property type to refine."
         elif ptype and not city:
-            where.append("property_type = ?"); params.append(ptype)
             preface = f"You didn’t specify a city. Showing {ptype}s across our areas. Tell me a city to refine."
         else:
-            return [], None
-        if session.get("beds"):
-            where.append("bedrooms >= ?"); params.append(int(session["beds"]))
-        if session.get("tenure") in ("rent","sale"):
-            where.append("purpose = ?"); params.append(session["tenure"])
-        if "price_max" in session:
-            where.append("price_lkr <= ?"); params.append(int(session["price_max"]))
-        if "price_min" in session:
-            where.append("price_lkr >= ?"); params.append(int(session["price_min"]))
-        rows = [dict(r) for r in cnx.execute(_base_search_sql(where), params)]
-        return list_cards(rows), preface
+            return [], None, None
+        slots = _browse_slots(session)
+        rows = _card_rows(cnx, slots)
+        return list_cards(rows, cnx), preface, make_cursor("browse", slots, 0, rows)
     except Exception:
-        return [], None
+        return [], None, None
 
-def search_nearest(cnx, session):
+# ---------- nearest listings (see geo.py) ----------
+NEAREST_LIMIT = 6
+
+def _load_geo_index():
+    with conn(readonly=True) as cnx:
+        return geo.load_index(cnx)
+# rebuilt on the first nearest query after any listing write
+GEO_INDEX = data_versions.Versioned(_load_geo_index, data_versions.watch(POOL), "catalog")
+
+def search_nearest(cnx, session, text=""):
+    """Listings closest to the area's centroid, nearest first, with their distance.
+    Falls back to the plain city search only when the area has no known position."""
     try:
         area = session.get("area") or session.get("city")
         if not area: return [], "Tell me the area or city (e.g., ‘nearest apartments to Borella’)."
-        s = dict(session); s.setdefault("type","apartment"); s["city"] = area
-        rows, _ = search_listings(cnx, s)
-        return rows, None
+        s = dict(session); s.setdefault("type","apartment")
+        centre = geo.area_centroid(cnx, area)
+        if centre is None:
+            s["city"] = area
+            rows, _ = search_listings(cnx, s)
+            return rows, None
+        radius = detect_radius_km(text) or geo.RADIUS_KM
+        hits = GEO_INDEX.get().knn(centre[0], centre[1], k=NEAREST_LIMIT, radius_km=radius,
+                                   ptype=s["type"], purpose=s.get("tenure"), price_min=s.get("price_min"),
+                                   price_max=s.get("price_max"), min_beds=s.get("beds"))
+        if not hits:
+            return [], (f"Nothing matching within {radius:g} km of {centre[2]}. "
+                        f"Try a larger radius (e.g., ‘within {radius * 2:g} km of {centre[2]}’).")
+        dist = {pid: d for d, pid in hits}
+        sql, params = (listing_query.ListingQuery()
+                       .where(f"p.property_id IN ({','.join('?' * len(dist))})", *dist)
+                       .select(*listing_query.CARD_COLUMNS).build())
+        rows = sorted((dict(r) for r in cnx.execute(sql, params)), key=lambda r: dist[r["property_id"]])
+        cards = list_cards(rows, cnx)
+        for c in cards:
+            c["distance_km"] = round(dist[c["id"]], 2)
+            c["subtitle"] += f" · {c['distance_km']:.1f} km from {centre[2]}"
+        return cards, None
     except Exception:
         return [], "Tell me the area or city (e.g., ‘nearest apartments to Borella’)."
 
@@ -353,6 +493,16 @@ def open_investments(cnx):
         return []
 
 def kb_answer_categories(cnx):
+    try:
+        st = FACETS.get()
+        types, purposes, cities = st.counts(0), st.counts(1), ", ".join(c for c, _ in st.cities()[:3])
+    except Exception:
+        types = {}
+    if types:
+        tenure = " and ".join(purposes) or "sale"
+        return (f"We list {', '.join(f'{_plural(t)} ({n})' for t, n in types.items())} for {tenure}. "
+                f"Search by city ({cities}), budget, bedrooms, and features. "
+                "Example: “3BR apartments in Galle under 80M”.")
     return ("We support apartments, houses, townhouses, land, and commercial (rent and sale). "
             "Search by city (Colombo, Galle, Kandy), budget, bedrooms, and features. "
             "Example: “3BR apartments in Galle under 80M”.") 
@@ -373,35 +523,62 @@ INTENT_KEYWORDS = {
     "nearest_query": {"nearest":2,"near me":2,"close to":1,"near":1},
 }
 
+# keywords match at the start of a word ("hi" must not fire on "within", "this", "which")
+_INTENT_KW = {name: [(re.compile(r"\b" + re.escape(k)), w) for k, w in kw.items()] for name, kw in INTENT_KEYWORDS.items()}
+
+FAQ_CACHE_SIZE = int(os.getenv("REALTY_FAQ_CACHE", "2048"))
+
+def _load_faq_index():
+    try:
+        with conn(readonly=True) as cnx:
+            rows = cnx.execute("SELECT question, answer FROM faqs ORDER BY rowid").fetchall()
+    except Exception:
+        rows = []
+    # a fresh LRU per index build, so a reload never serves answers from the old table
+    index = nlp_index.PhraseIndex(((r["question"], r["answer"]) for r in rows), max_candidates=64)
+    return index, LRUCache(FAQ_CACHE_SIZE)
+FAQ_INDEX = data_versions.Versioned(_load_faq_index, data_versions.watch(POOL), "faqs")
+
 def faq_answer(cnx, text, threshold=0.78):
     try:
-        best = (0.0, None)
-        for r in cnx.execute("SELECT question, answer FROM faqs"):
-            sim = _similar(text, r["question"])
-            if sim > best[0]:
-                best = (sim, r["answer"])
-        return best[1] if best[0] >= threshold else None
+        index, cache = FAQ_INDEX.get()
+        def lookup():
+            hit = index.best(text, threshold)
+            return hit[1] if hit else None
+        return cache.get_or_compute((nlp_engine.norm(text), threshold), lookup)
     except Exception:
         return None
 
+def _load_intent_index():
+    try:
+        with conn(readonly=True) as cnx:
+            rows = cnx.execute("SELECT intent_name, phrase FROM intent_phrases ORDER BY rowid").fetchall()
+    except Exception:
+        rows = []
+    return nlp_index.PhraseIndex((r["phrase"], r["intent_name"]) for r in rows)
+# reloads itself when intent_phrases changes; INTENT_INDEX.reload() forces it
+INTENT_INDEX = data_versions.Versioned(_load_intent_index, data_versions.watch(POOL), "intents")
+INTENT_PHRASE_MIN = 0.88
+
 def classify_intent_smart(text: str):
-    t = _norm(text)
+    t = nlp_engine.norm(text)
     best, best_name = 0, None
-    for name, kw in INTENT_KEYWORDS.items():
-        score = sum(w for k,w in kw.items() if k in t)
+    for name, kw in _INTENT_KW.items():
+        score = sum(w for rx, w in kw if rx.search(t))
         if score > best:
             best, best_name = score, name
-    try:
-        with conn() as cnx:
-            for r in cnx.execute("SELECT intent_name, phrase FROM intent_phrases"):
-                sim = _similar(t, r["phrase"])
-                if sim >= 0.88 and best < 2:
-                    best, best_name = 3, r["intent_name"]
-    except Exception:
-        pass
+    if best < 2:
+        try:
+            hit = INTENT_INDEX.get().best(t, INTENT_PHRASE_MIN)
+            if hit: best, best_name = 3, hit[1]
+        except Exception:
+            pass
     conf = min(1.0, best / 3.0) if best else 0.0
     return best_name, conf
 
+_RE_MORE = re.compile(r"\b(?:show|see|load|view|give me)\s+(?:me\s+)?more\b|^(?:more|next)\b"
+                      r"(?:\s+(?:please|results|listings|options|properties|page|ones?))*\s*[.!?]*$")
+
 def parse_intent_slots(text, session):
     slots = {}
     city = detect_city(text);  typ = detect_type(text);  beds = detect_beds(text)
@@ -416,6 +593,8 @@ def parse_intent_slots(text, session):
     low = (text or "").lower().strip()
     if low in ("reset","restart","clear","clear filters","start over"):
         return "reset", 1.0, slots
+    if _RE_MORE.search(low) and not (city or typ or beds or b):
+        return "show_more", 1.0, slots
 
     smart, conf = classify_intent_smart(text)
     if smart: return smart, conf, slots
@@ -445,90 +624,67 @@ def ensure_conversation(cnx, session_id: str) -> int:
         (session_id,)
     ).fetchone()
     if row: return row["conversation_id"]
-    return cnx.execute("INSERT INTO conversations(session_id, status) VALUES (?, 'open')", (session_id,)).lastrowid
+    cid = cnx.execute("INSERT INTO conversations(session_id, status) VALUES (?, 'open')", (session_id,)).lastrowid
+    cnx.commit()   # the telemetry writer inserts messages for it from its own connection
+    return cid
 
-def get_history(cnx, conversation_id: int, limit: int = 12):
+def get_history(cnx, conversation_id: int, limit: int = prompt_budget.HISTORY_FETCH):
+    pending = TELEMETRY.pending_messages(conversation_id)   # before the read: nothing falls between the two
     rows = cnx.execute(
-        "SELECT role, content FROM messages WHERE conversation_id=? ORDER BY created_at DESC, message_id DESC LIMIT ?",
+        "SELECT message_id, role, content FROM messages WHERE conversation_id=? ORDER BY created_at DESC, message_id DESC LIMIT ?",
         (conversation_id, limit)
     ).fetchall()
-    return list(reversed([{"role": r["role"], "content": r["content"]} for r in rows]))
+    seen = {r["message_id"] for r in rows}
+    hist = [{"role": r["role"], "content": r["content"]} for r in reversed(rows)]
+    hist += [{"role": m.role, "content": m.content} for m in pending if m.message_id not in seen]
+    return hist[-limit:]
 
-def save_message(cnx, conversation_id: int, role: str, content: str, model: str | None = None):
-    cur = cnx.execute(
-        "INSERT INTO messages(conversation_id, role, content, model) VALUES (?,?,?,?)",
-        (conversation_id, role, content, model)
-    )
-    return cur.lastrowid
+def save_message(cnx, conversation_id: int, role: str, content: str, model: str | None = None, tokens: int | None = None):
+    """Queued for the telemetry writer; returns a MessageRef that log_intent accepts as message_id."""
+    return TELEMETRY.message(conversation_id, role, content, model, tokens)
 
 def log_intent(cnx, conversation_id, message_id, name, score, user_text=None, slots=None, reply_type=None, result_count=None, notes=None):
-    try:
-        cols = {r["name"] for r in cnx.execute("PRAGMA table_info(msg_intents)")}
-        row = {}
-        if "conversation_id" in cols: row["conversation_id"] = conversation_id
-        if "message_id" in cols:      row["message_id"] = message_id
-        if "name" in cols:            row["name"] = name
-        if "intent" in cols:          row["intent"] = name
-        val = float(score or 0.0)
-        if "score" in cols:           row["score"] = val
-        if "confidence" in cols:      row["confidence"] = val
-        if "user_text" in cols:       row["user_text"] = user_text or ""
-        if "slots_json" in cols:
-            row["slots_json"] = json.dumps(slots or {}, ensure_ascii=False)
-        if "reply_type" in cols:      row["reply_type"] = reply_type
-        if "result_count" in cols:    row["result_count"] = result_count
-        if "notes" in cols:           row["notes"] = notes
-        if "session_id" in cols:
-            sid_row = cnx.execute("SELECT session_id FROM conversations WHERE conversation_id=?", (conversation_id,)).fetchone()
-            row["session_id"] = (sid_row and sid_row["session_id"]) or "unknown"
-        if row:
-            keys = ",".join(row.keys()); qs = ",".join(["?"]*len(row))
-            cnx.execute(f"INSERT INTO msg_intents({keys}) VALUES({qs})", tuple(row.values()))
-            cnx.commit()
-    except Exception as e:
-        print("log_intent warning:", e)
+    TELEMETRY.intent(conversation_id, message_id, name=name, score=score, user_text=user_text, slots=slots,
+                     reply_type=reply_type, result_count=result_count, notes=notes)
 
 # ---------- FTS context + LLM (optional) ----------
-def build_db_context(cnx, session: dict, user_text: str, k: int = 5) -> str:
+def db_context_lines(cnx, session: dict, user_text: str, k: int = 8) -> list:
+    """(property_id, line) candidates for the LLM context, best first; prompt_budget.pack picks what fits.
+    The session's filters (city, type, beds, tenure, budget) bound the ranked search; the user's words rank within them."""
     try:
-        terms = []
-        if session.get("city"): terms.append(session["city"])
-        if session.get("type"): terms.append(session["type"])
-        if session.get("beds"): terms.append(f"{session['beds']} BR")
-        if session.get("tenure"): terms.append(session["tenure"])
-        query = " ".join([t for t in terms if t]) + " " + (user_text or "")
-        rows = cnx.execute("""
-            SELECT p.property_id, p.title, p.city, p.property_type, p.price_lkr, p.bedrooms, p.bathrooms,
-                   substr(p.description,1,180) AS snip
-            FROM property_fts f
-            JOIN properties p ON p.property_id = f.rowid
-            WHERE property_fts MATCH ?
-              AND p.status='available'
-            LIMIT ?
-        """, (query, k)).fetchall()
+        rows = fts_search.search(cnx, listing_query.ListingQuery.from_slots(session).select(
+                                     "property_id", "title", "city", "property_type", "price_lkr", "bedrooms", "bathrooms",
+                                     "substr(p.description,1,180) AS snip"),
+                                 fts_search.tokens(user_text), fts_search.term_index(POOL).get(), k, session.get("price_max"))
         if not rows:
-            cards, _ = search_listings(cnx, session)
-            if not cards: return ""
+            cards, _ = search_listings(cnx, session, k)
             def fmt_card(c): return f"#{c['id']} | {c['title']} | {c['type']} in {c.get('subtitle','')} | LKR {int(c.get('price_lkr') or 0):,}"
-            return "Top listings:\n" + "\n".join(fmt_card(c) for c in cards[:k])
-        out = []
-        for r in rows:
-            out.append(f"#{r['property_id']} | {r['title']} | {r['property_type']} | {r['city']} | "
-                       f"{r['bedrooms'] or '-'}BR/{r['bathrooms'] or '-'}BA | LKR {int(r['price_lkr'] or 0):,} | {r['snip'] or ''}")
-        return "Top listings:\n" + "\n".join(out)
+            return [(c["id"], fmt_card(c)) for c in cards]
+        return [(r["property_id"],
+                 f"#{r['property_id']} | {r['title']} | {r['property_type']} | {r['city']} | "
+                 f"{r['bedrooms'] or '-'}BR/{r['bathrooms'] or '-'}BA | LKR {int(r['price_lkr'] or 0):,} | {r['snip'] or ''}")
+                for r in rows]
     except Exception:
-        return ""
+        return []
 
-def call_llm(history: list, db_context: str) -> str:
-    if not client: return ""
-    messages = [{"role":"system","content": SYSTEM_PROMPT}]
-    if db_context: messages.append({"role":"system","content": f"Database context:\n{db_context}"})
-    messages.extend(history)
+KB_SEARCH = kb_search.kb_for(POOL)
+KB_CONTEXT_K = 3
+KB_LINE_TOKENS = 90
+
+def kb_context_lines(cnx, user_text: str, deadline=None) -> list:
+    """Best KB chunks for the LLM context as "(source) text" lines; skipped when the request
+    has less than the KB budget left, and cut short by it (kb_search.BUDGET_MS)."""
+    budget = kb_search.BUDGET_MS
+    if deadline is not None:
+        budget = min(budget, (deadline.remaining() - llm.MIN_CALL_S) * 1000)   # the LLM call still needs its minimum
+        if budget < 1: return []
     try:
-        resp = client.chat.completions.create(model=OPENAI_MODEL, temperature=OPENAI_TEMPERATURE, messages=messages)
-        return (resp.choices[0].message.content or "").strip()
-    except Exception:
-        return ""
+        hits = KB_SEARCH.search(cnx, user_text, KB_CONTEXT_K, show=None, budget_ms=budget)
+        text = KB_SEARCH.chunks([h[0] for h in hits], cnx)
+        clip = lambda t: t if prompt_budget.count_tokens(t) <= KB_LINE_TOKENS else prompt_budget.clip_tokens(t, KB_LINE_TOKENS)
+        return [f"({text[cid][0]}) {clip(text[cid][1])}" for cid, *_ in hits if cid in text]
+    except sqlite3.Error:
+        return []
 
 # ---------- routes ----------
 @app.get("/")
@@ -537,25 +693,29 @@ def home():
     if os.path.exists(tpl): return render_template("index.html")
     return send_from_directory(APP_DIR, "index.html")
 
-@app.post("/api/chat")
-def api_chat():
-    data = request.get_json(force=True, silent=True) or {}
-    text = (data.get("message") or "").strip()
-    sid  = data.get("session_id") or STORE.new()
-
-    if not text:
-        return jsonify({"reply":{"type":"text","content":"Tell me city, property type, and budget to start."},"session_id":sid})
-
+def chat_turn(text: str, sid: str, cursor: str | None = None) -> dict:
+    """
+    Everything for one chat turn except the LLM call. Returns the response body
+    ({"reply", "session_id", "session"}); when the reply must come from the LLM it
+    also carries "_llm" (prompt + canned fallback) and the caller finishes the turn
+    with complete_llm_turn()/stream_llm_turn(), after the DB lease is released.
+    The LLM call gets whatever is left of the request's REALTY_CHAT_BUDGET_S.
+    `cursor` is a cards reply's "cursor" for "show more" (default: the session's last one).
+    """
+    deadline = resilience.Deadline(llm.CHAT_BUDGET_S)
     session = STORE.get(sid)
+    saved = session.pop("cursor", None)   # only the next cards reply sets it again
+    cursor = cursor or saved
 
     # parse intent/slots and update session filters
     intent, conf, slots = parse_intent_slots(text, session)
-    session.update(slots); STORE.set(sid, session)
+    session.update(slots)
+    if session.get("city"):
+        session["city"] = map_area_to_city(session["city"])
 
     with conn() as cnx:
         conversation_id = ensure_conversation(cnx, sid)
-        if session.get("city"):
-            session["city"] = map_area_to_city(cnx, session["city"]); STORE.set(sid, session)
+        STORE.set(sid, session, conversation_id)
         user_mid = save_message(cnx, conversation_id, "user", text)
 
         # canned/meta
@@ -570,28 +730,29 @@ def api_chat():
                 "contact_agent": "Share your name, email/phone, and a short note here, or use the Contact panel—we’ll connect you to a live agent.",
                 "book_valuation": "To book a free valuation, drop your property location & contacts here, or use the ‘Book a free valuation’ button."
             }
+            if intent == "coverage_info": canned[intent] = coverage_answer() or canned[intent]
             ans = faq_answer(cnx, text) or canned[intent]
             save_message(cnx, conversation_id, "assistant", ans)
             log_intent(cnx, conversation_id, user_mid, intent, conf)
-            return jsonify({"reply": {"type":"text","content": ans}, "session_id": sid, "session": session})
+            return {"reply": {"type":"text","content": ans}, "session_id": sid, "session": session}
 
         if intent == "ask_categories":
             content = kb_answer_categories(cnx)
             save_message(cnx, conversation_id, "assistant", content)
             log_intent(cnx, conversation_id, user_mid, intent, conf)
-            return jsonify({"reply": {"type":"text","content": content}, "session_id": sid, "session": session})
+            return {"reply": {"type":"text","content": content}, "session_id": sid, "session": session}
 
         if intent == "reset":
             try: cnx.execute("UPDATE conversations SET status='closed', ended_at=CURRENT_TIMESTAMP WHERE conversation_id=?", (conversation_id,))
             except Exception: pass
-            STORE.set(sid, {})
+            STORE.set(sid, {}, conversation_id)
             content = "Cleared. Tell me a city, property type, and budget to start."
             save_message(cnx, conversation_id, "assistant", content)
             log_intent(cnx, conversation_id, user_mid, "reset", 1.0)
-            return jsonify({"reply": {"type":"text","content": content}, "session_id": sid, "session": {}})
+            return {"reply": {"type":"text","content": content}, "session_id": sid, "session": {}}
 
         if intent == "nearest_query":
-            results, msg = search_nearest(cnx, session)
+            results, msg = search_nearest(cnx, session, text)
             if msg:
                 payload = {"type":"text","content": msg}
                 save_message(cnx, conversation_id, "assistant", msg)
@@ -603,9 +764,9 @@ def api_chat():
                 log_intent(cnx, conversation_id, user_mid, intent, conf)
             else:
                 payload = {"type":"cards","items": results[:6]}
-                save_message(cnx, conversation_id, "assistant", f"[cards:{len(results[:6])}]")
+                save_message(cnx, conversation_id, "assistant", prompt_budget.cards_marker(results[:6]))
                 log_intent(cnx, conversation_id, user_mid, intent, conf)
-            return jsonify({"reply": payload, "session_id": sid, "session": session})
+            return {"reply": payload, "session_id": sid, "session": session}
 
         if intent == "investment_advice":
             items = open_investments(cnx)
@@ -617,103 +778,198 @@ def api_chat():
                 payload = {"type":"text","content": content}
                 save_message(cnx, conversation_id, "assistant", content)
             log_intent(cnx, conversation_id, user_mid, intent, conf)
-            return jsonify({"reply": payload, "session_id": sid, "session": session})
+            return {"reply": payload, "session_id": sid, "session": session}
+
+        if intent == "show_more":
+            page = next_page(cnx, session, cursor) if cursor else ([], None)   # no cursor: the last page was short
+            if page is None:
+                intent = "browse_listings"   # stale cursor (filters changed): run the search for the current ones
+            elif not page[0]:
+                content = "That’s all the listings for these filters. Try a higher budget or another area."
+                save_message(cnx, conversation_id, "assistant", content)
+                log_intent(cnx, conversation_id, user_mid, intent, conf)
+                return {"reply": {"type":"text","content": content}, "session_id": sid, "session": session}
+            else:
+                items, nxt = page
+                _keep_cursor(sid, session, conversation_id, nxt)
+                save_message(cnx, conversation_id, "assistant", prompt_budget.cards_marker(items))
+                log_intent(cnx, conversation_id, user_mid, intent, conf)
+                return {"reply": {"type":"cards","items": items, "cursor": nxt}, "session_id": sid, "session": session}
 
         # search/browse
         if intent in ("set_budget","set_location","set_type","rent_or_buy","browse_listings"):
-            results, missing = search_listings(cnx, session)
+            missing = missing_for_search(session)
             if missing:
                 if RELAX_ON_MISSING and len(missing) == 1:
-                    alt_items, preface = browse_any_listings(cnx, session)
+                    alt_items, preface, nxt = browse_any_listings(cnx, session)
                     if alt_items:
-                        payload = {"type":"cards","items": alt_items, "preface": preface}
-                        save_message(cnx, conversation_id, "assistant", f"[cards:{len(alt_items)}]")
+                        _keep_cursor(sid, session, conversation_id, nxt)
+                        payload = {"type":"cards","items": alt_items, "preface": preface, "cursor": nxt}
+                        save_message(cnx, conversation_id, "assistant", prompt_budget.cards_marker(alt_items))
                         log_intent(cnx, conversation_id, user_mid, intent, conf, notes=f"broad_for_missing:{missing[0]}")
-                        return jsonify({"reply": payload, "session_id": sid, "session": session})
+                        return {"reply": payload, "session_id": sid, "session": session}
                 nice = " and ".join(missing) if len(missing)==2 else ", ".join(missing)
                 hist = get_history(cnx, conversation_id)
-                db_ctx = build_db_context(cnx, session, text, k=5)
-                ai = call_llm(hist + [{"role":"user","content": f"User is missing: {nice}. Ask one short clarifying question."}], db_ctx)
-                content = ai or f"Got it. To refine, tell me your {nice}."
-                payload = {"type":"text","content": content}
-                save_message(cnx, conversation_id, "assistant", content, OPENAI_MODEL if ai else None)
-                log_intent(cnx, conversation_id, user_mid, intent, conf, notes=f"missing:{nice}")
-                return jsonify({"reply": payload, "session_id": sid, "session": session})
-
-            if not results:
-                if RELAX_ON_EMPTY:
-                    alt_items, mode = search_relaxed(cnx, session, text, k=6)
-                    if alt_items:
-                        city = session.get("city"); typ = session.get("type"); beds = session.get("beds")
-                        hint = ""
-                        if city and typ:
-                            min_price, _ = cheapest_price_for(cnx, city, typ, session.get("tenure"), beds)
-                            if isinstance(min_price, (int,float)) and min_price:
-                                hint = f" (lowest ~ LKR {int(min_price):,}{' for ≥'+str(beds)+'BR' if beds else ''})"
-                        payload = {"type":"cards","items": alt_items, "preface": "No exact match — showing similar options." + hint}
-                        save_message(cnx, conversation_id, "assistant", f"[cards:{len(alt_items)}]")
-                        log_intent(cnx, conversation_id, user_mid, intent, conf, notes=f"relaxed:{mode}")
-                        return jsonify({"reply": payload, "session_id": sid, "session": session})
-
-                city = session.get("city"); typ = session.get("type")
-                hint = ""
-                if city and typ:
-                    min_price, _ = cheapest_price_for(cnx, city, typ, session.get("tenure"), session.get("beds"))
-                    if isinstance(min_price, (int,float)) and min_price:
-                        hint = f" The lowest for {typ}{' (≥'+str(session.get('beds'))+'BR)' if session.get('beds') else ''} in {city} is around LKR {int(min_price):,}."
+                ctx = db_context_lines(cnx, session, text)
+                return _llm_turn(sid, session, conversation_id, user_mid, intent, conf,
+                                 hist + [{"role":"user","content": f"User is missing: {nice}. Ask one short clarifying question."}], ctx,
+                                 fallback=f"Got it. To refine, tell me your {nice}.", notes=f"missing:{nice}", deadline=deadline,
+                                 kb=kb_context_lines(cnx, text, deadline))
+
+            results, mode, min_price, nxt = search_relaxed(cnx, session, text)
+            _keep_cursor(sid, session, conversation_id, nxt)
+            if mode != "exact":
+                city = session.get("city"); typ = session.get("type"); beds = session.get("beds")
+                has_min = isinstance(min_price, (int,float)) and min_price
+                if RELAX_ON_EMPTY and results:
+                    hint = f" (lowest ~ LKR {int(min_price):,}{' for ≥'+str(beds)+'BR' if beds else ''})" if has_min else ""
+                    payload = {"type":"cards","items": results, "preface": "No exact match — showing similar options." + hint, "cursor": nxt}
+                    save_message(cnx, conversation_id, "assistant", prompt_budget.cards_marker(results))
+                    log_intent(cnx, conversation_id, user_mid, intent, conf, notes=f"relaxed:{mode}")
+                    return {"reply": payload, "session_id": sid, "session": session}
+
+                hint = f" The lowest for {typ}{' (≥'+str(beds)+'BR)' if beds else ''} in {city} is around LKR {int(min_price):,}." if has_min else empty_hint(city, typ)
                 content = "No matches yet. Try increasing budget or changing filters." + hint
                 payload = {"type":"text","content": content}
                 save_message(cnx, conversation_id, "assistant", content)
                 log_intent(cnx, conversation_id, user_mid, intent, conf, notes="no_results_with_filters")
-                return jsonify({"reply": payload, "session_id": sid, "session": session})
+                return {"reply": payload, "session_id": sid, "session": session}
 
-            payload = {"type":"cards","items": results[:6]}
-            save_message(cnx, conversation_id, "assistant", f"[cards:{len(results[:6])}]")
+            payload = {"type":"cards","items": results, "cursor": nxt}
+            save_message(cnx, conversation_id, "assistant", prompt_budget.cards_marker(results))
             log_intent(cnx, conversation_id, user_mid, intent, conf)
-            return jsonify({"reply": payload, "session_id": sid, "session": session})
+            return {"reply": payload, "session_id": sid, "session": session}
 
         # fallback
-        hist = get_history(cnx, conversation_id)
-        db_ctx = build_db_context(cnx, session, text, k=5)
-        ai_text = call_llm(hist + [{"role":"user","content": text}], db_ctx)
-        content = ai_text or "I can filter by city (Colombo, Galle, Kandy), type (apartment/house/land), and budget. Try: “3BR apartments in Galle under 80M”. What should I search?"
-        save_message(cnx, conversation_id, "assistant", content, OPENAI_MODEL if ai_text else None)
-        log_intent(cnx, conversation_id, user_mid, "fallback", conf)
-        return jsonify({"reply": {"type":"text","content": content}, "session_id": sid, "session": session})
-
-def search_relaxed(cnx, session, user_text: str, k: int = 6):
-    s1 = dict(session)
-    rows, _ = search_listings(cnx, s1)
-    if rows: return rows[:k], "exact"
-    s2 = {k:v for k,v in s1.items() if k != "beds"}
-    rows, _ = search_listings(cnx, s2)
-    if rows:
-        for it in rows: it["badge"] = it.get("badge") or "Similar"
-        return rows[:k], "drop_beds"
-    s3 = dict(s2)
-    if "price_max" in s3:
-        try: s3["price_max"] = int(int(s3["price_max"]) * 1.25)
-        except Exception: pass
-    rows, _ = search_listings(cnx, s3)
-    if rows:
-        for it in rows: it["badge"] = it.get("badge") or "Similar"
-        return rows[:k], "raise_budget"
-    s4 = { "city": session.get("city"), "type": session.get("type") }
-    rows, _ = search_listings(cnx, s4)
-    if rows:
-        for it in rows: it["badge"] = it.get("badge") or "Nearby"
-        return rows[:k], "fallback_city_type"
-    return [], "none"
+        hist = get_history(cnx, conversation_id)   # already ends with this user message
+        ctx = db_context_lines(cnx, session, text)
+        kb_lines = kb_context_lines(cnx, text, deadline)
+        return _llm_turn(sid, session, conversation_id, user_mid, "fallback", conf,
+                         hist if hist[-1:] == [{"role":"user","content": text}] else hist + [{"role":"user","content": text}], ctx,
+                         fallback="I can filter by city (Colombo, Galle, Kandy), type (apartment/house/land), and budget. Try: “3BR apartments in Galle under 80M”. What should I search?",
+                         deadline=deadline, kb=kb_lines)
+
+def _keep_cursor(sid, session, conversation_id, cursor):
+    """Remember the next-page cursor for a plain "show more" (the session was saved without it)."""
+    if cursor:
+        session["cursor"] = cursor
+        STORE.set(sid, session, conversation_id)
+
+PROMPT_STATS = prompt_budget.BudgetStats()
+
+def _llm_turn(sid, session, conversation_id, user_mid, intent, conf, history, context, fallback, notes=None, deadline=None, kb=()):
+    history, db_ctx, info = prompt_budget.pack(SYSTEM_PROMPT, history, context, kb=kb)
+    messages = llm.build_messages(SYSTEM_PROMPT, history, db_ctx)
+    tokens = prompt_budget.message_tokens(messages)
+    PROMPT_STATS.record(tokens, info)
+    return {"reply": None, "session_id": sid, "session": session,
+            "_llm": {"messages": messages, "fallback": fallback, "prompt_tokens": tokens, "deadline": deadline,
+                     "conversation_id": conversation_id, "user_mid": user_mid, "intent": intent, "conf": conf, "notes": notes}}
+
+def finish_llm_turn(turn: dict, ai_text: str) -> dict:
+    """Persist the assistant message once the full completion is known."""
+    job = turn.pop("_llm")
+    content = ai_text or job["fallback"]
+    save_message(None, job["conversation_id"], "assistant", content, llm.MODEL if ai_text else None,
+                 job["prompt_tokens"] if ai_text else None)
+    log_intent(None, job["conversation_id"], job["user_mid"], job["intent"], job["conf"], notes=job["notes"])
+    turn["reply"] = {"type":"text","content": content}
+    return turn
+
+def complete_llm_turn(turn: dict) -> dict:
+    return finish_llm_turn(turn, llm.complete(turn["_llm"]["messages"], turn["_llm"]["deadline"]))
+
+def stream_llm_turn(turn: dict):
+    """Yield content deltas; the turn is finished (and persisted) when the stream ends or the client leaves."""
+    parts = []
+    try:
+        for delta in llm.stream(turn["_llm"]["messages"], turn["_llm"]["deadline"]):
+            parts.append(delta)
+            yield delta
+    finally:
+        finish_llm_turn(turn, "".join(parts).strip())
 
-@app.get("/health")
-def health():
+@app.post("/api/chat")
+def api_chat():
+    data = request.get_json(force=True, silent=True) or {}
+    text = (data.get("message") or "").strip()
+    sid  = data.get("session_id") or STORE.new()
+    if not text and data.get("cursor"): text = "show more"
+    if not text:
+        return jsonify({"reply":{"type":"text","content":"Tell me city, property type, and budget to start."},"session_id":sid})
+    turn = chat_turn(text, sid, data.get("cursor"))
+    if "_llm" in turn:
+        complete_llm_turn(turn)
+    return jsonify(turn)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/stream")
+def api_chat_stream():
+    """
+    Same turn as /api/chat as Server-Sent Events: `session`, then either one `reply`
+    (cards/canned text, sent as soon as the DB work is done) or `token` events while
+    the LLM generates followed by the final `reply`; always ends with `done`.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    text = (data.get("message") or "").strip()
+    sid  = data.get("session_id") or STORE.new()
+    if not text and data.get("cursor"): text = "show more"
+    if text:
+        turn = chat_turn(text, sid, data.get("cursor"))
+    else:
+        turn = {"reply": {"type":"text","content":"Tell me city, property type, and budget to start."}, "session_id": sid, "session": {}}
+
+    def events():
+        yield _sse("session", {"session_id": sid, "session": turn["session"]})
+        if "_llm" in turn:
+            tokens = stream_llm_turn(turn)
+            try:
+                for delta in tokens:
+                    yield _sse("token", {"text": delta})
+            finally:
+                tokens.close()   # client went away: still persist what was generated
+        yield _sse("reply", turn["reply"])
+        yield _sse("done", {"session_id": sid})
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+RELAX_BADGES = {"drop_beds": "Similar", "raise_budget": "Similar", "fallback_city_type": "Nearby"}
+
+def search_relaxed(cnx, session, user_text: str = "", k: int = PAGE_SIZE):
+    """
+    Exact search and every relaxation tier in one query (first page only; next_page() goes on).
+    Returns (cards, tier, min_price, cursor): cards of the best tier that has rows, the tier
+    name ("exact", "drop_beds", "raise_budget", "fallback_city_type" or "none"), the lowest
+    price for city/type/tenure/beds regardless of budget (facet store; None if nothing is
+    listed) and the cursor for the next page (None when this one was not full).
+    """
+    if missing_for_search(session): return [], "none", None, None
+    min_price = cheapest_price_for(session.get("city"), session.get("type"), session.get("tenure"), session.get("beds"))[0]
     try:
-        with conn() as cnx:
-            cnx.execute("SELECT 1").fetchone()
-        db_ok = True
+        rows = _cached_rows("relaxed", session,
+                            lambda: [dict(r) for r in cnx.execute(*listing_query.relaxed_query(session, k))], k)
     except Exception:
-        db_ok = False
-    return jsonify({"ok": True, "db": db_ok, "model": OPENAI_MODEL, "openai_key": bool(OPENAI_API_KEY)})
+        return [], "none", min_price, None
+    if not rows: return [], "none", min_price, None
+    tier = rows[0]["relax_tier"]
+    mode = listing_query.RELAX_TIERS[tier]
+    items = list_cards(rows, cnx)
+    for it in items:
+        it["badge"] = it.get("badge") or RELAX_BADGES.get(mode)
+    return items, mode, min_price, make_cursor("relaxed", session, tier, rows, k)
+
+@app.get("/health")
+def health():
+    db_health = POOL.health()
+    return jsonify({"ok": True, "db": db_health["ok"], "db_checks": db_health, "pool": POOL.stats(),
+                    "faq_cache": FAQ_INDEX.get()[1].stats(), "facets": len(FACETS.get()), "gazetteer": GAZETTEER.get().stats(), "media_cache": MEDIA.stats(), "kb_rollups": KB_ROLLUPS.stats(), "kb_search": KB_SEARCH.stats(),
+                    "telemetry": TELEMETRY.stats(), "sessions": STORE.stats(),
+                    "search_cache": dict(SEARCH_CACHE.stats(), catalog_version=data_versions.watch(POOL).version("catalog")),
+                    "llm_cache": llm.CACHE.stats() if llm.CACHE else None, "prompt": PROMPT_STATS.stats(), "llm": llm.health(),
+                    "model": llm.MODEL, "openai_key": bool(llm.API_KEY)})
 
 @app.post("/api/contact")
 def api_contact():
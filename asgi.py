@@ -0,0 +1,137 @@
+# asgi.py
+"""
+Async serving mode: the same chatbot behind a bare ASGI app.
+
+  uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+/api/chat and /api/chat/stream run the synchronous DB part of a turn
+(app.chat_turn) on a bounded thread pool and await the LLM with the async
+OpenAI client, so a request waiting on the model holds no thread at all.
+Every other route is served by the Flask app on the same pool.
+"""
+import asyncio, io, json, os, sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import app as flask_app, llm
+
+DB_THREADS = int(os.getenv("REALTY_ASGI_DB_THREADS", "16"))
+EMPTY_REPLY = {"type": "text", "content": "Tell me city, property type, and budget to start."}
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="realty-db")
+
+async def run_db(fn, *args):
+    """Run blocking SQLite work off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+# ---------- ASGI plumbing ----------
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        msg = await receive()
+        chunks.append(msg.get("body", b""))
+        if not msg.get("more_body"): return b"".join(chunks)
+
+def _sse(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+async def _send_json(send, obj, status: int = 200):
+    body = json.dumps(obj, ensure_ascii=False).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+def _chat_request(body: bytes):
+    try: data = json.loads(body or b"{}")
+    except ValueError: data = {}
+    if not isinstance(data, dict): data = {}
+    text = (data.get("message") or "").strip()
+    cursor = data.get("cursor") if isinstance(data.get("cursor"), str) else None
+    return text or ("show more" if cursor else ""), data.get("session_id"), cursor
+
+async def _start_turn(text, sid, cursor=None):
+    sid = sid or await run_db(flask_app.STORE.new)
+    if not text:
+        return {"reply": dict(EMPTY_REPLY), "session_id": sid, "session": {}}
+    return await run_db(flask_app.chat_turn, text, sid, cursor)
+
+# ---------- chat routes ----------
+async def chat(scope, receive, send):
+    text, sid, cursor = _chat_request(await _read_body(receive))
+    turn = await _start_turn(text, sid, cursor)
+    if "_llm" in turn:
+        reply = await llm.acomplete(turn["_llm"]["messages"], turn["_llm"]["deadline"])
+        await run_db(flask_app.finish_llm_turn, turn, reply)   # saves the session: blocking sqlite
+    await _send_json(send, turn)
+
+async def chat_stream(scope, receive, send):
+    text, sid, cursor = _chat_request(await _read_body(receive))
+    turn = await _start_turn(text, sid, cursor)
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                            (b"x-accel-buffering", b"no")]})
+    async def emit(event, data):
+        await send({"type": "http.response.body", "body": _sse(event, data), "more_body": True})
+
+    await emit("session", {"session_id": turn["session_id"], "session": turn["session"]})
+    if "_llm" in turn:
+        parts = []
+        try:
+            async for delta in llm.astream(turn["_llm"]["messages"], turn["_llm"]["deadline"]):
+                parts.append(delta)
+                await emit("token", {"text": delta})
+        finally:
+            await run_db(flask_app.finish_llm_turn, turn, "".join(parts).strip())
+    await emit("reply", turn["reply"])
+    await emit("done", {"session_id": turn["session_id"]})
+    await send({"type": "http.response.body", "body": b""})
+
+# ---------- everything else: the Flask (WSGI) app on the pool ----------
+def _call_wsgi(environ):
+    out = {}
+    def start_response(status, headers, exc_info=None):
+        out["status"], out["headers"] = int(status.split(" ", 1)[0]), headers
+    result = flask_app.app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"): result.close()
+    return out["status"], out["headers"], body
+
+async def wsgi_fallback(scope, receive, send):
+    body = await _read_body(receive)
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"], "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": unquote(scope["path"]), "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0], "SERVER_PORT": str(server[1]), "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_TYPE": headers.get("content-type", ""), "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0), "wsgi.url_scheme": scope.get("scheme", "http"), "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr, "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+    for k, v in headers.items():
+        if k not in ("content-type", "content-length"):
+            environ["HTTP_" + k.upper().replace("-", "_")] = v
+    status, resp_headers, resp_body = await run_db(_call_wsgi, environ)
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in resp_headers]})
+    await send({"type": "http.response.body", "body": resp_body})
+
+ROUTES = {("POST", "/api/chat"): chat, ("POST", "/api/chat/stream"): chat_stream}
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                flask_app.TELEMETRY.flush()
+                _executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    handler = ROUTES.get((scope["method"], scope["path"]), wsgi_fallback)
+    await handler(scope, receive, send)
@@ -0,0 +1,121 @@
+# data_versions.py
+"""
+Generation counters for cached, DB-derived structures.
+
+Triggers bump `data_versions.version` for a named group whenever one of its
+tables changes; in-process caches compare the counter they were built at with
+the current one (polled at most every POLL_S seconds) and rebuild when it moved.
+"""
+import os, threading, time
+
+POLL_S = float(os.getenv("REALTY_VERSION_POLL_S", "2"))
+
+# group -> tables whose writes invalidate it
+TRACKED = {
+    "vocab": ("synonyms", "areas", "area_aliases", "type_synonyms"),
+    "intents": ("intent_phrases",),
+    "faqs": ("faqs",),
+    "catalog": ("properties",),
+    "media": ("property_media",),
+    "investments": ("investments",),
+    "kb": ("kb_chunks",),
+}
+
+DDL = """
+CREATE TABLE IF NOT EXISTS data_versions (
+  name        TEXT PRIMARY KEY,
+  version     INTEGER NOT NULL DEFAULT 0,
+  updated_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def _trigger_sql(table: str, group: str) -> list[str]:
+    body = (f"UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE name = '{group}';")
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS dv_{table}_{ev[0].lower()} AFTER {ev} ON {table} BEGIN {body} END"
+        for ev in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+def ensure(cnx) -> None:
+    """Create the counters table, one row per group, and triggers on tracked tables that exist."""
+    cnx.execute(DDL)
+    existing = {r[0] for r in cnx.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for group, tables in TRACKED.items():
+        cnx.execute("INSERT OR IGNORE INTO data_versions(name, version) VALUES (?, 0)", (group,))
+        for table in tables:
+            if table in existing:
+                for sql in _trigger_sql(table, group):
+                    cnx.execute(sql)
+
+def bump(cnx, group: str) -> None:
+    cnx.execute("UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = ?",
+                (group,))
+
+class VersionWatch:
+    """Throttled reader of data_versions shared by every cache on one pool."""
+    def __init__(self, pool, poll_s: float = POLL_S):
+        self.pool, self.poll_s = pool, poll_s
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._checked = 0.0
+
+    def version(self, group: str) -> int | None:
+        if time.monotonic() - self._checked >= self.poll_s:
+            self.refresh()
+        return self._versions.get(group)
+
+    def refresh(self) -> dict:
+        with self._lock:
+            try:
+                with self.pool.reader(row_factory=None) as cx:
+                    self._versions = dict(cx.execute("SELECT name, version FROM data_versions").fetchall())
+            except Exception:
+                pass   # table missing (old DB): keep serving what we have
+            self._checked = time.monotonic()
+            return dict(self._versions)
+
+class Versioned:
+    """A value built by `build()` and rebuilt on first use after `group`'s version moves
+    (`group` may be a tuple: any of them moving triggers the rebuild).
+    The (version, value) pair is swapped in with one assignment, so readers see
+    either the old value or the complete new one."""
+    def __init__(self, build, watch: VersionWatch | None = None, group: str | tuple | None = None):
+        self._build, self._watch, self._group = build, watch, group
+        self._lock = threading.Lock()
+        self._state = None   # (version, value)
+
+    def _version(self):
+        if not (self._watch and self._group): return None
+        if isinstance(self._group, tuple): return tuple(self._watch.version(g) for g in self._group)
+        return self._watch.version(self._group)
+
+    def get(self):
+        ver = self._version()
+        state = self._state
+        if state is None or state[0] != ver:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != ver:
+                    state = self._state = (ver, self._build())
+        return state[1]
+
+    def reload(self):
+        """Hot-reload hook: rebuild now instead of waiting for the next version bump."""
+        if self._watch: self._watch.refresh()
+        with self._lock:
+            self._state = (self._version(), self._build())
+        return self._state[1]
+
+    def invalidate(self) -> None:
+        self._state = None
+
+_WATCHES: dict[int, VersionWatch] = {}
+_WATCHES_LOCK = threading.Lock()
+
+def watch(pool) -> VersionWatch:
+    with _WATCHES_LOCK:
+        w = _WATCHES.get(id(pool))
+        if w is None:
+            w = _WATCHES[id(pool)] = VersionWatch(pool)
+        return w
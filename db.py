@@ -1,46 +1,42 @@
 # db.py
-import sqlite3, pathlib, typing as t, re, json, datetime as dt
+import os, sqlite3, pathlib, typing as t, re
+import db_pool, data_versions, fts_search, media, kb, kb_search
+from nlp_engine import Vocabulary
+from listing_query import ListingQuery
 
 BASE_DIR = pathlib.Path(__file__).resolve().parent
-DB_FILE  = BASE_DIR / "db" / "realty.db"
+DB_FILE  = pathlib.Path(os.getenv("REALTY_DB", BASE_DIR / "db" / "realty.db"))
+POOL     = db_pool.get_pool(DB_FILE)   # same pool app.py uses
 
 def dict_factory(cursor, row):
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
-def get_conn() -> sqlite3.Connection:
-    con = sqlite3.connect(DB_FILE)
-    con.row_factory = dict_factory
-    con.execute("PRAGMA foreign_keys=ON")
-    return con
-
-_STOP = {
-    "the","a","an","and","or","to","in","on","for","with","of","is","are","am",
-    "do","does","did","you","your","we","us","our","what","which","who","whom",
-    "have","has","had","me","i","please","show","list","give","properties","property","homes","house","apartments"
-}
+def get_conn(readonly: bool = False):
+    """Pooled lease yielding dict rows; `with get_conn() as con:` commits on exit."""
+    return POOL.connection(readonly=readonly, row_factory=dict_factory)
 
 def _basic_tokens(q: str|None) -> list[str]:
     if not q: return []
     return re.findall(r"[0-9A-Za-z]+", q.lower())
 
-def _fts_query_from_tokens(tokens: list[str]) -> str|None:
-    tokens = [t for t in tokens if t and t not in _STOP]
-    if not tokens: return None
-    tokens = tokens[:8]
-    return " OR ".join(t+"*" for t in tokens)
-
-def _augment_tokens_with_synonyms(q: str, tokens: list[str], con: sqlite3.Connection) -> list[str]:
-    txt = (q or "").lower()
-    rows = con.execute("SELECT kind, canonical, alias FROM synonyms").fetchall()
-    extra: list[str] = []
-    for r in rows:
-        alias = (r["alias"] or "").lower()
-        if not alias: continue
-        if alias in txt:
-            canon_words = re.findall(r"[0-9A-Za-z]+", (r["canonical"] or "").lower())
-            extra.extend(canon_words)
-    all_tokens = list(dict.fromkeys(tokens + extra))
-    return all_tokens
+def _build_synonym_matcher() -> Vocabulary:
+    """alias -> canonical words for every synonyms row, compiled into one pattern."""
+    merged: dict[str, list[str]] = {}
+    try:
+        with get_conn(readonly=True) as con:
+            for r in con.execute("SELECT canonical, alias FROM synonyms"):
+                words = merged.setdefault((r["alias"] or "").lower(), [])
+                words += [w for w in _basic_tokens(r["canonical"]) if w not in words]
+    except sqlite3.Error:
+        pass
+    return Vocabulary(((alias, tuple(words)) for alias, words in merged.items() if words), plural=True)
+
+# rebuilt when synonyms change ('vocab' data version), never queried per search
+SYNONYMS = data_versions.Versioned(_build_synonym_matcher, data_versions.watch(POOL), "vocab")
+
+def _augment_tokens_with_synonyms(q: str, tokens: list[str]) -> list[str]:
+    extra = [w for words in SYNONYMS.get().find_all((q or "").lower()) for w in words]
+    return list(dict.fromkeys(tokens + extra))
 
 def upsert_lead(name: str|None, email: str|None, phone: str|None, intent: str|None, note: str|None) -> int:
     with get_conn() as con:
@@ -93,7 +89,7 @@ def log_message(conversation_id: int, role: str, content: str, model: str|None=N
         return cur.lastrowid
 
 def featured_properties(limit: int = 3) -> list[dict]:
-    with get_conn() as con:
+    with get_conn(readonly=True) as con:
         return con.execute("""
           SELECT property_id, title, city, price_lkr, property_type
             FROM properties
@@ -103,113 +99,68 @@ def featured_properties(limit: int = 3) -> list[dict]:
         """, (limit,)).fetchall()
 
 def refresh_featured_summary() -> str:
-    items = featured_properties(limit=3)
-    if not items:
-        text = "We currently have a rotating catalog of apartments, houses, and land across Colombo, Galle, and Kandy. Ask for areas or budget to get matches."
-    else:
-        bullets = []
-        for p in items:
-            city = p.get("city") or ""
-            price = p.get("price_lkr")
-            price_str = f"LKR {price:,}" if price else "POA"
-            bullets.append(f"- {p.get('title')} — {city} — {price_str}")
-        text = "Top featured properties right now:\n" + "\n".join(bullets)
-
-    meta = json.dumps({"generated_at": dt.datetime.utcnow().isoformat() + "Z"})
-    with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("DELETE FROM kb_chunks WHERE source='featured_rollup'")
-        cur.execute(
-            "INSERT INTO kb_chunks (source, text, meta) VALUES ('featured_rollup', ?, ?)",
-            (text, meta),
-        )
-    return text
-
-def search_properties_fts(q: str, city: str|None=None, max_price: int|None=None, limit: int=10) -> list[dict]:
-    with get_conn() as con:
-        tokens = re.findall(r"[0-9A-Za-z]+", (q or "").lower())
-        tokens = _augment_tokens_with_synonyms(q, tokens, con)
-        fts_q = _fts_query_from_tokens(tokens)
-        params: list[t.Any] = []
-        if fts_q:
-            sql = """
-              SELECT p.*
-                FROM property_fts f
-                JOIN properties p ON p.property_id = f.rowid
-               WHERE property_fts MATCH ?
-            """
-            params.append(fts_q)
-        else:
-            sql = "SELECT p.* FROM properties p WHERE 1=1"
-        if city:
-            sql += " AND p.city = ?"
-            params.append(city)
-        if max_price is not None:
-            sql += " AND p.price_lkr <= ?"
-            params.append(max_price)
-        sql += " ORDER BY p.featured DESC, p.created_at DESC LIMIT ?"
-        params.append(limit)
+    """Rebuild every catalog rollup chunk now (featured, per city, per type, investments), updating
+    kb_chunks in place (kb.py; the app also does this in the background). Returns the featured text."""
+    with POOL.writer(row_factory=None) as cx:
+        cx.execute("BEGIN IMMEDIATE")
+        kb.ensure(cx)
+        kb.refresh(cx)
+        row = cx.execute("SELECT text FROM kb_chunks WHERE source = ? ORDER BY chunk_id LIMIT 1",
+                         (kb.SOURCES["featured"],)).fetchone()
+    return row[0] if row else ""
+
+def rollup_counts() -> dict:
+    """Rollup chunks per source."""
+    with get_conn(readonly=True) as con:
+        return {r["source"]: r["n"] for r in con.execute(
+            f"SELECT source, COUNT(*) AS n FROM kb_chunks WHERE source IN ({','.join('?' * len(kb.SOURCES))}) GROUP BY source",
+            tuple(kb.SOURCES.values()))}
+
+def search_properties_fts(q: str, city: str|None=None, max_price: int|None=None, limit: int=10,
+                          slots: dict|None=None) -> list[dict]:
+    """FTS hits for `q` narrowed by `slots` (city/type/purpose/beds/baths/price_min/price_max) in SQL,
+    ranked by weighted bm25 with featured/price boosts (see fts_search.py)."""
+    slots = dict(slots or {})
+    if city: slots["city"] = city
+    if max_price is not None: slots["price_max"] = max_price
+    words = _augment_tokens_with_synonyms(q, fts_search.tokens(q))
+    with get_conn(readonly=True) as con:
         try:
-            return con.execute(sql, params).fetchall()
+            rows = fts_search.search(con, ListingQuery.from_slots(slots), words, fts_search.term_index(POOL).get(),
+                                     limit, slots.get("price_max"))
+            if rows is not None: return rows
         except sqlite3.OperationalError:
-            return con.execute(
-                "SELECT * FROM properties WHERE status='available' ORDER BY featured DESC, created_at DESC LIMIT ?",
-                (limit,)
-            ).fetchall()
+            pass   # property_fts missing: same filters, no text match
+        return con.execute(*ListingQuery.from_slots(slots).limit(limit).build()).fetchall()
 
 def list_open_investments(limit: int=10) -> list[dict]:
-    with get_conn() as con:
+    with get_conn(readonly=True) as con:
         return con.execute("SELECT * FROM v_open_investments LIMIT ?", (limit,)).fetchall()
 
-def search_kb(q: str, limit: int=5) -> list[dict]:
-    with get_conn() as con:
-        tokens = re.findall(r"[0-9A-Za-z]+", (q or "").lower())
-        tokens = _augment_tokens_with_synonyms(q, tokens, con)
-        fts_q = _fts_query_from_tokens(tokens)
-        if not fts_q:
-            return con.execute("""
-              SELECT text, source, chunk_id
-                FROM kb_chunks
-            ORDER BY created_at DESC LIMIT ?
-            """, (limit,)).fetchall()
-        try:
-            return con.execute("""
-              SELECT text, source, rowid AS chunk_id
-                FROM kb_fts
-               WHERE kb_fts MATCH ?
-               LIMIT ?
-            """, (fts_q, limit)).fetchall()
-        except sqlite3.OperationalError:
-            return con.execute("""
-              SELECT text, source, chunk_id
-                FROM kb_chunks
-            ORDER BY created_at DESC LIMIT ?
-            """, (limit,)).fetchall()
+def search_kb(q: str, limit: int=5, sources=None, highlight: bool=False) -> list[dict]:
+    """KB chunks for `q` ranked by bm25 (kb_search.py): `text` is a snippet with [matches], or the
+    whole chunk marked up with highlight=True. `sources` limits kb_chunks.source. Newest chunks
+    when `q` has nothing searchable."""
+    query, engine = " ".join(_augment_tokens_with_synonyms(q, _basic_tokens(q))), kb_search.kb_for(POOL)
+    with POOL.reader(row_factory=None) as con:
+        if engine.searchable(query):
+            try:
+                return [{"text": text, "source": source, "chunk_id": cid, "score": score} for cid, source, score, text in
+                        engine.search(con, query, limit, sources, "highlight" if highlight else "snippet", budget_ms=None)]
+            except sqlite3.OperationalError:
+                pass   # kb_fts missing
+        return [{"text": text, "source": source, "chunk_id": cid} for cid, source, text in kb_search.latest(con, limit, sources)]
 
 # ---- NEW: blend FTS with structured filters ----
 def search_properties(q: str, slots: dict, limit: int = 10) -> list[dict]:
     """Use FTS + structured filters from slots (city/type/beds/price/purpose)."""
-    candidates = search_properties_fts(q, city=slots.get("city"), max_price=slots.get("price_max"), limit=limit*3)
-    res: list[dict] = []
-    for r in candidates:
-        if slots.get("purpose") and r.get("purpose") != slots["purpose"]:
-            continue
-        if slots.get("type") and r.get("property_type") != slots["type"]:
-            continue
-        if slots.get("beds") and (r.get("bedrooms") or 0) < int(slots["beds"]):
-            continue
-        if slots.get("baths") and (r.get("bathrooms") or 0) < int(slots["baths"]):
-            continue
-        if slots.get("price_min") and r.get("price_lkr") and r["price_lkr"] < int(slots["price_min"]):
-            continue
-        res.append(r)
-    return res[:limit] if res else candidates[:limit]
+    return search_properties_fts(q, limit=limit, slots=slots)
 
 # ---- Conversation state helpers ----
 import json as _json
 
 def get_state(conversation_id: int) -> dict:
-    with get_conn() as con:
+    with get_conn(readonly=True) as con:
         row = con.execute("SELECT pending_field, slots_json FROM conversation_state WHERE conversation_id=?",
                           (conversation_id,)).fetchone()
         if not row:
@@ -241,12 +192,8 @@ def clear_state(conversation_id: int) -> None:
 def get_primary_image(property_id: int|None) -> str|None:
     if not property_id:
         return None
-    with get_conn() as con:
-        row = con.execute("""
-          SELECT url
-            FROM property_media
-           WHERE property_id=?
-        ORDER BY COALESCE(sort_order, 9999) ASC, media_id ASC
-           LIMIT 1
-        """, (property_id,)).fetchone()
-        return row["url"] if row else None
+    return primary_images([property_id]).get(property_id)
+
+def primary_images(property_ids) -> dict:
+    """{property_id: url or None} for a page of listings in at most one query (see media.py)."""
+    return media.cache_for(POOL).primary_images(property_ids)
@@ -0,0 +1,32 @@
+BEGIN;
+
+-- Generation counters for in-process caches (see data_versions.py).
+-- app.py also creates these at startup, including triggers on tables
+-- that only exist once the seed scripts have run (area_aliases, type_synonyms).
+CREATE TABLE IF NOT EXISTS data_versions (
+  name        TEXT PRIMARY KEY,
+  version     INTEGER NOT NULL DEFAULT 0,
+  updated_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO data_versions(name, version) VALUES ('vocab', 0);
+
+CREATE TRIGGER IF NOT EXISTS dv_synonyms_i AFTER INSERT ON synonyms BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'vocab';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_synonyms_u AFTER UPDATE ON synonyms BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'vocab';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_synonyms_d AFTER DELETE ON synonyms BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'vocab';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_areas_i AFTER INSERT ON areas BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'vocab';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_areas_u AFTER UPDATE ON areas BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'vocab';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_areas_d AFTER DELETE ON areas BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'vocab';
+END;
+
+COMMIT;
@@ -0,0 +1,12 @@
+BEGIN;
+
+-- Indexes for the predicate shapes built by listing_query.ListingQuery
+-- (app.py creates the same ones at startup via listing_query.ensure_indexes).
+CREATE INDEX IF NOT EXISTS idx_props_city_search
+  ON properties(city, property_type, status, price_lkr, purpose, bedrooms);
+CREATE INDEX IF NOT EXISTS idx_props_district_search
+  ON properties(district, property_type, status, price_lkr, purpose, bedrooms);
+CREATE INDEX IF NOT EXISTS idx_props_type_browse
+  ON properties(property_type, status, featured DESC, price_lkr, property_id);
+
+COMMIT;
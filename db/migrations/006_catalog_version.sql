@@ -0,0 +1,17 @@
+BEGIN;
+
+-- Catalog generation counter: listing writes retire cached search results
+-- (see app.SEARCH_CACHE). app.py also creates these at startup.
+INSERT OR IGNORE INTO data_versions(name, version) VALUES ('catalog', 0);
+
+CREATE TRIGGER IF NOT EXISTS dv_properties_i AFTER INSERT ON properties BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_properties_u AFTER UPDATE ON properties BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_properties_d AFTER DELETE ON properties BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+
+COMMIT;
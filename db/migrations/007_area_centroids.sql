@@ -0,0 +1,9 @@
+BEGIN;
+
+-- Area centroids for nearest-listing search (geo.py). Only the columns live
+-- here: the centroid rows come from geo.CENTROIDS, which geo.ensure_schema
+-- seeds (and fills in where latitude is NULL) at app startup.
+ALTER TABLE areas ADD COLUMN latitude REAL;
+ALTER TABLE areas ADD COLUMN longitude REAL;
+
+COMMIT;
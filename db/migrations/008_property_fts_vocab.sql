@@ -0,0 +1,7 @@
+BEGIN;
+
+-- Term list of property_fts, read by fts_search.load for prefix expansion
+-- (app.py also creates it at startup via fts_search.ensure).
+CREATE VIRTUAL TABLE IF NOT EXISTS property_fts_vocab USING fts5vocab(property_fts, 'row');
+
+COMMIT;
@@ -0,0 +1,39 @@
+BEGIN;
+
+-- One property_fts layout for every DB (fts_search.FTS_DDL). schema.sql built
+-- (title, description, city, district) with an update trigger that ran a plain
+-- DELETE against the external-content table; 002 built (…, city, property_type).
+-- scripts/fts_maint.py rebuild does the same and also handles unknown trigger names.
+DROP TRIGGER IF EXISTS property_ai;
+DROP TRIGGER IF EXISTS property_ad;
+DROP TRIGGER IF EXISTS property_au;
+DROP TRIGGER IF EXISTS properties_ai;
+DROP TRIGGER IF EXISTS properties_ad;
+DROP TRIGGER IF EXISTS properties_au;
+DROP TRIGGER IF EXISTS property_fts_ai;
+DROP TRIGGER IF EXISTS property_fts_ad;
+DROP TRIGGER IF EXISTS property_fts_au;
+DROP TABLE IF EXISTS property_fts_vocab;
+DROP TABLE IF EXISTS property_fts;
+
+CREATE VIRTUAL TABLE property_fts USING fts5(
+  title, description, city, district, property_type,
+  content='properties', content_rowid='property_id'
+);
+
+CREATE TRIGGER property_fts_ai AFTER INSERT ON properties BEGIN
+  INSERT INTO property_fts(rowid, title, description, city, district, property_type) VALUES (new.property_id, new.title, new.description, new.city, new.district, new.property_type);
+END;
+CREATE TRIGGER property_fts_ad AFTER DELETE ON properties BEGIN
+  INSERT INTO property_fts(property_fts, rowid, title, description, city, district, property_type) VALUES ('delete', old.property_id, old.title, old.description, old.city, old.district, old.property_type);
+END;
+CREATE TRIGGER property_fts_au AFTER UPDATE OF title, description, city, district, property_type ON properties BEGIN
+  INSERT INTO property_fts(property_fts, rowid, title, description, city, district, property_type) VALUES ('delete', old.property_id, old.title, old.description, old.city, old.district, old.property_type);
+  INSERT INTO property_fts(rowid, title, description, city, district, property_type) VALUES (new.property_id, new.title, new.description, new.city, new.district, new.property_type);
+END;
+
+INSERT INTO property_fts(property_fts) VALUES ('rebuild');
+INSERT INTO property_fts(property_fts) VALUES ('optimize');
+CREATE VIRTUAL TABLE IF NOT EXISTS property_fts_vocab USING fts5vocab(property_fts, 'row');
+
+COMMIT;
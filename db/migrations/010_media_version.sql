@@ -0,0 +1,17 @@
+BEGIN;
+
+-- Media generation counter: property_media writes retire cached card images
+-- (see media.py). app.py also creates these at startup.
+INSERT OR IGNORE INTO data_versions(name, version) VALUES ('media', 0);
+
+CREATE TRIGGER IF NOT EXISTS dv_property_media_i AFTER INSERT ON property_media BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'media';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_property_media_u AFTER UPDATE ON property_media BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'media';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_property_media_d AFTER DELETE ON property_media BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'media';
+END;
+
+COMMIT;
@@ -0,0 +1,67 @@
+BEGIN;
+
+-- Listing facets (facets.py): per city / type / purpose / bedroom bucket the count and
+-- min / median / max price of available listings, kept exact by the triggers below.
+-- app.py creates the same at startup; fill or rebuild with scripts/refresh_facets.py.
+CREATE TABLE IF NOT EXISTS listing_facets (
+  city          TEXT NOT NULL,
+  property_type TEXT NOT NULL,
+  purpose       TEXT,
+  beds_bucket   INTEGER NOT NULL,
+  listings      INTEGER NOT NULL,
+  min_price     INTEGER,
+  median_price  INTEGER,
+  max_price     INTEGER,
+  updated_at    DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_listing_facets_key ON listing_facets(city, property_type, purpose, beds_bucket);
+
+CREATE TRIGGER IF NOT EXISTS listing_facets_ai AFTER INSERT ON properties
+WHEN new.status = 'available' AND new.city IS NOT NULL BEGIN
+  DELETE FROM listing_facets WHERE city = new.city AND property_type = new.property_type
+     AND purpose IS new.purpose AND beds_bucket = MIN(COALESCE(new.bedrooms, 0), 5);
+  INSERT INTO listing_facets(city, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price)
+  SELECT new.city, new.property_type, new.purpose, MIN(COALESCE(new.bedrooms, 0), 5), COUNT(*), MIN(p.price_lkr),
+         (SELECT m.price_lkr FROM properties m WHERE m.status = 'available' AND m.city = new.city AND m.property_type = new.property_type AND m.purpose IS new.purpose AND MIN(COALESCE(m.bedrooms, 0), 5) = MIN(COALESCE(new.bedrooms, 0), 5) AND m.price_lkr IS NOT NULL
+           ORDER BY m.price_lkr LIMIT 1 OFFSET (SELECT (COUNT(c.price_lkr) - 1) / 2 FROM properties c WHERE c.status = 'available' AND c.city = new.city AND c.property_type = new.property_type AND c.purpose IS new.purpose AND MIN(COALESCE(c.bedrooms, 0), 5) = MIN(COALESCE(new.bedrooms, 0), 5))),
+         MAX(p.price_lkr)
+    FROM properties p WHERE p.status = 'available' AND p.city = new.city AND p.property_type = new.property_type AND p.purpose IS new.purpose AND MIN(COALESCE(p.bedrooms, 0), 5) = MIN(COALESCE(new.bedrooms, 0), 5) GROUP BY p.city;
+END;
+
+CREATE TRIGGER IF NOT EXISTS listing_facets_ad AFTER DELETE ON properties
+WHEN old.status = 'available' AND old.city IS NOT NULL BEGIN
+  DELETE FROM listing_facets WHERE city = old.city AND property_type = old.property_type
+     AND purpose IS old.purpose AND beds_bucket = MIN(COALESCE(old.bedrooms, 0), 5);
+  INSERT INTO listing_facets(city, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price)
+  SELECT old.city, old.property_type, old.purpose, MIN(COALESCE(old.bedrooms, 0), 5), COUNT(*), MIN(p.price_lkr),
+         (SELECT m.price_lkr FROM properties m WHERE m.status = 'available' AND m.city = old.city AND m.property_type = old.property_type AND m.purpose IS old.purpose AND MIN(COALESCE(m.bedrooms, 0), 5) = MIN(COALESCE(old.bedrooms, 0), 5) AND m.price_lkr IS NOT NULL
+           ORDER BY m.price_lkr LIMIT 1 OFFSET (SELECT (COUNT(c.price_lkr) - 1) / 2 FROM properties c WHERE c.status = 'available' AND c.city = old.city AND c.property_type = old.property_type AND c.purpose IS old.purpose AND MIN(COALESCE(c.bedrooms, 0), 5) = MIN(COALESCE(old.bedrooms, 0), 5))),
+         MAX(p.price_lkr)
+    FROM properties p WHERE p.status = 'available' AND p.city = old.city AND p.property_type = old.property_type AND p.purpose IS old.purpose AND MIN(COALESCE(p.bedrooms, 0), 5) = MIN(COALESCE(old.bedrooms, 0), 5) GROUP BY p.city;
+END;
+
+CREATE TRIGGER IF NOT EXISTS listing_facets_au_old AFTER UPDATE OF city, property_type, purpose, bedrooms, price_lkr, status ON properties
+WHEN old.status = 'available' AND old.city IS NOT NULL BEGIN
+  DELETE FROM listing_facets WHERE city = old.city AND property_type = old.property_type
+     AND purpose IS old.purpose AND beds_bucket = MIN(COALESCE(old.bedrooms, 0), 5);
+  INSERT INTO listing_facets(city, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price)
+  SELECT old.city, old.property_type, old.purpose, MIN(COALESCE(old.bedrooms, 0), 5), COUNT(*), MIN(p.price_lkr),
+         (SELECT m.price_lkr FROM properties m WHERE m.status = 'available' AND m.city = old.city AND m.property_type = old.property_type AND m.purpose IS old.purpose AND MIN(COALESCE(m.bedrooms, 0), 5) = MIN(COALESCE(old.bedrooms, 0), 5) AND m.price_lkr IS NOT NULL
+           ORDER BY m.price_lkr LIMIT 1 OFFSET (SELECT (COUNT(c.price_lkr) - 1) / 2 FROM properties c WHERE c.status = 'available' AND c.city = old.city AND c.property_type = old.property_type AND c.purpose IS old.purpose AND MIN(COALESCE(c.bedrooms, 0), 5) = MIN(COALESCE(old.bedrooms, 0), 5))),
+         MAX(p.price_lkr)
+    FROM properties p WHERE p.status = 'available' AND p.city = old.city AND p.property_type = old.property_type AND p.purpose IS old.purpose AND MIN(COALESCE(p.bedrooms, 0), 5) = MIN(COALESCE(old.bedrooms, 0), 5) GROUP BY p.city;
+END;
+
+CREATE TRIGGER IF NOT EXISTS listing_facets_au_new AFTER UPDATE OF city, property_type, purpose, bedrooms, price_lkr, status ON properties
+WHEN new.status = 'available' AND new.city IS NOT NULL BEGIN
+  DELETE FROM listing_facets WHERE city = new.city AND property_type = new.property_type
+     AND purpose IS new.purpose AND beds_bucket = MIN(COALESCE(new.bedrooms, 0), 5);
+  INSERT INTO listing_facets(city, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price)
+  SELECT new.city, new.property_type, new.purpose, MIN(COALESCE(new.bedrooms, 0), 5), COUNT(*), MIN(p.price_lkr),
+         (SELECT m.price_lkr FROM properties m WHERE m.status = 'available' AND m.city = new.city AND m.property_type = new.property_type AND m.purpose IS new.purpose AND MIN(COALESCE(m.bedrooms, 0), 5) = MIN(COALESCE(new.bedrooms, 0), 5) AND m.price_lkr IS NOT NULL
+           ORDER BY m.price_lkr LIMIT 1 OFFSET (SELECT (COUNT(c.price_lkr) - 1) / 2 FROM properties c WHERE c.status = 'available' AND c.city = new.city AND c.property_type = new.property_type AND c.purpose IS new.purpose AND MIN(COALESCE(c.bedrooms, 0), 5) = MIN(COALESCE(new.bedrooms, 0), 5))),
+         MAX(p.price_lkr)
+    FROM properties p WHERE p.status = 'available' AND p.city = new.city AND p.property_type = new.property_type AND p.purpose IS new.purpose AND MIN(COALESCE(p.bedrooms, 0), 5) = MIN(COALESCE(new.bedrooms, 0), 5) GROUP BY p.city;
+END;
+
+COMMIT;
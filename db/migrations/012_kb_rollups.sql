@@ -0,0 +1,34 @@
+BEGIN;
+
+-- KB rollups (kb.py): chunks are updated in place, so kb_fts triggers must pass old
+-- values through 'delete' (external content) and skip updated_at/meta-only writes.
+-- app.py does the same at startup (kb.ensure) and rebuilds kb_fts once.
+DROP TRIGGER IF EXISTS kb_ai;
+DROP TRIGGER IF EXISTS kb_ad;
+DROP TRIGGER IF EXISTS kb_au;
+CREATE TRIGGER kb_ai AFTER INSERT ON kb_chunks BEGIN
+  INSERT INTO kb_fts(rowid, text, source) VALUES (new.chunk_id, new.text, new.source);
+END;
+CREATE TRIGGER kb_ad AFTER DELETE ON kb_chunks BEGIN
+  INSERT INTO kb_fts(kb_fts, rowid, text, source) VALUES ('delete', old.chunk_id, old.text, old.source);
+END;
+CREATE TRIGGER kb_au AFTER UPDATE OF text, source ON kb_chunks BEGIN
+  INSERT INTO kb_fts(kb_fts, rowid, text, source) VALUES ('delete', old.chunk_id, old.text, old.source);
+  INSERT INTO kb_fts(rowid, text, source) VALUES (new.chunk_id, new.text, new.source);
+END;
+INSERT INTO kb_fts(kb_fts) VALUES ('rebuild');
+CREATE INDEX IF NOT EXISTS idx_kb_chunks_source ON kb_chunks(source);
+
+-- Investments generation counter: the rollup scheduler's watermark is (catalog, investments).
+INSERT OR IGNORE INTO data_versions(name, version) VALUES ('investments', 0);
+CREATE TRIGGER IF NOT EXISTS dv_investments_i AFTER INSERT ON investments BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'investments';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_investments_u AFTER UPDATE ON investments BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'investments';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_investments_d AFTER DELETE ON investments BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'investments';
+END;
+
+COMMIT;
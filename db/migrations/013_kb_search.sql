@@ -0,0 +1,19 @@
+BEGIN;
+
+-- KB retrieval (kb_search.py): the term list queries are compiled against, and a
+-- generation counter so the cached terms / chunk texts reload after kb_chunks writes.
+-- app.py also creates these at startup (kb.ensure, data_versions.ensure).
+CREATE VIRTUAL TABLE IF NOT EXISTS kb_fts_vocab USING fts5vocab(kb_fts, 'row');
+
+INSERT OR IGNORE INTO data_versions(name, version) VALUES ('kb', 0);
+CREATE TRIGGER IF NOT EXISTS dv_kb_chunks_i AFTER INSERT ON kb_chunks BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'kb';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_kb_chunks_u AFTER UPDATE ON kb_chunks BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'kb';
+END;
+CREATE TRIGGER IF NOT EXISTS dv_kb_chunks_d AFTER DELETE ON kb_chunks BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'kb';
+END;
+
+COMMIT;
@@ -0,0 +1,12 @@
+BEGIN;
+
+-- listing_facets gains district (chat search matches a place against city OR district).
+-- The table is derived: drop it and its triggers; app.py recreates and fills it at
+-- startup (facets.ensure), or run scripts/refresh_facets.py.
+DROP TRIGGER IF EXISTS listing_facets_ai;
+DROP TRIGGER IF EXISTS listing_facets_ad;
+DROP TRIGGER IF EXISTS listing_facets_au_old;
+DROP TRIGGER IF EXISTS listing_facets_au_new;
+DROP TABLE IF EXISTS listing_facets;
+
+COMMIT;
@@ -270,23 +270,22 @@ END;
 -- ---------- Full-Text Search (FTS5) ----------
 -- Properties FTS
 CREATE VIRTUAL TABLE property_fts USING fts5(
-  title, description, city, district,
+  title, description, city, district, property_type,
   content='properties', content_rowid='property_id'
 );
 
--- keep FTS in sync
-CREATE TRIGGER property_ai AFTER INSERT ON properties BEGIN
-  INSERT INTO property_fts(rowid,title,description,city,district)
-  VALUES (new.property_id, new.title, new.description, new.city, new.district);
+-- keep FTS in sync (external content: removals pass the old values via 'delete')
+CREATE TRIGGER property_fts_ai AFTER INSERT ON properties BEGIN
+  INSERT INTO property_fts(rowid, title, description, city, district, property_type) VALUES (new.property_id, new.title, new.description, new.city, new.district, new.property_type);
 END;
-CREATE TRIGGER property_ad AFTER DELETE ON properties BEGIN
-  DELETE FROM property_fts WHERE rowid = old.property_id;
+CREATE TRIGGER property_fts_ad AFTER DELETE ON properties BEGIN
+  INSERT INTO property_fts(property_fts, rowid, title, description, city, district, property_type) VALUES ('delete', old.property_id, old.title, old.description, old.city, old.district, old.property_type);
 END;
-CREATE TRIGGER property_au AFTER UPDATE ON properties BEGIN
-  DELETE FROM property_fts WHERE rowid = old.property_id;
-  INSERT INTO property_fts(rowid,title,description,city,district)
-  VALUES (new.property_id, new.title, new.description, new.city, new.district);
+CREATE TRIGGER property_fts_au AFTER UPDATE OF title, description, city, district, property_type ON properties BEGIN
+  INSERT INTO property_fts(property_fts, rowid, title, description, city, district, property_type) VALUES ('delete', old.property_id, old.title, old.description, old.city, old.district, old.property_type);
+  INSERT INTO property_fts(rowid, title, description, city, district, property_type) VALUES (new.property_id, new.title, new.description, new.city, new.district, new.property_type);
 END;
+CREATE VIRTUAL TABLE IF NOT EXISTS property_fts_vocab USING fts5vocab(property_fts, 'row');
 
 -- KB FTS
 CREATE VIRTUAL TABLE kb_fts USING fts5(
@@ -297,10 +296,10 @@ CREATE TRIGGER kb_ai AFTER INSERT ON kb_chunks BEGIN
   INSERT INTO kb_fts(rowid,text,source) VALUES (new.chunk_id, new.text, new.source);
 END;
 CREATE TRIGGER kb_ad AFTER DELETE ON kb_chunks BEGIN
-  DELETE FROM kb_fts WHERE rowid = old.chunk_id;
+  INSERT INTO kb_fts(kb_fts, rowid, text, source) VALUES ('delete', old.chunk_id, old.text, old.source);
 END;
-CREATE TRIGGER kb_au AFTER UPDATE ON kb_chunks BEGIN
-  DELETE FROM kb_fts WHERE rowid = old.chunk_id;
+CREATE TRIGGER kb_au AFTER UPDATE OF text, source ON kb_chunks BEGIN
+  INSERT INTO kb_fts(kb_fts, rowid, text, source) VALUES ('delete', old.chunk_id, old.text, old.source);
   INSERT INTO kb_fts(rowid,text,source) VALUES (new.chunk_id, new.text, new.source);
 END;
 
@@ -0,0 +1,212 @@
+# db_pool.py
+"""
+Shared SQLite connection pool for app.py and db.py.
+
+Connections are opened once, tuned once (WAL, synchronous=NORMAL, foreign_keys,
+cache_size, mmap_size) and then reused. A thread keeps the same connection for
+the whole of a lease, so nested `with pool.connection()` blocks join the outer
+transaction instead of opening a second handle. Writers and read-only handles
+are pooled separately.
+"""
+import os, sqlite3, threading, time, urllib.parse
+
+CACHE_KB  = int(os.getenv("REALTY_DB_CACHE_KB", "20000"))   # page cache per connection (KiB)
+MMAP_MB   = int(os.getenv("REALTY_DB_MMAP_MB", "128"))      # memory-mapped I/O window
+BUSY_MS   = int(os.getenv("REALTY_DB_BUSY_MS", "5000"))     # wait for the writer lock
+MAX_IDLE  = int(os.getenv("REALTY_DB_POOL_IDLE", "8"))      # idle handles kept per role
+PING_AFTER_S = float(os.getenv("REALTY_DB_PING_S", "30"))   # health-check handles idle longer than this
+
+class _Handle:
+    __slots__ = ("cx", "role", "depth", "last_used")
+    def __init__(self, cx, role):
+        self.cx, self.role, self.depth, self.last_used = cx, role, 0, time.monotonic()
+
+class _Lease:
+    """`with` wrapper around a pooled connection: sets row_factory for the block,
+    commits/rolls back when the outermost writer lease ends, never closes."""
+    __slots__ = ("pool", "role", "row_factory", "handle", "prev_factory")
+    def __init__(self, pool, role, row_factory):
+        self.pool, self.role, self.row_factory = pool, role, row_factory
+        self.handle = self.prev_factory = None
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.handle = self.pool._acquire(self.role)
+        self.prev_factory = self.handle.cx.row_factory
+        self.handle.cx.row_factory = self.row_factory
+        return self.handle.cx
+
+    def __exit__(self, exc_type, exc, tb):
+        h = self.handle
+        h.cx.row_factory = self.prev_factory
+        self.pool._release(h, failed=exc_type is not None)
+        return False
+
+class ConnectionPool:
+    def __init__(self, path):
+        self.path = os.path.abspath(str(path))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._idle = {"rw": [], "ro": []}
+        self._in_use = {"rw": 0, "ro": 0}
+        self._pid = os.getpid()
+        self._stats = {"opened": 0, "closed": 0, "checkouts": 0, "reused": 0,
+                       "nested": 0, "reconnects": 0, "ro_fallbacks": 0, "errors": 0}
+
+    # ---- public API ----
+    def connection(self, readonly: bool = False, row_factory=sqlite3.Row) -> _Lease:
+        return _Lease(self, "ro" if readonly else "rw", row_factory)
+
+    def writer(self, row_factory=sqlite3.Row) -> _Lease:
+        return self.connection(False, row_factory)
+
+    def reader(self, row_factory=sqlite3.Row) -> _Lease:
+        return self.connection(True, row_factory)
+
+    def health(self) -> dict:
+        out = {"ok": True}
+        for role in ("rw", "ro"):
+            t0 = time.perf_counter()
+            try:
+                with _Lease(self, role, None) as cx:
+                    cx.execute("SELECT 1").fetchone()
+                out[role] = {"ok": True, "ms": round((time.perf_counter() - t0) * 1000, 2)}
+            except Exception as e:
+                out[role] = {"ok": False, "error": str(e)}
+                out["ok"] = False
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, path=self.path,
+                        idle={r: len(v) for r, v in self._idle.items()},
+                        in_use=dict(self._in_use),
+                        pragmas={"cache_kb": CACHE_KB, "mmap_mb": MMAP_MB, "busy_ms": BUSY_MS})
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {"rw": [], "ro": []}
+        for handles in idle.values():
+            for h in handles:
+                self._close(h)
+
+    # ---- internals ----
+    def _held(self) -> dict:
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = {}
+        return held
+
+    def _acquire(self, role: str) -> _Handle:
+        self._check_fork()
+        held = self._held()
+        # A thread that already holds the writer reads through it too (sees its own writes).
+        h = held.get(role) or (held.get("rw") if role == "ro" else None)
+        if h is not None:
+            h.depth += 1
+            with self._lock: self._stats["nested"] += 1
+            return h
+        with self._lock:
+            self._stats["checkouts"] += 1
+            h = self._idle[role].pop() if self._idle[role] else None
+            if h: self._stats["reused"] += 1
+            self._in_use[role] += 1
+        try:
+            if h is not None and time.monotonic() - h.last_used > PING_AFTER_S and not self._ping(h):
+                self._close(h); h = None
+                with self._lock: self._stats["reconnects"] += 1
+            if h is None:
+                h = self._open(role)
+        except Exception:
+            with self._lock:
+                self._in_use[role] -= 1
+                self._stats["errors"] += 1
+            raise
+        h.depth = 1
+        held[role] = h
+        return h
+
+    def _release(self, h: _Handle, failed: bool) -> None:
+        h.depth -= 1
+        if h.depth > 0:
+            return
+        held = self._held()
+        if held.get(h.role) is h:
+            del held[h.role]
+        broken = False
+        try:
+            if h.cx.in_transaction:
+                h.cx.rollback() if (failed or h.role == "ro") else h.cx.commit()
+        except sqlite3.Error:
+            broken = True
+            with self._lock: self._stats["errors"] += 1
+        h.cx.row_factory = None
+        h.last_used = time.monotonic()
+        with self._lock:
+            self._in_use[h.role] -= 1
+            keep = not broken and os.getpid() == self._pid and len(self._idle[h.role]) < MAX_IDLE
+            if keep: self._idle[h.role].append(h)
+        if not keep:
+            self._close(h)
+
+    def _open(self, role: str) -> _Handle:
+        cx = None
+        if role == "ro":
+            try:
+                uri = "file:" + urllib.parse.quote(self.path) + "?mode=ro"
+                cx = sqlite3.connect(uri, uri=True, timeout=BUSY_MS / 1000, check_same_thread=False)
+                cx.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            except sqlite3.Error:
+                # DB not created yet (or -shm not readable): fall back to a normal handle.
+                if cx is not None: cx.close()
+                cx = None
+                with self._lock: self._stats["ro_fallbacks"] += 1
+        if cx is None:
+            cx = sqlite3.connect(self.path, timeout=BUSY_MS / 1000, check_same_thread=False)
+        self._tune(cx, role)
+        with self._lock: self._stats["opened"] += 1
+        return _Handle(cx, role)
+
+    @staticmethod
+    def _tune(cx: sqlite3.Connection, role: str) -> None:
+        pragmas = [f"PRAGMA busy_timeout={BUSY_MS}", "PRAGMA foreign_keys=ON",
+                   "PRAGMA synchronous=NORMAL", f"PRAGMA cache_size=-{CACHE_KB}",
+                   f"PRAGMA mmap_size={MMAP_MB * 1024 * 1024}", "PRAGMA temp_store=MEMORY"]
+        pragmas.insert(0, "PRAGMA journal_mode=WAL" if role == "rw" else "PRAGMA query_only=ON")
+        for p in pragmas:
+            try: cx.execute(p).fetchall()
+            except sqlite3.Error: pass
+
+    @staticmethod
+    def _ping(h: _Handle) -> bool:
+        try:
+            h.cx.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _close(self, h: _Handle) -> None:
+        try: h.cx.close()
+        except Exception: pass
+        with self._lock: self._stats["closed"] += 1
+
+    def _check_fork(self) -> None:
+        # Handles must not cross a fork (gunicorn --preload): each worker builds its own pool.
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._pid = os.getpid()
+                    self._idle = {"rw": [], "ro": []}
+                    self._in_use = {"rw": 0, "ro": 0}
+                    self._local = threading.local()
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(path) -> ConnectionPool:
+    """One pool per database file, shared by every module that opens it."""
+    key = os.path.abspath(str(path))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(key)
+        return pool
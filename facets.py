@@ -0,0 +1,228 @@
+# facets.py
+"""
+Listing facets: per (city, district, property_type, purpose, bedroom bucket) the
+number of available listings and their min / median / max price. Chat search
+matches a place against city OR district (ListingQuery.city), so FacetStore
+answers for either: a place's facets are those whose city or district is it.
+
+listing_facets is kept exact by triggers on properties: a write recomputes only
+the facet(s) of the old and new row, from idx_props_city_search (city, type,
+status, price_lkr, ...), so no request ever aggregates the whole table.
+Each trigger run re-aggregates (and, for the median, walks in price order) the
+whole facet group, so its cost grows with the group: fine for listing edits,
+slow for bulk loads, which drop the triggers (drop()) and rebuild once —
+refresh() rebuilds everything in one statement (scripts/refresh_facets.py,
+seed_listings.py, import_listings.py). The app reads the table once per catalog
+version into a FacetStore, so price hints and coverage answers are dict
+lookups.
+
+Bedroom bucket = MIN(bedrooms, BEDS_CAP), NULL as 0; "≥ n bedrooms" sums the
+buckets from n up (≥ 6 reads as ≥ 5). Median is the lower median of non-NULL
+prices; it is only reported for a single facet (medians do not combine).
+"""
+import sqlite3
+import data_versions
+
+BEDS_CAP = 5
+KEY = ("city", "district", "property_type", "purpose", "beds_bucket")
+
+DDL = """CREATE TABLE IF NOT EXISTS listing_facets (
+  city          TEXT NOT NULL,
+  district      TEXT,
+  property_type TEXT NOT NULL,
+  purpose       TEXT,
+  beds_bucket   INTEGER NOT NULL,
+  listings      INTEGER NOT NULL,
+  min_price     INTEGER,
+  median_price  INTEGER,
+  max_price     INTEGER,
+  updated_at    DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_listing_facets_key ON listing_facets(city, district, property_type, purpose, beds_bucket)"
+
+def _bucket(alias: str) -> str:
+    return f"MIN(COALESCE({alias}.bedrooms, 0), {BEDS_CAP})"
+
+def _same_group(alias: str, row: str) -> str:
+    return (f"{alias}.status = 'available' AND {alias}.city = {row}.city AND {alias}.property_type = {row}.property_type "
+            f"AND {alias}.district IS {row}.district AND {alias}.purpose IS {row}.purpose AND {_bucket(alias)} = {_bucket(row)}")
+
+def _recompute(row: str) -> str:
+    """Statements that rebuild the one facet `row` (new/old) belongs to."""
+    return f"""DELETE FROM listing_facets WHERE city = {row}.city AND district IS {row}.district AND property_type = {row}.property_type
+     AND purpose IS {row}.purpose AND beds_bucket = {_bucket(row)};
+  INSERT INTO listing_facets(city, district, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price)
+  SELECT {row}.city, {row}.district, {row}.property_type, {row}.purpose, {_bucket(row)}, COUNT(*), MIN(p.price_lkr),
+         (SELECT m.price_lkr FROM properties m WHERE {_same_group('m', row)} AND m.price_lkr IS NOT NULL
+           ORDER BY m.price_lkr LIMIT 1 OFFSET (SELECT (COUNT(c.price_lkr) - 1) / 2 FROM properties c WHERE {_same_group('c', row)})),
+         MAX(p.price_lkr)
+    FROM properties p WHERE {_same_group('p', row)} GROUP BY p.city;"""   # no rows, no facet
+
+_WATCHED = "city, district, property_type, purpose, bedrooms, price_lkr, status"
+TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS listing_facets_ai AFTER INSERT ON properties
+WHEN new.status = 'available' AND new.city IS NOT NULL BEGIN
+  {_recompute('new')}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_facets_ad AFTER DELETE ON properties
+WHEN old.status = 'available' AND old.city IS NOT NULL BEGIN
+  {_recompute('old')}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_facets_au_old AFTER UPDATE OF {_WATCHED} ON properties
+WHEN old.status = 'available' AND old.city IS NOT NULL BEGIN
+  {_recompute('old')}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_facets_au_new AFTER UPDATE OF {_WATCHED} ON properties
+WHEN new.status = 'available' AND new.city IS NOT NULL BEGIN
+  {_recompute('new')}
+END""",
+)
+TRIGGER_NAMES = ("listing_facets_ai", "listing_facets_ad", "listing_facets_au_old", "listing_facets_au_new")
+
+# the whole table in one pass; the median row is number (n+1)/2 among non-NULL prices
+_GROUP = f"p.city, p.district, p.property_type, p.purpose, {_bucket('p')}"
+REFRESH_SQL = f"""
+  INSERT INTO listing_facets(city, district, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price)
+  SELECT city, district, property_type, purpose, b, COUNT(*), MIN(price_lkr),
+         MAX(CASE WHEN price_lkr IS NOT NULL AND rn = (n + 1) / 2 THEN price_lkr END), MAX(price_lkr)
+    FROM (SELECT p.city, p.district, p.property_type, p.purpose, {_bucket('p')} AS b, p.price_lkr,
+                 ROW_NUMBER() OVER w AS rn, COUNT(p.price_lkr) OVER (PARTITION BY {_GROUP}) AS n
+            FROM properties p
+           WHERE p.status = 'available' AND p.city IS NOT NULL
+          WINDOW w AS (PARTITION BY {_GROUP} ORDER BY p.price_lkr IS NULL, p.price_lkr))
+   GROUP BY city, district, property_type, purpose, b"""
+
+def drop(cnx) -> None:
+    """Drop the triggers and the table (bulk loads, layout changes); ensure() or refresh() rebuilds."""
+    for name in TRIGGER_NAMES: cnx.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cnx.execute("DROP TABLE IF EXISTS listing_facets")
+
+def ensure(cnx) -> bool:
+    """Create the table and triggers; fills the table when it was just created (or had the
+    pre-district layout, which it replaces). True if it did."""
+    try:
+        have = {r[1] for r in cnx.execute("PRAGMA table_info(listing_facets)")}
+        if have and "district" not in have: drop(cnx)
+        fresh = not have or "district" not in have
+        cnx.execute(DDL); cnx.execute(INDEX)
+        for ddl in TRIGGERS: cnx.execute(ddl)
+        if fresh: refresh(cnx, bump=False)
+        return fresh
+    except sqlite3.Error:
+        return False   # no properties table yet
+
+def refresh(cnx, bump: bool = True) -> int:
+    """Rebuild every facet from properties (run inside a transaction). Returns the facet count."""
+    cnx.execute("DELETE FROM listing_facets")
+    n = cnx.execute(REFRESH_SQL).rowcount
+    if bump:
+        try: data_versions.bump(cnx, "catalog")   # FacetStore snapshots reload
+        except sqlite3.Error: pass
+    return n
+
+def live(cnx) -> dict:
+    """{key: (listings, min, median, max)} computed in Python from properties, for check()."""
+    groups: dict = {}
+    for city, district, ptype, purpose, beds, price in cnx.execute(
+            "SELECT city, district, property_type, purpose, bedrooms, price_lkr FROM properties "
+            "WHERE status = 'available' AND city IS NOT NULL"):
+        groups.setdefault((city, district, ptype, purpose, min(beds or 0, BEDS_CAP)), []).append(price)
+    out = {}
+    for key, prices in groups.items():
+        known = sorted(p for p in prices if p is not None)
+        out[key] = (len(prices), known[0] if known else None, known[(len(known) - 1) // 2] if known else None,
+                    known[-1] if known else None)
+    return out
+
+def check(cnx) -> list[str]:
+    """Differences between listing_facets and live aggregates (empty when consistent), then
+    between FacetStore place lookups (city or district) and the same filter run on properties."""
+    stored = {tuple(r[:5]): tuple(r[5:]) for r in cnx.execute(
+        "SELECT city, district, property_type, purpose, beds_bucket, listings, min_price, median_price, max_price FROM listing_facets")}
+    want = live(cnx)
+    problems = [f"missing {k}: {v}" for k, v in want.items() if k not in stored]
+    problems += [f"stale {k}: stored {stored[k]} live {v}" for k, v in want.items() if k in stored and stored[k] != v]
+    problems += [f"extra {k}: {v}" for k, v in stored.items() if k not in want]
+    store = load(cnx)
+    for place, in cnx.execute("SELECT DISTINCT district FROM properties WHERE status = 'available' AND district IS NOT NULL "
+                              "UNION SELECT DISTINCT city FROM properties WHERE status = 'available' AND city IS NOT NULL"):
+        n, lo, hi = cnx.execute("SELECT COUNT(*), MIN(price_lkr), MAX(price_lkr) FROM properties WHERE status = 'available' "
+                                "AND city IS NOT NULL AND (city = ? OR district = ?)", (place, place)).fetchone()
+        st = store.price_stats(place) or {"listings": 0, "min": None, "max": None}
+        if (st["listings"], st["min"], st["max"]) != (n, lo, hi):
+            problems.append(f"place {place!r}: store {(st['listings'], st['min'], st['max'])} live {(n, lo, hi)}")
+    return problems
+
+class FacetStore:
+    """In-memory listing_facets for one catalog version; every lookup is a dict hit plus a
+    scan of the facets of one place (a city, or a district: all facets in it)."""
+    def __init__(self, rows):
+        self.by_city: dict[str, list] = {}
+        self.by_place: dict[str, list] = {}   # city or district -> facets whose city or district it is
+        self.names: dict[str, str] = {}
+        self.area_cities: dict[str, dict] = {}   # district (or the city, without one) -> {city: listings}
+        for city, district, ptype, purpose, bucket, n, lo, med, hi in rows:
+            k, r = city.lower(), (ptype, purpose, bucket, n, lo, med, hi)
+            self.names.setdefault(k, city)
+            a = self.area_cities.setdefault(district or city, {})
+            a[city] = a.get(city, 0) + n
+            self.by_city.setdefault(k, []).append(r)
+            for place in {k, (district or "").lower()} - {""}:
+                self.by_place.setdefault(place, []).append(r)
+
+    def __len__(self):
+        return sum(len(v) for v in self.by_city.values())
+
+    def _rows(self, city=None, ptype=None, purpose=None, beds=None):
+        lists = [self.by_place.get(city.lower(), [])] if city else self.by_city.values()
+        beds = min(int(beds), BEDS_CAP) if beds else 0
+        for rows in lists:
+            for r in rows:
+                if (not ptype or r[0] == ptype) and (not purpose or r[1] == purpose) and r[2] >= beds:
+                    yield r
+
+    def price_stats(self, city=None, ptype=None, purpose=None, beds=None) -> dict | None:
+        """{"listings", "min", "median", "max"} for the filters (median only when one facet matches), or None."""
+        rows = list(self._rows(city, ptype, purpose, beds))
+        if not rows: return None
+        lows = [r[4] for r in rows if r[4] is not None]
+        highs = [r[6] for r in rows if r[6] is not None]
+        return {"listings": sum(r[3] for r in rows), "min": min(lows) if lows else None,
+                "median": rows[0][5] if len(rows) == 1 else None, "max": max(highs) if highs else None}
+
+    def cities(self, ptype=None) -> list[tuple[str, int]]:
+        """(city, listings) with at least one listing (of `ptype`), most first."""
+        out = [(self.names[k], sum(r[3] for r in rows if not ptype or r[0] == ptype)) for k, rows in self.by_city.items()]
+        return sorted(((c, n) for c, n in out if n), key=lambda x: (-x[1], x[0]))
+
+    def areas(self) -> list[tuple[str, int, list]]:
+        """(district, listings, its cities most first), most listings first; listings without a
+        district count under their city."""
+        out = [(d, sum(c.values()), sorted(c, key=lambda x: (-c[x], x))) for d, c in self.area_cities.items()]
+        return sorted(out, key=lambda x: (-x[1], x[0]))
+
+    def counts(self, field: int, city=None) -> dict:
+        """listings per property_type (field 0) or purpose (field 1), optionally in one city."""
+        out: dict = {}
+        for r in self._rows(city):
+            if r[field] is not None: out[r[field]] = out.get(r[field], 0) + r[3]
+        return dict(sorted(out.items(), key=lambda x: -x[1]))
+
+def load(cnx) -> FacetStore:
+    try:
+        return FacetStore(cnx.execute("SELECT city, district, property_type, purpose, beds_bucket, listings, min_price, "
+                                      "median_price, max_price FROM listing_facets").fetchall())
+    except sqlite3.Error:
+        return FacetStore([])
+
+_STORES: dict[int, data_versions.Versioned] = {}
+
+def store_for(pool) -> data_versions.Versioned:
+    """Shared FacetStore for `pool`, reloaded after listing writes ("catalog" version)."""
+    v = _STORES.get(id(pool))
+    if v is None:
+        def build():
+            with pool.reader(row_factory=None) as cnx:
+                return load(cnx)
+        v = _STORES.setdefault(id(pool), data_versions.Versioned(build, data_versions.watch(pool), "catalog"))
+    return v
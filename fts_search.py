@@ -0,0 +1,214 @@
+# fts_search.py
+"""
+Ranked full-text listing search over property_fts.
+
+User text never reaches MATCH verbatim: compile_query() keeps alphanumeric tokens,
+drops stop words, and checks each one against the FTS term list
+(property_fts_vocab, an fts5vocab table loaded into memory once per catalog
+version). A known term is matched as a quoted phrase. A token that only
+prefixes known terms becomes a quoted prefix query ("nuge" → "nuge"*). A token
+that matches nothing is dropped, and so is a term found in more than
+COMMON_DF of listings when rarer terms remain: it adds almost nothing to bm25,
+yet it would make SQLite score most of the table. search() asks for listings
+matching every term first (cheap and precise) and only tops a short page up with
+any-term (OR) matches.
+
+Ordering is one SQL expression: bm25 with per-column weights (by column name,
+so both property_fts layouts work), minus a boost for featured listings, plus
+a small penalty that grows with price relative to the budget.
+"""
+import bisect, os, re, sqlite3, threading
+import data_versions
+
+def _weights(spec: str) -> dict:
+    out = {}
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        try: out[name.strip()] = float(w)
+        except ValueError: pass
+    return out
+
+# bm25 column weights (unknown columns get 1.0)
+WEIGHTS = _weights(os.getenv("REALTY_FTS_WEIGHTS", "title=4,description=1,city=3,district=2,property_type=2"))
+FEATURED_BOOST = float(os.getenv("REALTY_FTS_FEATURED_BOOST", "1.0"))
+PRICE_WEIGHT   = float(os.getenv("REALTY_FTS_PRICE_WEIGHT", "0.5"))
+PRICE_REF      = int(os.getenv("REALTY_FTS_PRICE_REF", "100000000"))   # LKR; used when there is no budget
+COMMON_DF      = float(os.getenv("REALTY_FTS_COMMON_DF", "0.5"))
+MAX_TERMS  = 8
+MIN_PREFIX = 2
+
+STOP = {
+    "the","a","an","and","or","to","in","on","for","with","of","is","are","am",
+    "do","does","did","you","your","we","us","our","what","which","who","whom",
+    "have","has","had","me","i","please","show","list","give","properties","property","homes",   # type words stay: property_type is weighted
+    "near","nearest","any","some","can","want","looking","find","get","my","it","there","this","that","under","below",
+}
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+VOCAB_DDL = "CREATE VIRTUAL TABLE IF NOT EXISTS property_fts_vocab USING fts5vocab(property_fts, 'row')"
+
+# ---------- index layout (scripts/fts_maint.py, migration 009) ----------
+# One definition for property_fts. Older DBs have (title, description, city, district)
+# from schema.sql or (…, city, property_type) from migration 002, and schema.sql's
+# update trigger ran a plain DELETE on an external-content table.
+FTS_COLUMNS = ("title", "description", "city", "district", "property_type")
+FTS_DDL = f"""CREATE VIRTUAL TABLE property_fts USING fts5(
+  {", ".join(FTS_COLUMNS)},
+  content='properties', content_rowid='property_id'
+)"""
+_COLS_NEW = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+_COLS_OLD = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+FTS_TRIGGERS = (
+    f"""CREATE TRIGGER property_fts_ai AFTER INSERT ON properties BEGIN
+  INSERT INTO property_fts(rowid, {", ".join(FTS_COLUMNS)}) VALUES (new.property_id, {_COLS_NEW});
+END""",
+    f"""CREATE TRIGGER property_fts_ad AFTER DELETE ON properties BEGIN
+  INSERT INTO property_fts(property_fts, rowid, {", ".join(FTS_COLUMNS)}) VALUES ('delete', old.property_id, {_COLS_OLD});
+END""",
+    # price/status/updated_at writes leave the index alone
+    f"""CREATE TRIGGER property_fts_au AFTER UPDATE OF {", ".join(FTS_COLUMNS)} ON properties BEGIN
+  INSERT INTO property_fts(property_fts, rowid, {", ".join(FTS_COLUMNS)}) VALUES ('delete', old.property_id, {_COLS_OLD});
+  INSERT INTO property_fts(rowid, {", ".join(FTS_COLUMNS)}) VALUES (new.property_id, {_COLS_NEW});
+END""",
+)
+FTS_TRIGGER_NAMES = ("property_fts_ai", "property_fts_ad", "property_fts_au")
+
+def layout(cnx) -> dict:
+    """What the live DB has: columns, options, the triggers feeding property_fts, and whether it is canonical."""
+    row = cnx.execute("SELECT sql FROM sqlite_master WHERE name = 'property_fts'").fetchone()
+    if not row: return {"exists": False, "canonical": False, "columns": [], "triggers": {}}
+    sql = " ".join(row[0].split())
+    columns = [r[1] for r in cnx.execute("PRAGMA table_info(property_fts)")]
+    triggers = {name: " ".join(tsql.split()) for name, tsql in cnx.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'properties' AND sql LIKE '%property_fts%'")}
+    problems = []
+    if tuple(columns) != FTS_COLUMNS: problems.append(f"columns {columns}")
+    if set(triggers) != set(FTS_TRIGGER_NAMES): problems.append(f"triggers {sorted(triggers)}")
+    if any("DELETE FROM property_fts" in t for t in triggers.values()):
+        problems.append("plain DELETE on external-content index (drifts on update)")
+    return {"exists": True, "canonical": not problems, "problems": problems, "columns": columns,
+            "sql": sql, "triggers": triggers}
+
+def rebuild(cnx) -> None:
+    """Drop whatever property_fts layout exists and build the canonical one from properties.
+    Run inside one transaction; bumps the catalog version so term indexes reload."""
+    for name, in cnx.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'properties' "
+                             "AND sql LIKE '%property_fts%'").fetchall():
+        cnx.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    cnx.execute("DROP TABLE IF EXISTS property_fts_vocab")
+    cnx.execute("DROP TABLE IF EXISTS property_fts")
+    cnx.execute(FTS_DDL)
+    for ddl in FTS_TRIGGERS: cnx.execute(ddl)
+    cnx.execute("INSERT INTO property_fts(property_fts) VALUES ('rebuild')")
+    cnx.execute("INSERT INTO property_fts(property_fts) VALUES ('optimize')")
+    cnx.execute(VOCAB_DDL)
+    try: data_versions.bump(cnx, "catalog")
+    except sqlite3.Error: pass
+
+def ensure(cnx) -> None:
+    """The term list behind prefix expansion (needs property_fts; skipped without it)."""
+    try: cnx.execute(VOCAB_DDL)
+    except sqlite3.Error: pass
+
+def tokens(text: str | None) -> list[str]:
+    return _TOKEN.findall((text or "").lower())
+
+def _singulars(token: str) -> list[str]:
+    """token, then its singular forms (villas → villa, properties → property)."""
+    out = [token]
+    if len(token) > 3 and token.endswith("ies"): out.append(token[:-3] + "y")
+    elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"): out.append(token[:-1])
+    return out
+
+class TermIndex:
+    """Sorted FTS terms (with document counts) plus the live column layout of property_fts."""
+    def __init__(self, terms, columns=(), docs: int = 0):
+        """terms: (term, document count) pairs; docs: rows in the index."""
+        self.df = dict(terms)
+        self.terms = sorted(self.df)
+        self._set = set(self.terms)
+        self.columns = tuple(columns)
+        self.docs = docs
+
+    def common(self, token: str) -> bool:
+        return bool(self.docs) and self.df.get(token, 0) > COMMON_DF * self.docs
+
+    def __len__(self):
+        return len(self.terms)
+
+    def expand(self, token: str) -> str | None:
+        """FTS5 expression for one token: "tok", "tok"* or None (nothing in the index starts with it).
+        A plural the index does not have falls back to its singular ("houses" → "house"*)."""
+        if not self.terms: return f'"{token}"*'   # no term list: plain prefix query as before
+        for i, t in enumerate(_singulars(token)):
+            if t in self._set: return f'"{t}"' if i == 0 else f'"{t}"*'
+            if len(t) < MIN_PREFIX: continue
+            j = bisect.bisect_left(self.terms, t)
+            if j < len(self.terms) and self.terms[j].startswith(t): return f'"{t}"*'
+        return None
+
+    def bm25(self) -> str:
+        if not self.columns: return "bm25(property_fts)"
+        return "bm25(property_fts, " + ", ".join(f"{WEIGHTS.get(c, 1.0):g}" for c in self.columns) + ")"
+
+def load(cnx) -> TermIndex:
+    try: columns = [r[1] for r in cnx.execute("PRAGMA table_info(property_fts)")]
+    except sqlite3.Error: columns = []
+    try:
+        terms = cnx.execute("SELECT term, doc FROM property_fts_vocab").fetchall()
+        docs = cnx.execute("SELECT COUNT(*) FROM property_fts").fetchone()[0]
+    except sqlite3.Error:
+        terms, docs = [], 0
+    return TermIndex(terms, columns, docs)
+
+def compile_terms(words, index: TermIndex | None = None, stop=STOP) -> list[str]:
+    """Safe FTS5 terms for already-tokenised `words` (see tokens())."""
+    out, common = [], []
+    for w in dict.fromkeys(words):
+        if not w or w in stop: continue
+        expr = index.expand(w) if index is not None else f'"{w}"*'
+        if not expr: continue
+        (common if index is not None and index.common(w) else out).append(expr)
+        if len(out) == MAX_TERMS: break
+    return out or common[:MAX_TERMS]
+
+def compile_query(words, index: TermIndex | None = None, op: str = "OR") -> str | None:
+    return f" {op} ".join(compile_terms(words, index)) or None
+
+def rank_order(index: TermIndex | None, price_ref=None) -> str:
+    """ORDER BY for a ListingQuery with .match(): relevance first, then featured and price."""
+    ref = int(price_ref) if price_ref else PRICE_REF
+    score = (index.bm25() if index else "bm25(property_fts)") + f" - {FEATURED_BOOST:g} * COALESCE(p.featured, 0)"
+    if PRICE_WEIGHT:
+        score += f" + {PRICE_WEIGHT:g} * MIN(COALESCE(p.price_lkr, {ref}) * 1.0 / {ref}, 2.0)"
+    return score + ", p.property_id ASC"
+
+def search(cnx, query, words, index: TermIndex | None, k: int, price_ref=None) -> list | None:
+    """Up to k rows of ListingQuery `query` (filters and columns set) ranked by relevance,
+    or None when `words` has nothing searchable. sqlite3 errors propagate."""
+    terms = compile_terms(words, index)
+    if not terms: return None
+    order = rank_order(index, price_ref)
+    rows = cnx.execute(*query.match(" AND ".join(terms)).order_by(order).limit(k).build()).fetchall()
+    if len(terms) > 1 and len(rows) < k:
+        seen = {_row_id(r) for r in rows}
+        more = cnx.execute(*query.match(" OR ".join(terms)).limit(k + len(rows)).build()).fetchall()
+        rows += [r for r in more if _row_id(r) not in seen][:k - len(rows)]
+    return rows
+
+def _row_id(r):
+    return r["property_id"] if isinstance(r, dict) else r[0]   # dict rows (db.py) or tuples/Rows, id first
+
+_INDEXES: dict[int, data_versions.Versioned] = {}
+_LOCK = threading.Lock()
+
+def term_index(pool) -> data_versions.Versioned:
+    """Shared TermIndex for `pool`, reloaded after listing writes ("catalog" version)."""
+    with _LOCK:
+        v = _INDEXES.get(id(pool))
+        if v is None:
+            def build():
+                with pool.reader(row_factory=None) as cnx:
+                    return load(cnx)
+            v = _INDEXES[id(pool)] = data_versions.Versioned(build, data_versions.watch(pool), "catalog")
+        return v
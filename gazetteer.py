@@ -0,0 +1,75 @@
+# gazetteer.py
+"""
+In-memory place-name resolver for the city slot (app.map_area_to_city).
+
+Built once per data version from listing cities/districts, synonyms (kind
+'city'), areas (+ aliases_json) and area_aliases. Later sources win, so a
+curated alias beats a raw listing value. resolve() is a dict lookup on the
+lowercased name, then a unique prefix ("mount lav" → Mount Lavinia), then a
+trigram fuzzy match for typos ("Nugegodaa"). Numbers in the name must agree,
+so "Colombo 3" never resolves to "Colombo 5". Prefix/fuzzy answers are
+memoised per build.
+"""
+import bisect, os, re, threading
+import nlp_engine, nlp_index
+from cache import LRUCache
+
+FUZZY_MIN  = float(os.getenv("REALTY_GAZETTEER_FUZZY", "0.85"))
+PREFIX_MIN = 4    # shorter inputs only match exactly
+MEMO_SIZE  = 4096
+_DIGITS = re.compile(r"\d+")
+
+class Gazetteer:
+    def __init__(self, entries):
+        """entries: (name, canonical) pairs, lowest priority first."""
+        self.names: dict[str, str] = {}
+        for name, canon in entries:
+            k = nlp_engine.norm(name)
+            if k and canon: self.names[k] = canon
+        self.keys = sorted(self.names)
+        self.fuzzy = nlp_index.PhraseIndex((k, k) for k in self.keys)
+        self._memo = LRUCache(MEMO_SIZE)
+        self.counts = {"exact": 0, "prefix": 0, "fuzzy": 0, "miss": 0}
+        self._lock = threading.Lock()   # resolve() runs on request threads
+
+    def __len__(self):
+        return len(self.names)
+
+    def resolve(self, name: str | None) -> str | None:
+        """Canonical city/area for `name` (any case, alias, prefix or near-miss spelling), or None."""
+        k = nlp_engine.norm(name)
+        if not k: return None
+        hit = self.names.get(k)
+        how, hit = ("exact", hit) if hit is not None else self._memo.get_or_compute(k, lambda: self._near(k))
+        with self._lock: self.counts[how] += 1
+        return hit
+
+    def _near(self, k: str) -> tuple[str, str | None]:
+        digits = _DIGITS.findall(k)
+        if len(k) >= PREFIX_MIN:
+            found = set()
+            for key in self.keys[bisect.bisect_left(self.keys, k):]:
+                if not key.startswith(k): break
+                if _DIGITS.findall(key) == digits: found.add(self.names[key])
+                if len(found) > 1: break
+            if len(found) == 1: return "prefix", found.pop()
+            if found: return "miss", None   # ambiguous ("colombo" prefixes several)
+        for _, key, _ in self.fuzzy.search(k, k=3, min_ratio=FUZZY_MIN):
+            if _DIGITS.findall(key) == digits: return "fuzzy", self.names[key]
+        return "miss", None
+
+    def stats(self) -> dict:
+        with self._lock: counts = dict(self.counts)
+        return {"names": len(self.names), "memo": len(self._memo), **counts}
+
+def load(cnx) -> Gazetteer:
+    """cnx: any connection (plain tuples or sqlite3.Row). Missing tables are skipped."""
+    entries = []
+    try:
+        rows = cnx.execute("SELECT DISTINCT city, district FROM properties").fetchall()
+        entries += [(r[1], r[1]) for r in rows if r[1]]   # listing search matches district too
+        entries += [(r[0], r[0]) for r in rows if r[0]]
+    except Exception:
+        pass
+    entries += nlp_engine.load_db_aliases(cnx)["city"]   # synonyms, areas, area_aliases (in that order)
+    return Gazetteer(entries)
@@ -0,0 +1,188 @@
+# geo.py
+"""
+Nearest-listing search over properties.latitude/longitude.
+
+GridIndex buckets listings into fixed lat/lon cells (geohash-style grid,
+REALTY_GEO_CELL_DEG, default 0.01° ≈ 1.1 km) stored as flat arrays in cell
+order. knn() walks rings of cells outward from the query point, keeps the k
+best haversine distances that pass the filters and stops as soon as no
+unvisited cell can hold anything closer, or the radius is exhausted.
+
+Query points are area centroids: areas.latitude/longitude first, then the
+built-in CENTROIDS (also seeded into `areas`), then the mean position of
+listings in that city/district.
+"""
+import heapq, json, math, os, sqlite3
+from array import array
+
+EARTH_KM = 6371.0088
+KM_PER_DEG = math.pi * EARTH_KM / 180.0
+CELL_DEG = float(os.getenv("REALTY_GEO_CELL_DEG", "0.01"))
+RADIUS_KM = float(os.getenv("REALTY_GEO_RADIUS_KM", "10"))
+
+# name -> (district, lat, lon)
+CENTROIDS = {
+    "Colombo":       ("Colombo", 6.9271, 79.8612),
+    "Colombo 1":     ("Colombo", 6.9344, 79.8428),
+    "Colombo 2":     ("Colombo", 6.9240, 79.8500),
+    "Colombo 3":     ("Colombo", 6.9010, 79.8530),
+    "Colombo 4":     ("Colombo", 6.8890, 79.8560),
+    "Colombo 5":     ("Colombo", 6.8800, 79.8650),
+    "Colombo 6":     ("Colombo", 6.8740, 79.8620),
+    "Colombo 7":     ("Colombo", 6.9060, 79.8650),
+    "Colombo 8":     ("Colombo", 6.9150, 79.8780),
+    "Borella":       ("Colombo", 6.9147, 79.8778),
+    "Nugegoda":      ("Colombo", 6.8649, 79.8997),
+    "Rajagiriya":    ("Colombo", 6.9094, 79.8964),
+    "Malabe":        ("Colombo", 6.9061, 79.9696),
+    "Dehiwala":      ("Colombo", 6.8511, 79.8659),
+    "Mount Lavinia": ("Colombo", 6.8390, 79.8630),
+    "Negombo":       ("Gampaha", 7.2083, 79.8358),
+    "Galle":         ("Galle",   6.0535, 80.2210),
+    "Galle Fort":    ("Galle",   6.0260, 80.2170),
+    "Kandy":         ("Kandy",   7.2906, 80.6337),
+    "Matara":        ("Matara",  5.9549, 80.5550),
+    "Jaffna":        ("Jaffna",  9.6615, 80.0255),
+}
+
+TYPES = ("apartment", "house", "land", "townhouse", "commercial")
+PURPOSES = ("sale", "rent", "lease", "investment")
+_NONE = 255
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _code(values: tuple, v) -> int:
+    try: return values.index((v or "").lower())
+    except ValueError: return _NONE
+
+def _cell(v: float, size: float) -> int:
+    return math.floor(v / size)
+
+def _key(iy: int, ix: int) -> int:
+    return iy * 4_194_304 + ix   # ix stays well inside ±2^21 for any cell ≥ 0.0002°
+
+class GridIndex:
+    """rows: (property_id, lat, lon, property_type, purpose, price_lkr, bedrooms)."""
+    def __init__(self, rows, cell_deg: float = CELL_DEG):
+        self.cell = cell_deg
+        rows = [r for r in rows if r[1] is not None and r[2] is not None]
+        rows.sort(key=lambda r: _key(_cell(r[1], cell_deg), _cell(r[2], cell_deg)))
+        self.ids   = array("q", (r[0] for r in rows))
+        self.lat   = array("d", (r[1] for r in rows))
+        self.lon   = array("d", (r[2] for r in rows))
+        self.ptype = array("B", (_code(TYPES, r[3]) for r in rows))
+        self.purp  = array("B", (_code(PURPOSES, r[4]) for r in rows))
+        self.price = array("d", (float(r[5]) if r[5] is not None else -1.0 for r in rows))
+        self.beds  = array("h", (int(r[6]) if r[6] is not None else -1 for r in rows))
+        self.cells: dict[int, tuple[int, int]] = {}
+        start, prev = 0, None
+        for i, r in enumerate(rows):
+            k = _key(_cell(r[1], cell_deg), _cell(r[2], cell_deg))
+            if k != prev:
+                if prev is not None: self.cells[prev] = (start, i)
+                start, prev = i, k
+        if prev is not None: self.cells[prev] = (start, len(rows))
+        ys = [_cell(v, cell_deg) for v in self.lat] if rows else [0]
+        xs = [_cell(v, cell_deg) for v in self.lon] if rows else [0]
+        self.bbox = (min(ys), max(ys), min(xs), max(xs))   # in cells: rings past it are empty
+
+    def __len__(self):
+        return len(self.ids)
+
+    def knn(self, lat: float, lon: float, k: int = 6, radius_km: float = RADIUS_KM, ptype: str | None = None,
+            purpose: str | None = None, price_min=None, price_max=None, min_beds=None) -> list[tuple[float, int]]:
+        """[(distance_km, property_id)] nearest first, at most k, all within radius_km."""
+        if not len(self.ids) or k <= 0: return []
+        tcode = _code(TYPES, ptype) if ptype else None
+        pcode = _code(PURPOSES, purpose) if purpose in PURPOSES else None
+        lo = float(price_min) if price_min else None
+        hi = float(price_max) if price_max else None
+        beds = int(min_beds) if min_beds else None
+        c, cy, cx = self.cell, _cell(lat, self.cell), _cell(lon, self.cell)
+        rlat, coslat = math.radians(lat), math.cos(math.radians(lat))
+        heap: list[tuple[float, int]] = []   # (-distance, id): the current worst on top
+        ids, plat, plon, ptypes, purps, prices, bedss = self.ids, self.lat, self.lon, self.ptype, self.purp, self.price, self.beds
+        r = 0
+        while True:
+            if r == 0:
+                ring = ((cy, cx),)
+            else:
+                ring = [(cy - r, cx + d) for d in range(-r, r + 1)] + [(cy + r, cx + d) for d in range(-r, r + 1)] \
+                     + [(cy + d, cx - r) for d in range(-r + 1, r)] + [(cy + d, cx + r) for d in range(-r + 1, r)]
+            for iy, ix in ring:
+                span = self.cells.get(_key(iy, ix))
+                if span is None: continue
+                for i in range(span[0], span[1]):
+                    if tcode is not None and ptypes[i] != tcode: continue
+                    if pcode is not None and purps[i] != pcode: continue
+                    if hi is not None and not (0 <= prices[i] <= hi): continue
+                    if lo is not None and prices[i] < lo: continue
+                    if beds is not None and bedss[i] < beds: continue
+                    # haversine inlined (hot loop)
+                    p2 = math.radians(plat[i])
+                    a = math.sin((p2 - rlat) / 2) ** 2 + coslat * math.cos(p2) * math.sin(math.radians(plon[i] - lon) / 2) ** 2
+                    d = 2 * EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+                    if d > radius_km: continue
+                    if len(heap) < k: heapq.heappush(heap, (-d, ids[i]))
+                    elif d < -heap[0][0]: heapq.heapreplace(heap, (-d, ids[i]))
+            # every cell outside rings 0..r is at least r cells away along one axis
+            edge = abs(lat) + (r + 1) * c
+            gap_km = r * c * KM_PER_DEG * math.cos(math.radians(min(89.9, edge)))
+            miny, maxy, minx, maxx = self.bbox
+            covered = cy - r <= miny and cy + r >= maxy and cx - r <= minx and cx + r >= maxx
+            if covered or gap_km > radius_km or (len(heap) == k and -heap[0][0] <= gap_km):
+                break
+            r += 1
+        return sorted((-nd, pid) for nd, pid in heap)
+
+# ---------- SQLite glue ----------
+def load_index(cnx, cell_deg: float = CELL_DEG) -> GridIndex:
+    try:
+        rows = cnx.execute("""
+            SELECT property_id, latitude, longitude, property_type, purpose, price_lkr, bedrooms
+              FROM properties
+             WHERE status = 'available' AND latitude IS NOT NULL AND longitude IS NOT NULL""").fetchall()
+    except sqlite3.Error:
+        rows = []
+    return GridIndex([tuple(r) for r in rows], cell_deg)
+
+def ensure_schema(cnx) -> None:
+    """areas.latitude/longitude (added if missing) and the built-in centroids."""
+    try:
+        cols = {r[1] for r in cnx.execute("PRAGMA table_info(areas)")}
+        if not cols: return
+        for col in ("latitude", "longitude"):
+            if col not in cols: cnx.execute(f"ALTER TABLE areas ADD COLUMN {col} REAL")
+        for name, (district, lat, lon) in CENTROIDS.items():
+            cnx.execute("INSERT OR IGNORE INTO areas(name, district, latitude, longitude) VALUES (?,?,?,?)",
+                        (name, district, lat, lon))
+            cnx.execute("UPDATE areas SET latitude = ?, longitude = ? WHERE name = ? AND latitude IS NULL",
+                        (lat, lon, name))
+    except sqlite3.Error:
+        pass
+
+def area_centroid(cnx, area: str):
+    """(lat, lon, label) for an area/city name or alias, or None."""
+    if not area: return None
+    low = area.strip().lower()
+    try:
+        for name, aliases, lat, lon in cnx.execute(
+                "SELECT name, aliases_json, latitude, longitude FROM areas WHERE latitude IS NOT NULL"):
+            try: names = [name] + list(json.loads(aliases or "[]"))
+            except ValueError: names = [name]
+            if any(low == (n or "").lower() for n in names): return lat, lon, name
+    except sqlite3.Error:
+        pass
+    for name, (_, lat, lon) in CENTROIDS.items():
+        if name.lower() == low: return lat, lon, name
+    try:
+        row = cnx.execute("""SELECT AVG(latitude), AVG(longitude) FROM properties
+                              WHERE (LOWER(city) = ? OR LOWER(district) = ?) AND latitude IS NOT NULL""",
+                          (low, low)).fetchone()
+        if row and row[0] is not None: return row[0], row[1], area.strip().title()
+    except sqlite3.Error:
+        pass
+    return None
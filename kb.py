@@ -0,0 +1,257 @@
+# kb.py
+"""
+Catalog rollups in the knowledge base (kb_chunks / kb_fts).
+
+Rollups are generated KB chunks: the featured listings ("featured_rollup"), one
+snapshot per city ("city_rollup") and per property type ("type_rollup"), and
+the open investment plans ("investment_rollup"). Each chunk carries its key in
+meta ({"rollup": "city:Galle", ...}). sync() updates a chunk in place only
+when its text changed, inserts new keys and deletes keys that disappeared, so
+an unchanged catalog costs no kb_fts writes at all.
+
+RollupScheduler runs sync() on a daemon thread every REFRESH_S seconds, but
+only when the "catalog" or "investments" data version moved since the last
+run (the watermark), so an idle catalog is never re-read.
+
+kb_fts is an external-content index; the canonical triggers below pass the old
+values through the 'delete' command (schema.sql's plain DELETE left stale
+terms behind) and ignore writes to updated_at/meta.
+"""
+import datetime as dt, json, os, sqlite3, threading, time
+import data_versions, kb_search
+
+REFRESH_S  = float(os.getenv("REALTY_KB_ROLLUP_S", "60"))   # 0: no background refresh
+FEATURED_N = 3
+CITY_FEATURED_N = 2
+INVESTMENTS_N = 8
+
+SOURCES = {"featured": "featured_rollup", "city": "city_rollup", "type": "type_rollup", "investments": "investment_rollup"}
+WATERMARK = ("catalog", "investments")   # data_versions groups the rollups are built from
+
+# ---------- schema ----------
+KB_DDL = (
+    """CREATE TABLE IF NOT EXISTS kb_chunks (
+  chunk_id       INTEGER PRIMARY KEY,
+  source         TEXT NOT NULL,
+  text           TEXT NOT NULL,
+  meta           TEXT,
+  created_at     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)""",
+    "CREATE INDEX IF NOT EXISTS idx_kb_chunks_source ON kb_chunks(source)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS kb_fts USING fts5(
+  text, source,
+  content='kb_chunks', content_rowid='chunk_id'
+)""",
+)
+KB_TRIGGERS = (
+    """CREATE TRIGGER kb_ai AFTER INSERT ON kb_chunks BEGIN
+  INSERT INTO kb_fts(rowid, text, source) VALUES (new.chunk_id, new.text, new.source);
+END""",
+    """CREATE TRIGGER kb_ad AFTER DELETE ON kb_chunks BEGIN
+  INSERT INTO kb_fts(kb_fts, rowid, text, source) VALUES ('delete', old.chunk_id, old.text, old.source);
+END""",
+    """CREATE TRIGGER kb_au AFTER UPDATE OF text, source ON kb_chunks BEGIN
+  INSERT INTO kb_fts(kb_fts, rowid, text, source) VALUES ('delete', old.chunk_id, old.text, old.source);
+  INSERT INTO kb_fts(rowid, text, source) VALUES (new.chunk_id, new.text, new.source);
+END""",
+)
+
+def ensure(cnx) -> bool:
+    """kb_chunks + kb_fts with the canonical triggers. Replaces old triggers (and rebuilds
+    kb_fts, which they may have let drift) once; True when it did."""
+    for ddl in KB_DDL: cnx.execute(ddl)
+    cnx.execute(kb_search.VOCAB_DDL)   # term list for query compile (not creatable on read-only handles)
+    have = {name: " ".join(sql.split()) for name, sql in cnx.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ('kb_ai', 'kb_ad', 'kb_au')")}
+    if have == {t.split()[2]: " ".join(t.split()) for t in KB_TRIGGERS}:
+        return False
+    for name in ("kb_ai", "kb_ad", "kb_au"): cnx.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for ddl in KB_TRIGGERS: cnx.execute(ddl)
+    cnx.execute("INSERT INTO kb_fts(kb_fts) VALUES ('rebuild')")
+    return True
+
+# ---------- rollup text ----------
+def _lkr(v) -> str:
+    return f"LKR {int(v):,}" if v else "POA"
+
+def _plural(ptype: str) -> str:
+    return ptype if ptype in ("land", "commercial") else ptype + "s"
+
+def _facet_rows(cnx) -> list:
+    """(city, type, purpose, listings, min, max) per city/type/purpose: listing_facets when present."""
+    try:
+        return cnx.execute("""SELECT city, property_type, purpose, SUM(listings), MIN(min_price), MAX(max_price)
+                                FROM listing_facets GROUP BY city, property_type, purpose""").fetchall()
+    except sqlite3.Error:
+        return cnx.execute("""SELECT city, property_type, purpose, COUNT(*), MIN(price_lkr), MAX(price_lkr)
+                                FROM properties WHERE status = 'available' AND city IS NOT NULL
+                               GROUP BY city, property_type, purpose""").fetchall()
+
+def featured_text(cnx) -> str:
+    rows = cnx.execute("""SELECT title, city, price_lkr FROM properties WHERE status = 'available'
+                           ORDER BY featured DESC, created_at DESC LIMIT ?""", (FEATURED_N,)).fetchall()
+    if not rows:
+        return ("We currently have a rotating catalog of apartments, houses, and land across Colombo, Galle, and Kandy. "
+                "Ask for areas or budget to get matches.")
+    return "Top featured properties right now:\n" + "\n".join(f"- {t} — {c or ''} — {_lkr(p)}" for t, c, p in rows)
+
+def city_texts(cnx, facet_rows) -> dict:
+    cities: dict = {}
+    for city, ptype, purpose, n, lo, hi in facet_rows:
+        c = cities.setdefault(city, {"n": 0, "types": {}, "purposes": {}})
+        c["n"] += n
+        t = c["types"].setdefault(ptype, [0, None])
+        t[0] += n
+        if lo is not None: t[1] = lo if t[1] is None else min(t[1], lo)
+        c["purposes"][purpose] = c["purposes"].get(purpose, 0) + n
+    featured: dict = {}
+    for city, title, price in cnx.execute("""
+            SELECT city, title, price_lkr FROM (
+              SELECT city, title, price_lkr,
+                     ROW_NUMBER() OVER (PARTITION BY city ORDER BY created_at DESC, property_id) AS rn
+                FROM properties WHERE status = 'available' AND featured = 1 AND city IS NOT NULL)
+             WHERE rn <= ?""", (CITY_FEATURED_N,)):
+        featured.setdefault(city, []).append(f"{title} ({_lkr(price)})")
+    out = {}
+    for city, c in cities.items():
+        types = sorted(c["types"].items(), key=lambda x: (-x[1][0], x[0]))
+        text = (f"Properties in {city}: {c['n']:,} available listings — "
+                + ", ".join(f"{n:,} {_plural(t)} (from {_lkr(lo)})" for t, (n, lo) in types) + ". "
+                + "; ".join(f"{n:,} for {p}" for p, n in sorted(c["purposes"].items(), key=lambda x: -x[1]) if p) + ".")
+        if featured.get(city): text += f" Featured in {city}: " + ", ".join(featured[city]) + "."
+        out[f"city:{city}"] = text
+    return out
+
+def type_texts(facet_rows) -> dict:
+    types: dict = {}
+    for city, ptype, _, n, lo, hi in facet_rows:
+        t = types.setdefault(ptype, {"n": 0, "cities": {}, "lo": None, "hi": None})
+        t["n"] += n
+        t["cities"][city] = t["cities"].get(city, 0) + n
+        if lo is not None: t["lo"] = lo if t["lo"] is None else min(t["lo"], lo)
+        if hi is not None: t["hi"] = hi if t["hi"] is None else max(t["hi"], hi)
+    out = {}
+    for ptype, t in types.items():
+        top = sorted(t["cities"].items(), key=lambda x: (-x[1], x[0]))
+        out[f"type:{ptype}"] = (f"{_plural(ptype).capitalize()}: {t['n']:,} available across {len(top)} areas. "
+                                f"Most listings in " + ", ".join(f"{c} ({n:,})" for c, n in top[:5]) + ". "
+                                f"Prices from {_lkr(t['lo'])} to {_lkr(t['hi'])}.")
+    return out
+
+def investments_text(cnx) -> str | None:
+    try:
+        rows = cnx.execute("""SELECT plan_name, category, min_investment_lkr, expected_roi_pct, expected_yield_pct
+                                FROM investments WHERE status = 'open'
+                               ORDER BY created_at DESC, investment_id DESC LIMIT ?""", (INVESTMENTS_N,)).fetchall()
+    except sqlite3.Error:
+        return None
+    if not rows: return None
+    lines = []
+    for name, cat, min_lkr, roi, yld in rows:
+        bits = [(cat or "").replace("_", " "), f"min {_lkr(min_lkr)}" if min_lkr else None,
+                f"ROI {roi:g}%" if roi is not None else None, f"yield {yld:g}%" if yld is not None else None]
+        lines.append(f"- {name} ({', '.join(b for b in bits if b)})")
+    return "Open investment plans:\n" + "\n".join(lines)
+
+def build(cnx) -> dict:
+    """{rollup key: (source, text)} for the current catalog."""
+    facet_rows = _facet_rows(cnx)
+    out = {"featured": (SOURCES["featured"], featured_text(cnx))}
+    out.update({k: (SOURCES["city"], v) for k, v in city_texts(cnx, facet_rows).items()})
+    out.update({k: (SOURCES["type"], v) for k, v in type_texts(facet_rows).items()})
+    inv = investments_text(cnx)
+    if inv: out["investments"] = (SOURCES["investments"], inv)
+    return out
+
+# ---------- write ----------
+def sync(cnx, rollups: dict) -> dict:
+    """Make the rollup chunks equal `rollups`: UPDATE changed text in place, INSERT new keys,
+    DELETE vanished ones (and duplicates). Returns counts per action."""
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    existing: dict = {}
+    marks = ",".join("?" * len(SOURCES))
+    for chunk_id, source, text, meta in cnx.execute(
+            f"SELECT chunk_id, source, text, meta FROM kb_chunks WHERE source IN ({marks}) ORDER BY chunk_id",
+            tuple(SOURCES.values())).fetchall():
+        try: key = json.loads(meta or "{}").get("rollup")
+        except ValueError: key = None
+        key = key or ("featured" if source == SOURCES["featured"] else None)   # chunks written before keys
+        if key in existing or key not in rollups:
+            cnx.execute("DELETE FROM kb_chunks WHERE chunk_id = ?", (chunk_id,)); stats["deleted"] += 1
+        else:
+            existing[key] = (chunk_id, source, text)
+    now = dt.datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    for key, (source, text) in rollups.items():
+        meta = json.dumps({"rollup": key, "generated_at": now})
+        have = existing.get(key)
+        if have is None:
+            cnx.execute("INSERT INTO kb_chunks(source, text, meta) VALUES (?, ?, ?)", (source, text, meta)); stats["inserted"] += 1
+        elif have[1:] != (source, text):
+            cnx.execute("UPDATE kb_chunks SET source = ?, text = ?, meta = ? WHERE chunk_id = ?", (source, text, meta, have[0]))
+            stats["updated"] += 1
+        else:
+            stats["unchanged"] += 1
+    return stats
+
+def refresh(cnx) -> dict:
+    """Rebuild and sync every rollup on `cnx` (inside the caller's transaction)."""
+    return sync(cnx, build(cnx))
+
+# ---------- scheduler ----------
+class RollupScheduler:
+    """Background refresh of the rollup chunks, gated on the catalog/investments versions."""
+    def __init__(self, pool, interval_s: float = REFRESH_S):
+        self.pool, self.interval_s = pool, interval_s
+        self.watch = data_versions.watch(pool)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.watermark = None
+        self._stats = {"runs": 0, "skipped": 0, "errors": 0, "last_ms": 0.0, "last": None}
+
+    def start(self) -> "RollupScheduler":
+        if self.interval_s > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="kb-rollups", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try: self.run_once()
+            except Exception:
+                with self._lock: self._stats["errors"] += 1
+            self._stop.wait(self.interval_s)
+
+    def run_once(self, force: bool = False) -> dict | None:
+        """Refresh when the watermark moved (or `force`); None when skipped."""
+        versions = self.watch.refresh()
+        mark = tuple(versions.get(g) for g in WATERMARK)
+        with self._lock:
+            if not force and mark == self.watermark and mark != (None, None):
+                self._stats["skipped"] += 1
+                return None
+        t0 = time.perf_counter()
+        with self.pool.writer(row_factory=None) as cx:
+            cx.execute("BEGIN IMMEDIATE")
+            result = refresh(cx)
+        with self._lock:
+            self.watermark = mark
+            self._stats.update(runs=self._stats["runs"] + 1, last_ms=round((time.perf_counter() - t0) * 1000, 1), last=result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, interval_s=self.interval_s, watermark=self.watermark)
+
+_SCHEDULERS: dict[int, RollupScheduler] = {}
+
+def scheduler(pool) -> RollupScheduler:
+    s = _SCHEDULERS.get(id(pool))
+    if s is None:
+        s = _SCHEDULERS.setdefault(id(pool), RollupScheduler(pool))
+    return s
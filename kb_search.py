@@ -0,0 +1,134 @@
+# kb_search.py
+"""
+Ranked knowledge-base retrieval over kb_fts (FAQ/policy chunks, catalog rollups).
+
+Queries go through the same safe compile as listing search (fts_search.compile_terms
+against the kb_fts_vocab term list), restricted to the text column, and are
+ranked by bm25. Each hit comes back with a snippet() window or the whole chunk
+with highlight() markers; callers that want plain chunk text (the LLM context)
+ask for ids only and read text through KB.chunks(), an LRU keyed by chunk_id
+that is rebuilt per "kb" data version (kb_chunks writes).
+
+search() takes a millisecond budget enforced with a SQLite progress handler: a
+query that runs past it is interrupted and returns what the cheaper AND pass
+already found (or nothing), so the LLM context never waits on the KB.
+"""
+import os, sqlite3, threading, time
+import data_versions, fts_search
+from cache import LRUCache
+
+SNIPPET_TOKENS = int(os.getenv("REALTY_KB_SNIPPET_TOKENS", "24"))
+BUDGET_MS      = float(os.getenv("REALTY_KB_BUDGET_MS", "25"))
+CHUNK_CACHE    = int(os.getenv("REALTY_KB_CHUNK_CACHE", "2048"))
+MARK = ("[", "]")
+PROGRESS_OPS = 1000   # VM instructions between budget checks
+
+VOCAB_DDL = "CREATE VIRTUAL TABLE IF NOT EXISTS kb_fts_vocab USING fts5vocab(kb_fts, 'row')"
+
+def load_terms(cnx) -> fts_search.TermIndex:
+    try:
+        terms = cnx.execute("SELECT term, doc FROM kb_fts_vocab").fetchall()
+        docs = cnx.execute("SELECT COUNT(*) FROM kb_chunks").fetchone()[0]
+    except sqlite3.Error:
+        terms, docs = [], 0
+    return fts_search.TermIndex(terms, ("text", "source"), docs)
+
+def _run(cnx, sql, params, deadline):
+    """fetchall() that gives up at `deadline` (monotonic seconds); None when interrupted."""
+    if deadline is None:
+        return cnx.execute(sql, params).fetchall()
+    cnx.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_OPS)
+    try:
+        return cnx.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        if "interrupt" in str(e): return None
+        raise
+    finally:
+        cnx.set_progress_handler(None, 0)
+
+def search(cnx, query: str, k: int = 5, sources=None, index: fts_search.TermIndex | None = None,
+           show: str | None = "snippet", budget_ms: float | None = None) -> list:
+    """
+    Up to k (chunk_id, source, score, text) tuples best first. `text` is a snippet() window
+    (show="snippet"), the whole chunk through highlight() (show="highlight"), matches in MARK
+    brackets, or None (show=None: ids only, read text through KB.chunks()). `sources` limits
+    kb_chunks.source. [] when nothing is searchable or the budget ran out before any hit.
+    """
+    terms = fts_search.compile_terms(fts_search.tokens(query), index)
+    if not terms: return []
+    deadline = time.monotonic() + budget_ms / 1000.0 if budget_ms else None
+    shown = {"snippet": f"snippet(kb_fts, 0, '{MARK[0]}', '{MARK[1]}', '…', {SNIPPET_TOKENS})",
+             "highlight": f"highlight(kb_fts, 0, '{MARK[0]}', '{MARK[1]}')"}.get(show, "NULL")
+    where, params = "kb_fts MATCH ?", []
+    if sources:
+        sources = [sources] if isinstance(sources, str) else list(sources)
+        where += f" AND source IN ({','.join('?' * len(sources))})"
+    sql = f"SELECT rowid, source, bm25(kb_fts) AS score, {shown} FROM kb_fts WHERE {where} ORDER BY score LIMIT ?"
+    rows = _run(cnx, sql, ["text : (" + " AND ".join(terms) + ")"] + list(sources or ()) + [k], deadline) or []
+    if len(terms) > 1 and len(rows) < k and (deadline is None or time.monotonic() < deadline):
+        more = _run(cnx, sql, ["text : (" + " OR ".join(terms) + ")"] + list(sources or ()) + [k + len(rows)], deadline) or []
+        seen = {r[0] for r in rows}
+        rows += [r for r in more if r[0] not in seen][:k - len(rows)]
+    return [tuple(r) for r in rows]
+
+def latest(cnx, k: int = 5, sources=None) -> list:
+    """Newest chunks (by chunk_id, the rowid: no sort step) for queries with nothing to match."""
+    if sources:
+        sources = [sources] if isinstance(sources, str) else list(sources)
+        return [tuple(r) for r in cnx.execute(
+            f"SELECT chunk_id, source, text FROM kb_chunks WHERE source IN ({','.join('?' * len(sources))}) "
+            "ORDER BY chunk_id DESC LIMIT ?", (*sources, k))]
+    return [tuple(r) for r in cnx.execute("SELECT chunk_id, source, text FROM kb_chunks ORDER BY chunk_id DESC LIMIT ?", (k,))]
+
+class KB:
+    """Shared KB state for one pool: the term list and the chunk-text cache, both per "kb" version."""
+    def __init__(self, pool, size: int = CHUNK_CACHE):
+        self.pool = pool
+        self._state = data_versions.Versioned(self._build, data_versions.watch(pool), "kb")
+        self._size = size
+        self.searches = self.timeouts = 0
+
+    def _build(self):
+        with self.pool.reader(row_factory=None) as cx:
+            return load_terms(cx), LRUCache(self._size)
+
+    def searchable(self, query) -> bool:
+        return bool(fts_search.compile_terms(fts_search.tokens(query), self._state.get()[0]))
+
+    def search(self, cnx, query, k=5, sources=None, show="snippet", budget_ms=BUDGET_MS) -> list:
+        index = self._state.get()[0]
+        t0 = time.monotonic()
+        rows = search(cnx, query, k, sources, index, show, budget_ms)
+        self.searches += 1
+        if budget_ms and (time.monotonic() - t0) * 1000 >= budget_ms: self.timeouts += 1
+        return rows
+
+    def chunks(self, ids, cnx=None) -> dict:
+        """{chunk_id: (source, text)}; misses are read in one query."""
+        cache = self._state.get()[1]
+        out, missing = {}, []
+        for i in dict.fromkeys(ids):
+            hit = cache.get(i)
+            if hit is None: missing.append(i)
+            else: out[i] = hit
+        if missing:
+            sql = f"SELECT chunk_id, source, text FROM kb_chunks WHERE chunk_id IN ({','.join('?' * len(missing))})"
+            if cnx is not None: rows = [tuple(r) for r in cnx.execute(sql, missing)]
+            else:
+                with self.pool.reader(row_factory=None) as cx: rows = cx.execute(sql, missing).fetchall()
+            for cid, source, text in rows:
+                cache.put(cid, (source, text)); out[cid] = (source, text)
+        return out
+
+    def stats(self) -> dict:
+        index, cache = self._state.get()
+        return dict(cache.stats(), terms=len(index), searches=self.searches, over_budget=self.timeouts)
+
+_KBS: dict[int, KB] = {}
+_LOCK = threading.Lock()
+
+def kb_for(pool) -> KB:
+    with _LOCK:
+        k = _KBS.get(id(pool))
+        if k is None: k = _KBS[id(pool)] = KB(pool)
+        return k
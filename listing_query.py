@@ -0,0 +1,219 @@
+# listing_query.py
+"""
+Composable property search shared by app.py and db.py.
+
+Every slot (city/district, type, purpose, beds, baths, price bounds) becomes a
+SQL predicate on an indexed column, ordering is stable and LIMIT is applied by
+SQLite, so callers never over-fetch and filter rows in Python.
+"""
+import sqlite3
+
+CARD_COLUMNS = ("property_id", "title", "city", "property_type", "price_lkr", "bedrooms", "bathrooms",
+                "area_sqm", "land_perch", "featured", "description", "listing_code")
+
+# ties broken on property_id so pages and cache entries are deterministic
+DEFAULT_ORDER = "p.featured DESC, p.price_lkr ASC, p.property_id ASC"
+
+# Matched to the predicate shapes below. City+type searches ("(city = ? OR district = ?)
+# AND property_type = ? AND status = ? [AND price/purpose/bedrooms]") can be answered from
+# the first two (multi-index OR) or, when SQLite expects LIMIT to stop early, by walking the
+# third in ORDER BY order; type-only browsing always uses the third without a sort step.
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_props_city_search "
+    "ON properties(city, property_type, status, price_lkr, purpose, bedrooms)",
+    "CREATE INDEX IF NOT EXISTS idx_props_district_search "
+    "ON properties(district, property_type, status, price_lkr, purpose, bedrooms)",
+    "CREATE INDEX IF NOT EXISTS idx_props_type_browse "
+    "ON properties(property_type, status, featured DESC, price_lkr, property_id)",
+)
+
+def ensure_indexes(cnx) -> None:
+    for ddl in INDEXES:
+        try: cnx.execute(ddl)
+        except sqlite3.Error: pass   # properties missing or lacks a column on very old DBs
+
+def _int(v):
+    try: return int(v)
+    except (TypeError, ValueError): return None
+
+def slot_key(slots: dict) -> tuple:
+    """Hashable, canonical form of the filters from_slots() reads; equal keys build identical SQL."""
+    s = slots or {}
+    purpose = s.get("tenure") or s.get("purpose")
+    return (s.get("city") or None, s.get("type") or s.get("property_type") or None,
+            purpose if purpose in ("rent", "sale", "investment", "lease") else None,
+            _int(s.get("beds")) or None, _int(s.get("baths")) or None,
+            _int(s.get("price")), _int(s.get("price_min")), _int(s.get("price_max")))
+
+class ListingQuery:
+    def __init__(self, status: str | None = "available"):
+        self._where: list[str] = []
+        self._params: list = []
+        self._match: str | None = None
+        self._columns = "p.*"
+        self._order = DEFAULT_ORDER
+        self._limit: int | None = None
+        if status:
+            self.where("p.status = ?", status)
+
+    @classmethod
+    def from_slots(cls, slots: dict, status: str | None = "available") -> "ListingQuery":
+        """Slots as kept in the chat session (city/type/tenure/beds/price*) or passed to
+        db.search_properties (purpose/baths)."""
+        q = cls(status)
+        s = slots or {}
+        q.city(s.get("city"))
+        q.property_type(s.get("type") or s.get("property_type"))
+        q.purpose(s.get("tenure") or s.get("purpose"))
+        q.min_beds(s.get("beds"))
+        q.min_baths(s.get("baths"))
+        q.price(s.get("price"))
+        q.price_between(s.get("price_min"), s.get("price_max"))
+        return q
+
+    # ---- predicates (None means "no filter") ----
+    def where(self, clause: str, *params) -> "ListingQuery":
+        self._where.append(clause)
+        self._params.extend(params)
+        return self
+
+    def city(self, city: str | None):
+        return self.where("(p.city = ? OR p.district = ?)", city, city) if city else self
+
+    def property_type(self, ptype: str | None):
+        return self.where("p.property_type = ?", ptype) if ptype else self
+
+    def purpose(self, purpose: str | None):
+        return self.where("p.purpose = ?", purpose) if purpose in ("rent", "sale", "investment", "lease") else self
+
+    def min_beds(self, n):
+        n = _int(n)
+        return self.where("p.bedrooms >= ?", n) if n else self
+
+    def min_baths(self, n):
+        n = _int(n)
+        return self.where("p.bathrooms >= ?", n) if n else self
+
+    def price(self, exact):
+        exact = _int(exact)
+        return self.where("p.price_lkr = ?", exact) if exact is not None else self
+
+    def price_between(self, lo=None, hi=None):
+        lo, hi = _int(lo), _int(hi)
+        if lo is not None: self.where("p.price_lkr >= ?", lo)
+        if hi is not None: self.where("p.price_lkr <= ?", hi)
+        return self
+
+    def after(self, featured, price, pid):
+        """Keyset predicate: rows strictly after (featured, price_lkr, property_id) in DEFAULT_ORDER.
+        price_lkr may be NULL, which sorts before every price."""
+        f = _int(featured) or 0
+        if price is None:
+            return self.where("(p.featured < ? OR (p.featured = ? AND (p.price_lkr IS NOT NULL "
+                              "OR p.property_id > ?)))", f, f, int(pid))
+        return self.where("(p.featured < ? OR (p.featured = ? AND (p.price_lkr > ? "
+                          "OR (p.price_lkr = ? AND p.property_id > ?))))", f, f, price, price, int(pid))
+
+    def match(self, fts_query: str | None):
+        """Restrict to property_fts hits for an already-compiled FTS5 expression."""
+        self._match = fts_query or None
+        return self
+
+    # ---- shape ----
+    def select(self, *columns: str):
+        self._columns = ", ".join(c if "." in c or "(" in c else f"p.{c}" for c in columns) if columns else "p.*"
+        return self
+
+    def order_by(self, order: str):
+        self._order = order
+        return self
+
+    def limit(self, n: int | None):
+        self._limit = _int(n)
+        return self
+
+    def extend(self, other: "ListingQuery"):
+        """AND in another query's filters (e.g. a relaxation tier)."""
+        cond, params = other.predicate()
+        return self.where(cond, *params) if other._where else self
+
+    def predicate(self) -> tuple[str, list]:
+        """The filters as one boolean SQL expression (no FTS match), for use inside CASE/WHERE."""
+        return (" AND ".join(self._where) or "1"), list(self._params)
+
+    def _from_where(self) -> tuple[str, list]:
+        if self._match:
+            sql = "FROM property_fts f JOIN properties p ON p.property_id = f.rowid"
+            where, params = ["property_fts MATCH ?"] + self._where, [self._match] + self._params
+        else:
+            sql, where, params = "FROM properties p", self._where, list(self._params)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql, params
+
+    def build(self) -> tuple[str, list]:
+        body, params = self._from_where()
+        sql = f"SELECT {self._columns} {body}"
+        if self._order: sql += f" ORDER BY {self._order}"
+        if self._limit is not None:
+            sql += " LIMIT ?"; params.append(self._limit)
+        return sql, params
+
+    def aggregate(self, expr: str) -> tuple[str, list]:
+        """Same filters, one aggregate row (no ORDER BY / LIMIT)."""
+        body, params = self._from_where()
+        return f"SELECT {expr} {body}", params
+
+# ---------- relaxation ----------
+# Tried in order when the exact search is empty; every tier keeps city + type.
+RELAX_TIERS = ("exact", "drop_beds", "raise_budget", "fallback_city_type")
+BUDGET_STRETCH = 1.25
+
+def _relax_filters(slots: dict) -> list["ListingQuery"]:
+    """Predicates each tier adds on top of city + type (the last tier adds none)."""
+    s = slots or {}
+    purpose, price, lo, hi = s.get("tenure") or s.get("purpose"), s.get("price"), s.get("price_min"), s.get("price_max")
+    stretched = int(_int(hi) * BUDGET_STRETCH) if _int(hi) is not None else None
+    return [
+        ListingQuery(None).purpose(purpose).min_beds(s.get("beds")).price(price).price_between(lo, hi),
+        ListingQuery(None).purpose(purpose).price(price).price_between(lo, hi),
+        ListingQuery(None).purpose(purpose).price(price).price_between(lo, stretched),
+    ]
+
+def relaxed_query(slots: dict, k: int, columns=CARD_COLUMNS) -> tuple[str, list]:
+    """
+    All relaxation tiers in one statement. Rows matching city + type are tagged with the
+    first tier whose predicates they satisfy; only rows of the best tier present are
+    returned (in DEFAULT_ORDER), each carrying `relax_tier`. (The cheapest-listing hint
+    comes from the facet store, facets.py.)
+    """
+    s = slots or {}
+    base = ListingQuery().city(s.get("city")).property_type(s.get("type") or s.get("property_type"))
+    case, params = [], []
+    for i, q in enumerate(_relax_filters(s)):
+        cond, p = q.predicate()
+        case.append(f"WHEN {cond} THEN {i}"); params += p
+    body, body_params = base._from_where()
+    cols = ", ".join(f"p.{c}" for c in columns)
+    sql = f"""
+      SELECT * FROM (
+        SELECT t.*, MIN(t.relax_tier) OVER () AS relax_best
+          FROM (SELECT {cols}, CASE {' '.join(case)} ELSE {len(case)} END AS relax_tier
+                  {body}) t)
+       WHERE relax_tier = relax_best
+       ORDER BY featured DESC, price_lkr ASC, property_id ASC
+       LIMIT ?"""
+    return sql, params + body_params + [int(k)]
+
+def page_query(slots: dict, tier: int, after, k: int, columns=CARD_COLUMNS) -> tuple[str, list]:
+    """
+    The page after keyset `after` = (featured, price_lkr, property_id) of relaxed_query()'s
+    tier `tier` (the tier its first page came from). Tiers only loosen, so "best tier is T"
+    is the same as "matches tier T's filters"; the window pass is not needed again and the
+    keyset predicate lets SQLite resume in index order instead of counting past earlier pages.
+    """
+    s = slots or {}
+    q = ListingQuery().city(s.get("city")).property_type(s.get("type") or s.get("property_type"))
+    filters = _relax_filters(s)
+    if 0 <= tier < len(filters): q.extend(filters[tier])
+    return q.after(*after).select(*columns).limit(k).build()
@@ -0,0 +1,197 @@
+# llm.py
+"""
+OpenAI chat completions for the chatbot (optional: without the package or a key
+every call returns "" / yields nothing and callers use their canned text).
+
+OPENAI_BASE_URL points the client at any OpenAI-compatible server, e.g. the
+local stub in tools/fake_llm.py. Replies go through llm_cache (same prompt →
+same answer, concurrent identical prompts share one upstream call).
+
+Every upstream call is bounded by the chat request's Deadline (REALTY_CHAT_BUDGET_S)
+and REALTY_LLM_TIMEOUT_S, and guarded by a circuit breaker: after
+REALTY_LLM_BREAKER_FAILS consecutive errors/timeouts calls return "" at once (the
+caller's rule-based reply) until a probe succeeds after the cooldown. The bound
+is on the whole call, not each network read: a blocking completion is waited
+for on a worker thread, a stream is closed (by a timer, or between chunks) once
+its time is up, however slowly tokens trickle in, and counts as a timeout.
+"""
+import os, asyncio, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import llm_cache, resilience
+
+try:
+    from openai import OpenAI, AsyncOpenAI
+except Exception:
+    OpenAI = AsyncOpenAI = None
+
+API_KEY = os.getenv("OPENAI_API_KEY", "") or os.getenv("OPENAI_API_KEY_1", "")
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
+BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+LLM_TIMEOUT_S = float(os.getenv("REALTY_LLM_TIMEOUT_S", "8"))    # cap for one upstream call
+CHAT_BUDGET_S = float(os.getenv("REALTY_CHAT_BUDGET_S", "10"))   # whole chat request, DB work included
+MIN_CALL_S    = float(os.getenv("REALTY_LLM_MIN_CALL_S", "0.5")) # less budget left than this: don't call
+
+BREAKER = resilience.CircuitBreaker(int(os.getenv("REALTY_LLM_BREAKER_FAILS", "5")),
+                                    float(os.getenv("REALTY_LLM_BREAKER_COOLDOWN_S", "30")))
+LATENCY = resilience.LatencyHistogram()
+SKIPPED = {"no_budget": 0}
+
+# retries are left to the breaker: a retry would spend the same request budget again
+client = OpenAI(api_key=API_KEY, base_url=BASE_URL, timeout=LLM_TIMEOUT_S, max_retries=0) if (OpenAI and API_KEY) else None
+_aclient = None   # AsyncOpenAI binds to the event loop it is first used on; created lazily by asgi.py
+CACHE = llm_cache.make_cache()
+# blocking completions run here so the caller can stop waiting at the deadline; an abandoned
+# call still ends within its client timeout (REALTY_LLM_TIMEOUT_S per network operation)
+_CALLS = ThreadPoolExecutor(int(os.getenv("REALTY_LLM_THREADS", "32")), thread_name_prefix="llm")
+
+def aclient():
+    global _aclient
+    if _aclient is None and AsyncOpenAI and API_KEY:
+        _aclient = AsyncOpenAI(api_key=API_KEY, base_url=BASE_URL, timeout=LLM_TIMEOUT_S, max_retries=0)
+    return _aclient
+
+def build_messages(system_prompt: str, history: list, db_context: str) -> list:
+    messages = [{"role": "system", "content": system_prompt}]
+    if db_context: messages.append({"role": "system", "content": f"Database context:\n{db_context}"})
+    messages.extend(history)
+    return messages
+
+def _key(messages: list) -> str:
+    return llm_cache.cache_key(MODEL, TEMPERATURE, messages)
+
+# ---------- guard ----------
+def _admit(deadline) -> float | None:
+    """Time allowed for the next upstream call (start to last token), or None when it must not be made."""
+    timeout = min(LLM_TIMEOUT_S, deadline.remaining()) if deadline else LLM_TIMEOUT_S
+    if timeout < MIN_CALL_S:
+        SKIPPED["no_budget"] += 1; return None
+    return timeout if BREAKER.allow() else None
+
+def _outcome(exc: BaseException) -> str:
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in type(exc).__name__: return "timeout"
+    status = getattr(exc, "status_code", None)
+    if status is not None and status < 500 and status != 429: return "rejected"   # our request, not an outage
+    return "error"
+
+def _settle(t0: float, outcome: str) -> None:
+    LATENCY.observe(time.perf_counter() - t0, outcome)
+    if outcome == "ok": BREAKER.success()
+    elif outcome == "cancelled": BREAKER.release()
+    elif outcome != "rejected": BREAKER.failure()
+
+def _watch(resp, seconds: float) -> threading.Timer:
+    """Close the upstream stream `resp` after `seconds`, ending a read that is still waiting."""
+    t = threading.Timer(max(0.0, seconds), resp.close)
+    t.daemon = True; t.start()
+    return t
+
+def health() -> dict:
+    return {"breaker": BREAKER.stats(), "latency": LATENCY.stats(), "timeout_s": LLM_TIMEOUT_S,
+            "chat_budget_s": CHAT_BUDGET_S, "skipped_no_budget": SKIPPED["no_budget"]}
+
+# ---------- blocking ----------
+def complete(messages: list, deadline: resilience.Deadline | None = None) -> str:
+    if not client: return ""
+    def fetch():
+        timeout = _admit(deadline)
+        if timeout is None: return None   # not sent upstream (llm_cache does not count it)
+        t0 = time.perf_counter()
+        try:
+            call = _CALLS.submit(client.chat.completions.create, model=MODEL, temperature=TEMPERATURE,
+                                 messages=messages, timeout=timeout)
+            resp = call.result(timeout)   # TimeoutError: stop waiting, the thread finishes on its own
+            text = (resp.choices[0].message.content or "").strip()
+        except Exception as e:
+            _settle(t0, _outcome(e)); return ""
+        _settle(t0, "ok")
+        return text
+    return CACHE.complete(_key(messages), MODEL, fetch) if CACHE else (fetch() or "")
+
+def stream(messages: list, deadline: resilience.Deadline | None = None):
+    """Yield content deltas as they arrive; stops quietly on any API error.
+    A cached reply comes back as a single delta; a stream that finishes is cached."""
+    if not client: return
+    key = _key(messages) if CACHE else None
+    cached = CACHE.lookup(key, count_miss=True) if CACHE else None
+    if cached is not None:
+        yield cached; return
+    timeout = _admit(deadline)
+    if timeout is None: return
+    parts, t0 = [], time.perf_counter()
+    end, resp, watch = t0 + timeout, None, None
+    try:
+        resp = client.chat.completions.create(model=MODEL, temperature=TEMPERATURE,
+                                              messages=messages, stream=True, timeout=timeout)
+        watch = _watch(resp, end - time.perf_counter())
+        for chunk in resp:
+            if time.perf_counter() >= end: raise TimeoutError("stream ran past its budget")
+            if not chunk.choices: continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta); yield delta
+    except GeneratorExit:   # the browser left: if tokens were flowing the upstream is fine
+        _settle(t0, "ok" if parts else "cancelled"); raise
+    except Exception as e:
+        _settle(t0, "timeout" if time.perf_counter() >= end else _outcome(e)); return
+    finally:
+        if watch is not None: watch.cancel()
+        if resp is not None: resp.close()
+    _settle(t0, "ok")
+    if CACHE: CACHE.remember(key, MODEL, "".join(parts).strip(), time.perf_counter() - t0)
+
+# ---------- async variants (asgi.py) ----------
+async def acomplete(messages: list, deadline: resilience.Deadline | None = None) -> str:
+    c = aclient()
+    if not c: return ""
+    async def fetch():
+        timeout = _admit(deadline)
+        if timeout is None: return None   # not sent upstream (llm_cache does not count it)
+        t0 = time.perf_counter()
+        try:
+            resp = await asyncio.wait_for(
+                c.chat.completions.create(model=MODEL, temperature=TEMPERATURE, messages=messages), timeout)
+            text = (resp.choices[0].message.content or "").strip()
+        except asyncio.CancelledError:
+            _settle(t0, "cancelled"); raise
+        except Exception as e:
+            _settle(t0, _outcome(e)); return ""
+        _settle(t0, "ok")
+        return text
+    return await CACHE.acomplete(_key(messages), MODEL, fetch) if CACHE else (await fetch() or "")
+
+async def astream(messages: list, deadline: resilience.Deadline | None = None):
+    c = aclient()
+    if not c: return
+    key = _key(messages) if CACHE else None
+    cached = CACHE.lookup(key, count_miss=True) if CACHE else None
+    if cached is not None:
+        yield cached; return
+    timeout = _admit(deadline)
+    if timeout is None: return
+    parts, t0 = [], time.perf_counter()
+    end, resp = t0 + timeout, None
+    try:
+        resp = await asyncio.wait_for(c.chat.completions.create(model=MODEL, temperature=TEMPERATURE,
+                                                                messages=messages, stream=True, timeout=timeout), timeout)
+        chunks = resp.__aiter__()
+        while True:
+            try:   # each wait gets only what is left of the call's budget
+                chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, end - time.perf_counter()))
+            except StopAsyncIteration:
+                break
+            if not chunk.choices: continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta); yield delta
+    except (GeneratorExit, asyncio.CancelledError):
+        _settle(t0, "ok" if parts else "cancelled"); raise
+    except Exception as e:
+        _settle(t0, "timeout" if time.perf_counter() >= end else _outcome(e)); return
+    finally:
+        if resp is not None:
+            try: await resp.close()
+            except Exception: pass
+    _settle(t0, "ok")
+    if CACHE: CACHE.remember(key, MODEL, "".join(parts).strip(), time.perf_counter() - t0)
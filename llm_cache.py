@@ -0,0 +1,166 @@
+# llm_cache.py
+"""
+Response cache for LLM completions.
+
+Entries are keyed by a SHA-256 of (model, temperature, messages), so the same
+system prompt + DB context + history + user text is answered from memory
+(LRU with TTL) or, with REALTY_LLM_CACHE_DB set, from a small SQLite file
+shared by worker processes and restarts. Concurrent identical prompts are
+coalesced: one upstream call, every caller gets its answer. Empty replies
+(API errors) are never cached.
+
+REALTY_LLM_CACHE=0 turns it off (e.g. when varied answers are wanted at temperature > 0).
+"""
+import os, json, asyncio, hashlib, sqlite3, threading, time
+from cache import LRUCache
+
+ENABLED     = os.getenv("REALTY_LLM_CACHE", "1") != "0"
+CACHE_SIZE  = int(os.getenv("REALTY_LLM_CACHE_SIZE", "2048"))
+CACHE_TTL_S = float(os.getenv("REALTY_LLM_CACHE_TTL_S", "3600"))
+CACHE_DB    = os.getenv("REALTY_LLM_CACHE_DB", "")               # optional on-disk store
+DB_MAX_ROWS = int(os.getenv("REALTY_LLM_CACHE_DB_ROWS", "50000"))
+
+def cache_key(model: str, temperature: float, messages: list) -> str:
+    blob = json.dumps([model, temperature, messages], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class SQLiteStore:
+    """Second-level store: one autocommit connection per thread, pruned every few hundred writes."""
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL_S, max_rows: int = DB_MAX_ROWS):
+        self.path, self.ttl, self.max_rows = path, ttl, max_rows
+        self._local = threading.local()
+        self._puts = 0
+        self._cx().execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,
+            latency_ms REAL, created_at REAL NOT NULL)""")
+        self._cx().execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+
+    def _cx(self) -> sqlite3.Connection:
+        cx = getattr(self._local, "cx", None)
+        if cx is None:
+            cx = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            cx.execute("PRAGMA journal_mode=WAL"); cx.execute("PRAGMA synchronous=NORMAL")
+            self._local.cx = cx
+        return cx
+
+    def get(self, key: str):
+        try:
+            row = self._cx().execute("SELECT response, latency_ms FROM llm_cache WHERE key = ? AND created_at > ?",
+                                     (key, time.time() - self.ttl)).fetchone()
+        except sqlite3.Error:
+            return None
+        return (row[0], (row[1] or 0.0) / 1000) if row else None
+
+    def put(self, key: str, model: str, text: str, latency: float) -> None:
+        try:
+            cx = self._cx()
+            cx.execute("INSERT OR REPLACE INTO llm_cache (key, model, response, latency_ms, created_at) VALUES (?,?,?,?,?)",
+                       (key, model, text, latency * 1000, time.time()))
+            self._puts += 1
+            if self._puts % self.PRUNE_EVERY == 0: self.prune()
+        except sqlite3.Error:
+            pass
+
+    def prune(self) -> None:
+        cx = self._cx()
+        cx.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.ttl,))
+        cx.execute("""DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)""", (self.max_rows,))
+
+class _Call:
+    __slots__ = ("done", "result")
+    def __init__(self):
+        self.done, self.result = threading.Event(), ""
+
+class LLMCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL_S, db_path: str = CACHE_DB):
+        self.mem = LRUCache(maxsize, ttl)          # key -> (text, upstream latency s)
+        self.store = SQLiteStore(db_path, ttl) if db_path else None
+        self._inflight: dict[str, _Call] = {}      # threaded servers
+        self._ainflight: dict[str, asyncio.Future] = {}   # asgi.py (single event loop)
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.coalesced = self.upstream_calls = 0
+        self.saved_s = self.upstream_s = 0.0
+
+    # ---------- lookup / store ----------
+    def lookup(self, key: str, count_miss: bool = False) -> str | None:
+        item = self.mem.get(key)
+        if item is None and self.store is not None:
+            item = self.store.get(key)
+            if item is not None:
+                self.mem.put(key, item)
+                with self._lock: self.disk_hits += 1
+        if item is None:
+            if count_miss:
+                with self._lock: self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1; self.saved_s += item[1]
+        return item[0]
+
+    def remember(self, key: str, model: str, text: str, latency: float) -> None:
+        with self._lock:
+            self.upstream_calls += 1; self.upstream_s += latency
+        if not text: return
+        self.mem.put(key, (text, latency))
+        if self.store is not None: self.store.put(key, model, text, latency)
+
+    # ---------- blocking ----------
+    def complete(self, key: str, model: str, fetch) -> str:
+        """Cached answer, or fetch() once for every concurrent caller asking the same thing."""
+        text = self.lookup(key)
+        if text is not None: return text
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call(); self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            return call.result
+        t0 = time.perf_counter()
+        try:
+            text = fetch()   # None: the call was never sent (breaker open, no budget)
+            call.result = text or ""
+            if text is not None: self.remember(key, model, text, time.perf_counter() - t0)
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+            call.done.set()
+        return call.result
+
+    # ---------- asyncio ----------
+    async def acomplete(self, key: str, model: str, fetch) -> str:
+        text = self.lookup(key)
+        if text is not None: return text
+        fut = self._ainflight.get(key)
+        if fut is not None:
+            with self._lock: self.coalesced += 1
+            return await asyncio.shield(fut)   # a waiter leaving must not cancel the shared call
+        fut = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        with self._lock: self.misses += 1
+        t0 = time.perf_counter()
+        text = None
+        try:
+            text = await fetch()   # None: the call was never sent (breaker open, no budget)
+            if text is not None: self.remember(key, model, text, time.perf_counter() - t0)
+            return text or ""
+        finally:
+            self._ainflight.pop(key, None)
+            if not fut.done(): fut.set_result(text or "")   # leader cancelled: waiters fall back
+
+    def stats(self) -> dict:
+        asked = self.hits + self.coalesced + self.misses
+        return {"size": len(self.mem), "maxsize": self.mem.maxsize, "ttl_s": self.mem.ttl,
+                "disk": self.store.path if self.store else None,
+                "hits": self.hits, "disk_hits": self.disk_hits, "coalesced": self.coalesced, "misses": self.misses,
+                "hit_rate": round((self.hits + self.coalesced) / asked, 3) if asked else 0.0,
+                "upstream_calls": self.upstream_calls,
+                "avg_upstream_ms": round(self.upstream_s * 1000 / self.upstream_calls, 1) if self.upstream_calls else 0.0,
+                "saved_latency_s": round(self.saved_s, 2)}
+
+def make_cache() -> LLMCache | None:
+    return LLMCache() if ENABLED else None
@@ -0,0 +1,89 @@
+# media.py
+"""
+Primary listing images for card replies, fetched for a whole page at once.
+
+primary_images() answers from a per-property cache and sends every miss to one
+window-function query (top image per property_id, ROW_NUMBER over
+property_media), so a reply costs at most one media query however many cards it
+shows. The cache is a fresh LRU per "media" data version (triggers on
+property_media), so any media write retires it.
+
+property_media exists in three shapes (schema.sql: media_type/sort_order,
+migration 002: kind, seed_listings.py: kind/is_primary); the query is built
+from the columns the live table has.
+"""
+import os, sqlite3
+from cache import LRUCache
+import data_versions
+
+CACHE_SIZE = int(os.getenv("REALTY_MEDIA_CACHE", "8192"))
+IMAGE_KINDS = ("image", "photo")
+_NONE = ""   # cached "no image" (LRUCache.get treats None as a miss)
+
+def primary_sql(columns: set, n: int) -> str:
+    """Top-1 image per property for `n` ids, preferring is_primary, then sort_order, then the oldest row."""
+    where = [f"property_id IN ({','.join('?' * n)})", "url IS NOT NULL", "url <> ''"]
+    if "media_type" in columns: where.append("media_type = 'image'")
+    elif "kind" in columns: where.append(f"COALESCE(kind, 'image') IN ({', '.join(repr(k) for k in IMAGE_KINDS)})")
+    order = []
+    if "is_primary" in columns: order.append("COALESCE(is_primary, 0) DESC")
+    if "sort_order" in columns: order.append("COALESCE(sort_order, 9999) ASC")
+    order.append("media_id ASC")
+    return f"""
+        SELECT property_id, url FROM (
+          SELECT property_id, url, ROW_NUMBER() OVER (PARTITION BY property_id ORDER BY {', '.join(order)}) AS rn
+            FROM property_media
+           WHERE {' AND '.join(where)}
+        ) WHERE rn = 1"""
+
+class MediaCache:
+    """property_id -> primary image URL (or None), shared by every request on one pool."""
+    def __init__(self, pool, size: int = CACHE_SIZE):
+        self.pool = pool
+        self._state = data_versions.Versioned(lambda: (self._columns(), LRUCache(size)), data_versions.watch(pool), "media")
+        self.queries = 0
+
+    def _columns(self) -> set:
+        try:
+            with self.pool.reader(row_factory=None) as cx:
+                return {r[1] for r in cx.execute("PRAGMA table_info(property_media)")}
+        except sqlite3.Error:
+            return set()
+
+    def primary_images(self, ids, cnx=None) -> dict:
+        """{property_id: url or None} for `ids`; `cnx` reuses the caller's connection for the miss query."""
+        columns, cache = self._state.get()
+        out, missing = {}, []
+        for pid in dict.fromkeys(i for i in ids if i is not None):
+            url = cache.get(pid)
+            if url is None: missing.append(pid)
+            else: out[pid] = url or None
+        if missing and columns:
+            found = {}
+            try:
+                sql = primary_sql(columns, len(missing))
+                if cnx is not None:
+                    found = dict(tuple(r) for r in cnx.execute(sql, missing))
+                else:
+                    with self.pool.reader(row_factory=None) as cx:
+                        found = dict(cx.execute(sql, missing).fetchall())
+                self.queries += 1
+            except sqlite3.Error:
+                return {**out, **{pid: None for pid in missing}}
+            for pid in missing:
+                cache.put(pid, found.get(pid) or _NONE)
+                out[pid] = found.get(pid)
+        for pid in missing:
+            out.setdefault(pid, None)
+        return out
+
+    def stats(self) -> dict:
+        return dict(self._state.get()[1].stats(), queries=self.queries)
+
+_CACHES: dict[int, MediaCache] = {}
+
+def cache_for(pool) -> MediaCache:
+    c = _CACHES.get(id(pool))
+    if c is None:
+        c = _CACHES.setdefault(id(pool), MediaCache(pool))
+    return c
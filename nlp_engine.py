@@ -0,0 +1,111 @@
+# nlp_engine.py
+"""
+Compiled slot vocabularies shared by app.parse_intent_slots and nlp_slots.parse_slots.
+
+Each vocabulary (alias -> canonical) is compiled once into a single alternation
+and matched with one pass over the message. A VocabSet rebuilds all of its
+vocabularies together when the "vocab" data version moves, then swaps them in
+with one reference assignment so readers never see a half-built set.
+"""
+import json, re
+
+from data_versions import Versioned
+
+def norm(s: str | None) -> str:
+    """Lowercase with runs of whitespace collapsed: the key every text lookup (slots, phrases, places) uses."""
+    return " ".join((s or "").lower().split())
+
+class Vocabulary:
+    """Alias -> canonical matcher. Entries are given in priority order: when several
+    aliases occur in a message the one listed first wins, wherever it appears."""
+    __slots__ = ("regex", "lookup", "rank")
+
+    def __init__(self, entries, plural: bool = False):
+        self.lookup: dict[str, str] = {}
+        self.rank: dict[str, int] = {}
+        for alias, canonical in entries:
+            a = norm(alias)
+            if a and a not in self.lookup and canonical:
+                self.lookup[a] = canonical
+                self.rank[a] = len(self.rank)
+        # longest alias first so "colombo 5" beats "colombo" at the same position
+        alts = [re.escape(a).replace(r"\ ", r"\s+") for a in sorted(self.lookup, key=len, reverse=True)]
+        suffix = r"(?:es|s)?" if plural else ""
+        self.regex = re.compile(r"\b(" + "|".join(alts) + r")" + suffix + r"\b") if alts else None
+
+    def __len__(self):
+        return len(self.lookup)
+
+    def find(self, text_lower: str) -> str | None:
+        """Highest-priority canonical mentioned in an already lower-cased text."""
+        if self.regex is None or not text_lower:
+            return None
+        best = None
+        for m in self.regex.finditer(text_lower):
+            a = " ".join(m.group(1).split())
+            if best is None or self.rank[a] < self.rank[best]:
+                best = a
+                if self.rank[a] == 0: break
+        return self.lookup[best] if best is not None else None
+
+    def find_all(self, text_lower: str) -> list[str]:
+        """Every canonical mentioned, in order of appearance, without duplicates."""
+        if self.regex is None or not text_lower:
+            return []
+        seen = {}
+        for m in self.regex.finditer(text_lower):
+            seen.setdefault(self.lookup[" ".join(m.group(1).split())], None)
+        return list(seen)
+
+class VocabSet(Versioned):
+    """Named vocabularies produced by `build()`, rebuilt when `watch` reports a new version."""
+    def __init__(self, build, watch=None, version_key: str = "vocab"):
+        super().__init__(build, watch, version_key)
+
+    def __getitem__(self, name: str) -> Vocabulary:
+        return self.get()[name]
+
+# ---------- DB-sourced aliases ----------
+def _cols(cnx, table: str) -> set:
+    try:
+        return {r[1] for r in cnx.execute(f"PRAGMA table_info({table})")}
+    except Exception:
+        return set()
+
+def load_db_aliases(cnx) -> dict[str, list[tuple[str, str]]]:
+    """(alias, canonical) pairs per kind from synonyms, areas, area_aliases and type_synonyms.
+    Tables that are missing or shaped differently are skipped."""
+    out: dict[str, list[tuple[str, str]]] = {"city": [], "property_type": []}
+    try:
+        for kind, canonical, alias in cnx.execute("SELECT kind, canonical, alias FROM synonyms"):
+            if kind in out:
+                out[kind].append((alias, canonical))
+    except Exception:
+        pass
+    try:
+        for name, aliases_json in cnx.execute("SELECT name, aliases_json FROM areas"):
+            out["city"].append((name, name))
+            try:
+                for a in json.loads(aliases_json or "[]"):
+                    out["city"].append((a, name))
+            except Exception:
+                pass
+    except Exception:
+        pass
+    cols = _cols(cnx, "area_aliases")
+    try:
+        if {"city", "alias"} <= cols:
+            sql = "SELECT alias, city FROM area_aliases"
+        elif {"area_id", "alias"} <= cols:
+            sql = "SELECT aa.alias, a.name FROM area_aliases aa JOIN areas a ON a.area_id = aa.area_id"
+        else:
+            sql = None
+        if sql:
+            out["city"].extend((a, c) for a, c in cnx.execute(sql))
+    except Exception:
+        pass
+    try:
+        out["property_type"].extend((a, c) for a, c in cnx.execute("SELECT alias, canonical FROM type_synonyms"))
+    except Exception:
+        pass
+    return out
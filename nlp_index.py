@@ -0,0 +1,107 @@
+# nlp_index.py
+"""
+In-memory phrase index for fuzzy lookups (intent phrases, FAQ questions).
+
+Phrases are normalized, split into padded character trigrams and put in an
+inverted index whose posting lists are ordered by phrase length. A query only
+touches phrases inside the length window a given SequenceMatcher ratio allows,
+and at strict thresholds only through its rarest grams (prefix filter). The best candidates are
+then scored with the same SequenceMatcher ratio the linear scans used, so
+thresholds keep their meaning.
+"""
+import heapq, math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from nlp_engine import norm
+
+N = 3
+MAX_CANDIDATES = 32   # candidates reranked with SequenceMatcher per query
+
+def _grams(s: str, n: int = N) -> set:
+    p = f" {s} "
+    return {p[i:i + n] for i in range(max(1, len(p) - n + 1))}
+
+class PhraseIndex:
+    def __init__(self, items, n: int = N, max_candidates: int = MAX_CANDIDATES):
+        """`items` yields (text, payload); on equal ratios earlier items win."""
+        self.n, self.max_candidates = n, max_candidates
+        entries = []
+        for seq, (text, payload) in enumerate(items):
+            t = norm(text)
+            if t: entries.append((len(t), seq, t, payload))
+        entries.sort()   # doc id order == length order, so postings are length-sorted too
+        self.texts = [e[2] for e in entries]
+        self.payloads = [e[3] for e in entries]
+        self.seq = [e[1] for e in entries]
+        self.lengths = array("i", (e[0] for e in entries))
+        self.gramsets = []
+        self.exact: dict[str, int] = {}
+        postings = defaultdict(list)
+        for i, t in enumerate(self.texts):
+            gs = frozenset(_grams(t, n))
+            self.gramsets.append(gs)
+            for g in gs: postings[g].append(i)
+            if t not in self.exact or self.seq[i] < self.seq[self.exact[t]]:
+                self.exact[t] = i
+        self.postings = {g: array("i", ids) for g, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, text: str, k: int = 5, min_ratio: float = 0.0) -> list[tuple[float, str, object]]:
+        """Top-k (ratio, phrase, payload) with ratio >= min_ratio, best first."""
+        q = norm(text)
+        if not q or not self.texts:
+            return []
+        lq = len(q)
+        if min_ratio > 0:
+            # ratio = 2M/(la+lb) <= 2*min(la,lb)/(la+lb): bounds the candidate length
+            lo_len = math.ceil(lq * min_ratio / (2 - min_ratio))
+            hi_len = math.floor(lq * (2 - min_ratio) / min_ratio)
+        else:
+            lo_len, hi_len = 0, 1 << 30
+        id_lo, id_hi = bisect_left(self.lengths, lo_len), bisect_right(self.lengths, hi_len)
+        if id_lo >= id_hi:
+            return []
+
+        qgrams = sorted(_grams(q, self.n), key=lambda g: len(self.postings.get(g, ())))
+        # Prefix filter: each unmatched character costs at most ~4 grams, so a phrase at
+        # min_ratio shares >= t grams with the query and must contain one of the rarest
+        # len - t + 1. Loose thresholds give t <= 0 and every gram is probed.
+        t = math.floor(len(qgrams) * (1 - 4 * (1 - min_ratio) / min_ratio)) if min_ratio > 0 else 0
+        qgrams_probe = qgrams[:len(qgrams) - t + 1] if t > 0 else qgrams
+        counts: dict[int, int] = {}
+        for g in qgrams_probe:
+            ids = self.postings.get(g)
+            if not ids: continue
+            for i in ids[bisect_left(ids, id_lo):bisect_left(ids, id_hi)]:
+                counts[i] = counts.get(i, 0) + 1
+        ex = self.exact.get(q)
+        if ex is not None:
+            counts[ex] = len(qgrams)
+
+        qset = frozenset(qgrams)
+        pool = heapq.nlargest(self.max_candidates * 4, counts, key=counts.__getitem__)
+        dice = lambda i: 2 * len(qset & self.gramsets[i]) / (len(qset) + len(self.gramsets[i]))
+        cands = heapq.nlargest(self.max_candidates, pool, key=dice)
+        if ex is not None and ex not in cands:
+            cands.append(ex)
+
+        out = []
+        for i in cands:
+            sm = SequenceMatcher(a=q, b=self.texts[i])
+            if sm.real_quick_ratio() < min_ratio or sm.quick_ratio() < min_ratio:
+                continue
+            r = sm.ratio()
+            if r >= min_ratio:
+                out.append((r, i))
+        out.sort(key=lambda e: (-e[0], self.seq[e[1]]))
+        return [(r, self.texts[i], self.payloads[i]) for r, i in out[:k]]
+
+    def best(self, text: str, threshold: float):
+        """(ratio, payload) of the closest phrase at or above `threshold`, else None."""
+        hits = self.search(text, k=1, min_ratio=threshold)
+        return (hits[0][0], hits[0][2]) if hits else None
@@ -1,6 +1,8 @@
 import re
 from typing import Dict, Optional
 
+from nlp_engine import Vocabulary
+
 AREA_ALIASES = {
     "cmb 05": "colombo 5",
     "cmb05": "colombo 5",
@@ -20,22 +22,24 @@ WEEKWORDS = {
     "monday","tuesday","wednesday","thursday","friday","saturday","sunday"
 }
 
+# compiled once; one pass per message
+_TYPES = Vocabulary((w, t) for t, words in TYPE_SYNONYMS.items() for w in words)
+_AREAS = Vocabulary(AREA_ALIASES.items())
+_RE_IN_CITY = re.compile(r"\bin\s+(colombo\s*\d+|colombo|galle|kandy|negombo|matara|jaffna)\b")
+_RE_CITY = re.compile(r"\b(colombo\s*\d+|colombo|galle|kandy)\b")
+
 def _find_type(q: str) -> Optional[str]:
-    for t, words in TYPE_SYNONYMS.items():
-        for w in words:
-            if re.search(rf"\b{re.escape(w)}\b", q):
-                return t
-    return None
+    return _TYPES.find(q)
 
 def _find_city(q: str) -> Optional[str]:
     ql = q.lower()
-    for k, v in AREA_ALIASES.items():
-        if k in ql:
-            return v
-    m = re.search(r"\bin\s+(colombo\s*\d+|colombo|galle|kandy|negombo|matara|jaffna)\b", ql)
+    area = _AREAS.find(ql)
+    if area:
+        return area
+    m = _RE_IN_CITY.search(ql)
     if m:
         return m.group(1).replace("  ", " ")
-    m2 = re.search(r"\b(colombo\s*\d+|colombo|galle|kandy)\b", ql)
+    m2 = _RE_CITY.search(ql)
     if m2:
         return m2.group(1)
     return None
@@ -0,0 +1,154 @@
+# prompt_budget.py
+"""
+Token-budgeted prompt assembly for the LLM fallback.
+
+pack() fits system prompt + listing context + chat history into
+REALTY_PROMPT_BUDGET tokens (counted with a local approximation, no tokenizer
+download): the latest user message always goes in, listing context gets up to
+CONTEXT_SHARE of what is left, history fills the rest newest-first (at most
+HISTORY_KEEP messages, the oldest kept one clipped if it is long), and turns
+that no longer fit are folded into one short summary line. Listings the user
+already saw as cards (assistant turns saved as "[cards:N] #id #id ...") are
+not repeated in the context. Knowledge-base lines (kb_search.py) share the
+context allowance: when there are any, KB_SHARE of it is held back from the
+listings for them (plus whatever the listings leave unused).
+"""
+import os, re, threading
+
+BUDGET_TOKENS  = int(os.getenv("REALTY_PROMPT_BUDGET", "1000"))
+CONTEXT_SHARE  = float(os.getenv("REALTY_PROMPT_CONTEXT_SHARE", "0.4"))
+KB_SHARE       = float(os.getenv("REALTY_PROMPT_KB_SHARE", "0.4"))   # of the context allowance, reserved for KB lines
+SUMMARY_TOKENS = int(os.getenv("REALTY_PROMPT_SUMMARY_TOKENS", "80"))
+HISTORY_KEEP   = int(os.getenv("REALTY_PROMPT_HISTORY_KEEP", "12"))   # most recent messages sent verbatim
+HISTORY_FETCH  = int(os.getenv("REALTY_PROMPT_HISTORY", "40"))         # messages read (older ones → summary)
+MSG_OVERHEAD   = 4                                                # role/separator tokens per chat message
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_CARDS = re.compile(r"^\[(cards|investments):(\d+)\]((?:\s+#\d+)*)")
+_ID    = re.compile(r"#(\d+)")
+
+# ---------- counting ----------
+def count_tokens(text: str) -> int:
+    """BPE-ish estimate: one token per punctuation mark, ~5 characters per word token (errs high)."""
+    return sum(1 + (len(p) - 1) // 5 for p in _PIECE.findall(text or ""))
+
+def message_tokens(messages: list) -> int:
+    return sum(count_tokens(m.get("content") or "") + MSG_OVERHEAD for m in messages)
+
+# ---------- card markers ----------
+def cards_marker(items: list, kind: str = "cards") -> str:
+    """History text for a card reply: "[cards:3] #12 #40 #7" (ids let later prompts skip them)."""
+    ids = " ".join(f"#{it['id']}" for it in items if it.get("id") is not None)
+    return f"[{kind}:{len(items)}]" + (f" {ids}" if ids else "")
+
+def shown_ids(history: list) -> set:
+    out = set()
+    for m in history:
+        hit = m.get("role") == "assistant" and _CARDS.match(m.get("content") or "")
+        if hit and hit.group(1) == "cards":
+            out.update(int(x) for x in _ID.findall(hit.group(3)))
+    return out
+
+# ---------- summary of dropped turns ----------
+MIN_CLIP_TOKENS = 40   # below this a clipped message is not worth sending
+
+def _clip(text: str, words: int = 12) -> str:
+    w = (text or "").split()
+    return " ".join(w[:words]) + ("…" if len(w) > words else "")
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    out, used = [], 1   # 1 for the ellipsis
+    for w in (text or "").split():
+        t = count_tokens(w)
+        if used + t > max_tokens: break
+        out.append(w); used += t
+    return " ".join(out) + "…"
+
+def summarise(turns: list, max_tokens: int = SUMMARY_TOKENS) -> str:
+    """One line for turns that were cut: what the user asked, how many listings were shown."""
+    asks, shown = [], 0
+    for m in turns:
+        hit = _CARDS.match(m.get("content") or "") if m.get("role") == "assistant" else None
+        if hit: shown += int(hit.group(2))
+        elif m.get("role") == "user": asks.append(f"“{_clip(m.get('content'))}”")
+    if not asks and not shown: return ""
+    head = "Earlier in this chat"
+    tail = f"; {shown} listings were shown as cards." if shown else "."
+    while asks:
+        line = f"{head} the user asked: " + "; ".join(asks) + tail
+        if count_tokens(line) <= max_tokens: return line
+        asks.pop(0)   # oldest questions go first
+    return head + tail.replace("; ", ", ", 1) if shown else ""
+
+# ---------- packing ----------
+def pack(system_prompt: str, history: list, context: list, budget: int = BUDGET_TOKENS, kb=()):
+    """
+    history: chat messages oldest-first, the current user message last.
+    context: (property_id | None, line) pairs, best first.
+    kb: knowledge-base lines, best first (KB_SHARE of the context space, more if listings leave some).
+    Returns (history, db_context, info): the messages to send and the context block
+    (both within budget) plus counts for logging.
+    """
+    history = [m for m in history if (m.get("content") or "").strip()]
+    question, older = history[-1:], history[:-1]
+    fixed = message_tokens([{"content": system_prompt}] + question)
+    left = max(0, budget - fixed)
+
+    seen = shown_ids(older)
+    lines, ctx_tokens, dup = [], count_tokens("Database context:\nTop listings:") + MSG_OVERHEAD, 0
+    ctx_budget = int(left * CONTEXT_SHARE)
+    listing_budget = ctx_budget - (int(ctx_budget * KB_SHARE) if kb else 0)
+    for pid, line in context:
+        if pid is not None and pid in seen:
+            dup += 1; continue
+        t = count_tokens(line) + 1
+        if ctx_tokens + t > listing_budget: break
+        lines.append(line); ctx_tokens += t
+    kb_lines, kb_tokens = [], count_tokens("Knowledge base:") + 2
+    for line in kb:
+        t = count_tokens(line) + 1
+        if ctx_tokens + kb_tokens + t > ctx_budget: break
+        kb_lines.append(line); kb_tokens += t
+    db_context = "Top listings:\n" + "\n".join(lines) if lines else ""
+    if kb_lines:
+        db_context += ("\n\n" if db_context else "") + "Knowledge base:\n" + "\n".join(kb_lines)
+    left -= (ctx_tokens if lines else 0) + (kb_tokens if kb_lines else 0)
+
+    sizes = [count_tokens(m["content"]) + MSG_OVERHEAD for m in older]
+    fits = len(sizes) <= HISTORY_KEEP and sum(sizes) <= left
+    room = left if fits else left - SUMMARY_TOKENS - MSG_OVERHEAD   # keep space for the summary
+    n, used, clipped = 0, 0, None
+    for t in reversed(sizes):
+        if n == HISTORY_KEEP: break
+        if used + t > room:
+            if room - used >= MIN_CLIP_TOKENS + MSG_OVERHEAD:   # long reply: keep its start
+                m = older[len(older) - n - 1]
+                clipped = {"role": m["role"], "content": clip_tokens(m["content"], room - used - MSG_OVERHEAD)}
+            break
+        n += 1; used += t
+    kept = ([clipped] if clipped else []) + older[len(older) - n:]
+    dropped = older[:len(older) - len(kept)]
+    summary = summarise(dropped) if dropped else ""
+    out = ([{"role": "system", "content": summary}] if summary else []) + kept + question
+
+    info = {"budget": budget, "history_in": len(older), "history_kept": len(kept), "clipped": bool(clipped), "summarised": len(dropped),
+            "context_in": len(context), "context_kept": len(lines), "context_deduped": dup, "kb_kept": len(kb_lines)}
+    return out, db_context, info
+
+class BudgetStats:
+    """Prompt sizes across turns (/health)."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = self.tokens = self.max_tokens = self.over_budget = self.summarised = self.deduped = 0
+
+    def record(self, tokens: int, info: dict) -> None:
+        with self._lock:
+            self.turns += 1; self.tokens += tokens; self.max_tokens = max(self.max_tokens, tokens)
+            self.over_budget += tokens > info["budget"]
+            self.summarised += bool(info["summarised"]); self.deduped += info["context_deduped"]
+
+    def stats(self) -> dict:
+        return {"budget": BUDGET_TOKENS, "turns": self.turns, "max_tokens": self.max_tokens,
+                "avg_tokens": round(self.tokens / self.turns, 1) if self.turns else 0.0,
+                "over_budget": self.over_budget, "turns_summarised": self.summarised,
+                "listings_deduped": self.deduped}
@@ -0,0 +1,96 @@
+# resilience.py
+"""
+Guards for slow or failing upstreams (the LLM): a request deadline, a
+consecutive-failure circuit breaker and a latency histogram for /health.
+"""
+import bisect, threading, time
+
+class Deadline:
+    """Absolute time budget for one chat request (monotonic clock)."""
+    __slots__ = ("at",)
+    def __init__(self, seconds: float):
+        self.at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+class CircuitBreaker:
+    """
+    closed → open after `threshold` consecutive failures (errors or timeouts);
+    open → half_open after `cooldown_s`, letting one probe call through;
+    the probe's success closes it again, a failure re-opens it.
+    """
+    def __init__(self, threshold: int = 5, cooldown_s: float = 30.0):
+        self.threshold, self.cooldown_s = threshold, cooldown_s
+        self.state, self.failures, self.opened_at = "closed", 0, 0.0
+        self._probe = False
+        self._lock = threading.Lock()
+        self.trips = self.short_circuits = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_s:
+                self.state, self._probe = "half_open", False
+            if self.state == "closed": return True
+            if self.state == "half_open" and not self._probe:
+                self._probe = True; return True
+            self.short_circuits += 1
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state, self.failures, self._probe = "closed", 0, False
+
+    def release(self) -> None:
+        """An abandoned call (the client left) says nothing about the upstream: free the probe slot."""
+        with self._lock:
+            self._probe = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state, self.opened_at, self._probe = "open", time.monotonic(), False
+                self.trips += 1
+
+    def stats(self) -> dict:
+        reopen = self.cooldown_s - (time.monotonic() - self.opened_at) if self.state == "open" else 0.0
+        return {"state": self.state, "consecutive_failures": self.failures, "threshold": self.threshold,
+                "cooldown_s": self.cooldown_s, "retry_in_s": round(max(0.0, reopen), 1),
+                "trips": self.trips, "short_circuits": self.short_circuits}
+
+class LatencyHistogram:
+    """Counts per latency bucket (upper bound in ms) and per outcome."""
+    BOUNDS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, bounds_ms=BOUNDS_MS):
+        self.bounds = tuple(bounds_ms)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.outcomes: dict[str, int] = {}
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, outcome: str = "ok") -> None:
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.total_ms += ms
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th observation (None if empty or past the last bound)."""
+        n = sum(self.counts)
+        if not n: return None
+        rank, seen = q * n, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank: return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    def stats(self) -> dict:
+        n = sum(self.counts)
+        buckets = {f"le_{b}ms": c for b, c in zip(self.bounds, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {"count": n, "avg_ms": round(self.total_ms / n, 1) if n else 0.0,
+                "p50_ms": self.quantile(0.5), "p95_ms": self.quantile(0.95), "p99_ms": self.quantile(0.99),
+                "outcomes": dict(self.outcomes), "buckets": buckets}
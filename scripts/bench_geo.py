@@ -0,0 +1,74 @@
+# scripts/bench_geo.py
+"""
+Nearest-listing search: geo.GridIndex build time and k-NN latency next to a
+linear haversine scan over the same rows (what a SQL ORDER BY distance would
+do), on synthetic listings clustered around geo.CENTROIDS. Every grid answer is
+checked against the scan; exits non-zero on a mismatch.
+
+  python scripts/bench_geo.py [--sizes 500,50000,1000000] [--queries 200]
+"""
+import argparse, heapq, random, statistics, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import geo
+
+def synthetic(n: int, seed: int = 7) -> list:
+    rnd, centres = random.Random(seed), list(geo.CENTROIDS.values())
+    rows = []
+    for pid in range(1, n + 1):
+        _, lat, lon = rnd.choice(centres)
+        rows.append((pid, rnd.gauss(lat, 0.02), rnd.gauss(lon, 0.02), rnd.choice(geo.TYPES),
+                     rnd.choice(("sale", "rent")), rnd.randrange(5, 400) * 1_000_000, rnd.randint(1, 5)))
+    return rows
+
+def linear(rows, lat, lon, k, radius_km, ptype=None, price_max=None, min_beds=None):
+    hits = ((geo.haversine_km(lat, lon, r[1], r[2]), r[0]) for r in rows
+            if (not ptype or r[3] == ptype) and (not price_max or r[5] <= price_max) and (not min_beds or r[6] >= min_beds))
+    return heapq.nsmallest(k, (h for h in hits if h[0] <= radius_km))
+
+def queries(n: int, seed: int = 11) -> list:
+    rnd, centres = random.Random(seed), list(geo.CENTROIDS.values())
+    out = []
+    for _ in range(n):
+        _, lat, lon = rnd.choice(centres)
+        filt = rnd.choice(({}, {"ptype": "apartment"}, {"ptype": "house", "min_beds": 3},
+                           {"ptype": "land", "price_max": 80_000_000}))
+        out.append((lat + rnd.uniform(-0.01, 0.01), lon + rnd.uniform(-0.01, 0.01), filt))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="500,50000,1000000")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=6)
+    args = ap.parse_args()
+    failures = 0
+    print(f"{'listings':>9} {'build s':>8} {'cells':>7} {'grid ms/q':>10} {'p95 ms':>7} {'scan ms/q':>10} {'speedup':>8} {'agree':>7}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        rows = synthetic(n)
+        t0 = time.perf_counter(); index = geo.GridIndex(rows); build = time.perf_counter() - t0
+        qs = queries(args.queries)
+        lat_ms, answers = [], []
+        for lat, lon, f in qs:
+            t0 = time.perf_counter()
+            answers.append(index.knn(lat, lon, k=args.k, radius_km=geo.RADIUS_KM, **f))
+            lat_ms.append((time.perf_counter() - t0) * 1000)
+        # the scan is slow at 1M rows: time (and check) a subset
+        m = max(5, min(len(qs), 2_000_000 // max(n, 1)))
+        t0, agree = time.perf_counter(), 0
+        for (lat, lon, f), got in zip(qs[:m], answers):
+            want = linear(rows, lat, lon, args.k, geo.RADIUS_KM, **f)
+            agree += [pid for _, pid in got] == [pid for _, pid in want] or \
+                     all(abs(a[0] - b[0]) < 1e-9 for a, b in zip(got, want)) and len(got) == len(want)
+        scan_ms = (time.perf_counter() - t0) * 1000 / m
+        grid_ms = statistics.mean(lat_ms)
+        p95 = sorted(lat_ms)[int(0.95 * (len(lat_ms) - 1))]
+        print(f"{n:>9} {build:>8.2f} {len(index.cells):>7} {grid_ms:>10.3f} {p95:>7.3f} {scan_ms:>10.2f} "
+              f"{scan_ms / grid_ms:>7.0f}x {agree:>3}/{m:<3}")
+        failures += m - agree
+    if failures:
+        print(f"FAILED: {failures} grid answers differ from the linear scan"); sys.exit(1)
+
+if __name__ == "__main__":
+    main()
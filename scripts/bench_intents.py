@@ -0,0 +1,72 @@
+# scripts/bench_intents.py
+"""
+Intent-phrase lookup: linear SequenceMatcher scan vs nlp_index.PhraseIndex
+at 100, 10k and 100k synthetic training phrases.
+
+  python scripts/bench_intents.py [--sizes 100,10000,100000] [--queries 200]
+"""
+import argparse, random, sys, time, pathlib
+from difflib import SequenceMatcher
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from nlp_index import PhraseIndex, _norm
+
+THRESHOLD = 0.88
+INTENTS = ["greet", "ask_categories", "capabilities", "bot_identity", "bot_creator", "reset",
+           "nearest_query", "investment_advice", "services_info", "coverage_info"]
+WORDS = ("what which show me find list any the a for in near to do you have can how who made "
+         "apartments houses land plots villas investments plans areas cities cover types support "
+         "colombo galle kandy borella dehiwala nugegoda cheap luxury sea view rent buy sale budget "
+         "fees valuation agent contact start over clear filters work features created").split()
+
+def make_phrases(n: int, rng: random.Random) -> list[tuple[str, str]]:
+    return [(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))), rng.choice(INTENTS))
+            for _ in range(n)]
+
+def typo(s: str, rng: random.Random) -> str:
+    if len(s) < 12 or rng.random() < 0.3:
+        return s
+    i = rng.randrange(len(s))
+    return s[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + s[i + 1:]
+
+def linear(phrases, text):
+    t, best = _norm(text), None
+    for phrase, intent in phrases:
+        r = SequenceMatcher(a=t, b=_norm(phrase)).ratio()
+        if r >= THRESHOLD and (best is None or r > best[0]):
+            best = (r, intent)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,10000,100000")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--linear-queries", type=int, default=10, help="queries timed on the slow linear scan")
+    args = ap.parse_args()
+    rng = random.Random(7)
+
+    print(f"{'phrases':>8} {'build ms':>9} {'linear ms/q':>12} {'index ms/q':>11} {'speedup':>8} {'agree':>7}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        phrases = make_phrases(n, rng)
+        queries = [typo(rng.choice(phrases)[0], rng) if rng.random() < 0.7
+                   else " ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(args.queries)]
+
+        t0 = time.perf_counter(); idx = PhraseIndex(phrases); build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        got = [idx.best(q, THRESHOLD) for q in queries]
+        t_idx = (time.perf_counter() - t0) / len(queries)
+
+        sample = queries[:args.linear_queries]
+        t0 = time.perf_counter()
+        want = [linear(phrases, q) for q in sample]
+        t_lin = (time.perf_counter() - t0) / len(sample)
+
+        # same decision: both find a >= threshold match (or neither), with the same best ratio
+        agree = sum((w is None) == (g is None) and (w is None or abs(w[0] - g[0]) < 1e-9)
+                    for w, g in zip(want, got))
+        print(f"{n:>8} {build * 1000:>9.1f} {t_lin * 1000:>12.2f} {t_idx * 1000:>11.3f} "
+              f"{t_lin / t_idx:>7.0f}x {agree:>3}/{len(sample)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# scripts/bench_llm_cache.py
+"""
+LLM response cache against the local stub (tools/fake_llm.py): upstream calls
+and latency for concurrent identical prompts (coalescing), repeats (hits),
+distinct prompts (misses), the async path and the optional SQLite store,
+next to the uncached baseline. Exits non-zero if a count is off.
+
+  python scripts/bench_llm_cache.py [--callers 50] [--ttft 0.3]
+"""
+import argparse, asyncio, json, os, socket, statistics, subprocess, sys, tempfile, time, pathlib
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def wait_port(port: int, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5): return
+        except OSError: time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on {port}")
+
+def upstream(port: int) -> int:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as r:
+        c = json.load(r)
+    return c["completions"] + c["streams"]
+
+def prompt(text: str) -> list:
+    return [{"role": "system", "content": "You are a real-estate assistant."},
+            {"role": "system", "content": "Database context:\n- 3BR apartment, Galle, LKR 72,000,000"},
+            {"role": "user", "content": text}]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--callers", type=int, default=50)
+    ap.add_argument("--ttft", type=float, default=0.3)
+    args = ap.parse_args()
+    n, tmp = args.callers, tempfile.mkdtemp(prefix="rn-llmcache-")
+
+    port = free_port()
+    fake = subprocess.Popen([sys.executable, "tools/fake_llm.py", "--port", str(port), "--quiet",
+                             "--ttft", str(args.ttft), "--token-delay", "0.002"], cwd=ROOT,
+                            stdout=subprocess.DEVNULL)
+    os.environ.update(OPENAI_API_KEY="stub", OPENAI_BASE_URL=f"http://127.0.0.1:{port}/v1",
+                      REALTY_LLM_CACHE="1", REALTY_LLM_CACHE_DB=os.path.join(tmp, "llm_cache.db"))
+    import llm, llm_cache
+    cache, failures = llm.CACHE, []
+    try:
+        wait_port(port)
+
+        def run(name, prompts, expect_upstream, use_cache=True):
+            llm.CACHE = cache if use_cache else None
+            before = upstream(port)
+            def one(p):
+                t0 = time.perf_counter(); out = llm.complete(p); return time.perf_counter() - t0, out
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(prompts)) as ex:
+                res = list(ex.map(one, prompts))
+            wall, calls = time.perf_counter() - t0, upstream(port) - before
+            report(name, len(prompts), calls, wall, [r[0] for r in res], expect_upstream)
+            if any(not r[1] for r in res): failures.append(f"{name}: empty reply")
+
+        def report(name, asked, calls, wall, lat, expect):
+            print(f"{name:<30} {asked:>6} {calls:>9} {wall * 1000:>8.0f} {statistics.median(lat) * 1000:>8.1f}")
+            if calls != expect: failures.append(f"{name}: {calls} upstream calls, expected {expect}")
+
+        print(f"{'scenario':<30} {'calls':>6} {'upstream':>9} {'wall ms':>8} {'p50 ms':>8}")
+        run("no cache (baseline)", [prompt("tell me about the market")] * n, n, use_cache=False)
+        run("identical, concurrent", [prompt("tell me about the market")] * n, 1)
+        run("identical, repeated", [prompt("tell me about the market")] * n, 0)
+        run("distinct", [prompt(f"what about area {i}") for i in range(n)], n)
+
+        async def arun():
+            async def one(p):
+                t0 = time.perf_counter(); await llm.acomplete(p); return time.perf_counter() - t0
+            before, t0 = upstream(port), time.perf_counter()
+            lat = await asyncio.gather(*(one(prompt("async: is Kandy a good investment?")) for _ in range(n)))
+            report("identical, concurrent (async)", n, upstream(port) - before, time.perf_counter() - t0, lat, 1)
+        asyncio.run(arun())
+
+        print(json.dumps(cache.stats()))
+        # a fresh process would start with an empty memory tier and read the SQLite store
+        llm.CACHE = cache = llm_cache.LLMCache(db_path=os.environ["REALTY_LLM_CACHE_DB"])
+        run("repeated, disk tier only", [prompt("tell me about the market")] * n, 0)
+
+        print(json.dumps(cache.stats()))
+    finally:
+        fake.terminate()
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures)); sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# scripts/bench_llm_resilience.py
+"""
+LLM deadlines + circuit breaker end to end: /api/chat (Flask test client)
+against the local stub while it is healthy, stalls past the timeout, and
+recovers. Prints latency and LLM-vs-fallback replies per phase plus the
+/health "llm" block; exits non-zero if the breaker does not behave.
+
+  python scripts/bench_llm_resilience.py [--db db/realty.db] [--turns 8]
+"""
+import argparse, json, os, shutil, socket, statistics, subprocess, sys, tempfile, time, pathlib
+import urllib.request
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+TIMEOUT_S, BUDGET_S, FAILS, COOLDOWN_S = 1.0, 1.5, 3, 2.0
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def wait_port(port: int, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5): return
+        except OSError: time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on {port}")
+
+def control(port: int, **knobs):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/control", data=json.dumps(knobs).encode(),
+                                 headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(req).read()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=str(ROOT / "db" / "realty.db"))
+    ap.add_argument("--turns", type=int, default=8)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="rn-resilience-")
+    db = os.path.join(tmp, "realty.db"); shutil.copy(args.db, db)
+    port = free_port()
+    fake = subprocess.Popen([sys.executable, "tools/fake_llm.py", "--port", str(port), "--quiet", "--ttft", "0.1",
+                             "--token-delay", "0"], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ.update(REALTY_DB=db, OPENAI_API_KEY="stub", OPENAI_BASE_URL=f"http://127.0.0.1:{port}/v1",
+                      REALTY_LLM_CACHE="0", REALTY_LLM_TIMEOUT_S=str(TIMEOUT_S), REALTY_CHAT_BUDGET_S=str(BUDGET_S),
+                      REALTY_LLM_BREAKER_FAILS=str(FAILS), REALTY_LLM_BREAKER_COOLDOWN_S=str(COOLDOWN_S))
+    failures = []
+    try:
+        wait_port(port)
+        import app, llm
+        client = app.app.test_client()
+
+        def phase(name, expect_llm, expect_state, max_ms):
+            lat, llm_replies = [], 0
+            for i in range(args.turns):
+                t0 = time.perf_counter()
+                reply = client.post("/api/chat", json={"message": f"tell me about the market {i}"}).json["reply"]
+                lat.append((time.perf_counter() - t0) * 1000)
+                llm_replies += reply.get("content", "").startswith("(stub)")
+            state = llm.BREAKER.state
+            print(f"{name:<28} {args.turns:>5} {llm_replies:>5} {args.turns - llm_replies:>9} "
+                  f"{statistics.median(lat):>8.0f} {max(lat):>8.0f}  {state}")
+            if llm_replies != expect_llm: failures.append(f"{name}: {llm_replies} LLM replies, expected {expect_llm}")
+            if state != expect_state: failures.append(f"{name}: breaker {state}, expected {expect_state}")
+            if max(lat) > max_ms: failures.append(f"{name}: slowest turn {max(lat):.0f} ms > {max_ms} ms")
+
+        print(f"{'phase':<28} {'turns':>5} {'llm':>5} {'fallback':>9} {'p50 ms':>8} {'max ms':>8}  breaker")
+        phase("healthy (ttft 0.1 s)", args.turns, "closed", 1000)
+        control(port, ttft=5)
+        phase(f"stalled (ttft 5 s)", 0, "open", BUDGET_S * 1000 + 500)   # FAILS timeouts, then short-circuits
+        control(port, ttft=0.1)
+        phase("recovered, breaker open", 0, "open", 100)
+        time.sleep(COOLDOWN_S + 0.1)
+        phase("after cooldown (probe)", args.turns, "closed", 1000)
+        control(port, fail_rate=1)
+        phase("HTTP 500s", 0, "open", 1000)
+        print(json.dumps(client.get("/health").json["llm"]))
+        app.TELEMETRY.flush()
+    finally:
+        fake.terminate()
+        shutil.rmtree(tmp, ignore_errors=True)
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures)); sys.exit(1)
+
+if __name__ == "__main__":
+    main()
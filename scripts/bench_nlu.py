@@ -0,0 +1,101 @@
+# scripts/bench_nlu.py
+"""
+Per-message slot-extraction cost, before vs after the compiled vocabularies.
+
+Corpus: user lines from reports/*.csv (chat tone runs), the QA smoke prompts and,
+with --db, user messages stored in the `messages` table.
+
+  python scripts/bench_nlu.py [--db db/realty.db] [--rounds 200]
+"""
+import argparse, csv, glob, os, re, sqlite3, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import nlp_slots
+from nlp_engine import Vocabulary
+
+QA_PROMPTS = [
+    "who made you", "what services do you offer", "what cities do you cover", "show me apartments",
+    "houses in Matara under 60M", "nearest apartments to Borella", "3BR apartments in Galle under 80M",
+    "I need to contact a real agent", "book a free valuation", "reset",
+]
+
+# ---- the per-message implementations this replaced ----
+CANON_TYPES = {
+    "apartment": {"apt","apartment","condo","flat","apartments"},
+    "house": {"house","home","villa","houses"},
+    "townhouse": {"townhouse","town house","townhouses"},
+    "land": {"land","plot","plots","bare land"},
+    "commercial": {"commercial","building","office","shop","retail"},
+}
+CANON_CITIES = {"colombo","colombo 5","galle","kandy","mount lavinia","dehiwala","borella","colombo 8"}
+
+def legacy_detect_type(t):
+    low = (t or "").lower()
+    for canon, aliases in CANON_TYPES.items():
+        for a in aliases:
+            if re.search(rf"\b{re.escape(a)}(es|s)?\b", low): return canon
+    return None
+
+def legacy_detect_city(t):
+    low = (t or "").lower()
+    for c in sorted(CANON_CITIES, key=len, reverse=True):
+        if re.search(rf"\b{re.escape(c)}\b", low): return c.title()
+    return None
+
+def legacy_find_type(q):
+    for t, words in nlp_slots.TYPE_SYNONYMS.items():
+        for w in words:
+            if re.search(rf"\b{re.escape(w)}\b", q):
+                return t
+    return None
+
+def legacy(line):
+    low = line.lower()
+    return legacy_detect_type(line), legacy_detect_city(line), legacy_find_type(low)
+
+# ---- compiled ----
+TYPES = Vocabulary([(a, c) for c, al in CANON_TYPES.items() for a in sorted(al)], plural=True)
+CITIES = Vocabulary(sorted(((c, c.title()) for c in CANON_CITIES), key=lambda e: len(e[0]), reverse=True))
+
+def compiled(line):
+    low = line.lower()
+    return TYPES.find(low), CITIES.find(low), nlp_slots._find_type(low)
+
+def load_corpus(db_path: str | None) -> list[str]:
+    lines = list(QA_PROMPTS)
+    for path in glob.glob(str(ROOT / "reports" / "*.csv")):
+        with open(path, encoding="utf-8", newline="") as f:
+            lines += [r["request"] for r in csv.DictReader(f) if r.get("request")]
+    if db_path and os.path.exists(db_path):
+        with sqlite3.connect(db_path) as cx:
+            lines += [r[0] for r in cx.execute("SELECT content FROM messages WHERE role='user' LIMIT 20000")]
+    return lines
+
+def bench(fn, corpus, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for line in corpus:
+            fn(line)
+    return (time.perf_counter() - t0) / (rounds * len(corpus)) * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=os.getenv("REALTY_DB"))
+    ap.add_argument("--rounds", type=int, default=200)
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.db)
+    diffs = [l for l in corpus if legacy(l) != compiled(l)]
+    before = bench(legacy, corpus, args.rounds)
+    after = bench(compiled, corpus, args.rounds)
+    print(f"corpus: {len(corpus)} lines x {args.rounds} rounds")
+    print(f"before: {before:8.2f} us/message  (regex per alias)")
+    print(f"after : {after:8.2f} us/message  (one alternation per vocabulary)")
+    print(f"speedup: {before / after:.1f}x   differing extractions: {len(diffs)}")
+    for l in diffs[:10]:
+        print(f"  {l!r}: {legacy(l)} -> {compiled(l)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# scripts/bench_serving.py
+"""
+Chat throughput: sync server (waitress + Flask) vs async mode (uvicorn + asgi.py)
+at 50, 200 and 1000 concurrent sessions, against the local LLM stub.
+
+Each session sends a listing search, a message that falls through to the LLM
+and a follow-up refinement. Both servers get a fresh copy of the same DB.
+
+  python scripts/bench_serving.py [--concurrency 50,200,1000] [--ttft 0.3] [--db db/realty.db]
+
+Also reports CPU seconds used by the server, the LLM stub and the load generator
+during each run (raise `ulimit -n` for 1000 sessions).
+"""
+import argparse, asyncio, json, os, shutil, socket, statistics, subprocess, sys, tempfile, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+TURNS = ["3BR apartments in Galle under 80M", "tell me about the market", "houses in Kandy"]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def wait_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5): return
+        except OSError: time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on {port}")
+
+def cpu_seconds(pid: int) -> float:
+    """utime + stime of a child process (Linux /proc; 0 elsewhere)."""
+    try:
+        fields = open(f"/proc/{pid}/stat").read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+def start(cmd, env, port):
+    p = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_port(port)
+    return p
+
+class Conn:
+    """Bare keep-alive HTTP/1.1 client: httpx itself costs more CPU per request than the server under test."""
+    def __init__(self, host: str, port: int):
+        self.host, self.port, self.reader, self.writer = host, port, None, None
+
+    async def post_json(self, path: str, obj) -> dict:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(obj).encode()
+        self.writer.write(f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        if "content-length" in headers:
+            data = await self.reader.readexactly(int(headers["content-length"]))
+        else:   # chunked (waitress/uvicorn only chunk when no length is known)
+            parts = []
+            while (size := int((await self.reader.readline()).strip() or b"0", 16)):
+                parts.append(await self.reader.readexactly(size)); await self.reader.readline()
+            await self.reader.readline(); data = b"".join(parts)
+        if headers.get("connection", "").lower() == "close": await self.close()
+        if status != 200: raise RuntimeError(f"HTTP {status}")
+        return json.loads(data)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close(); self.reader = self.writer = None
+
+async def session(port: int, latencies: list, errors: list):
+    conn, sid = Conn("127.0.0.1", port), None
+    try:
+        for text in TURNS:
+            t0 = time.perf_counter()
+            try:
+                sid = (await conn.post_json("/api/chat", {"message": text, "session_id": sid})).get("session_id")
+                latencies.append(time.perf_counter() - t0)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}"[:120]); await conn.close()
+    finally:
+        await conn.close()
+
+async def run_load(port: int, concurrency: int) -> dict:
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session(port, latencies, errors) for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    lat = sorted(latencies) or [0.0]
+    return {"req_s": len(latencies) / wall, "p50": statistics.median(lat), "p95": lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+            "wall": wall, "errors": len(errors), "first_error": errors[0] if errors else ""}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", default="50,200,1000")
+    ap.add_argument("--db", default=str(ROOT / "db" / "realty.db"))
+    ap.add_argument("--ttft", type=float, default=0.3, help="stub LLM seconds before the first token")
+    ap.add_argument("--token-delay", type=float, default=0.005)
+    ap.add_argument("--sync-threads", type=int, default=16, help="waitress worker threads")
+    ap.add_argument("--db-threads", type=int, default=16, help="asgi.py executor threads")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="rn-bench-")
+    llm_port = free_port()
+    fake = start([sys.executable, "tools/fake_llm.py", "--port", str(llm_port), "--quiet",
+                  "--ttft", str(args.ttft), "--token-delay", str(args.token_delay)], dict(os.environ), llm_port)
+    servers = {
+        "sync (waitress)": lambda port: [sys.executable, "-c",
+            "import app, waitress; waitress.serve(app.app, host='127.0.0.1', port=%d, threads=%d, "
+            "connection_limit=5000, backlog=2048, asyncore_use_poll=True, _quiet=True)" % (port, args.sync_threads)],
+        "async (uvicorn)": lambda port: [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1",
+                                         "--port", str(port), "--log-level", "warning", "--backlog", "2048",
+                                         "--timeout-keep-alive", "120"],
+    }
+    print(f"{'server':<16} {'sessions':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'wall s':>7} "
+          f"{'cpu s':>6} {'stub s':>6} {'load s':>6} {'errors':>6}")
+    try:
+        for i, (name, cmd) in enumerate(servers.items()):
+            for c in (int(x) for x in args.concurrency.split(",")):
+                db = os.path.join(tmp, f"bench-{i}-{c}.db")   # fresh file: no WAL left over from another run
+                shutil.copy(args.db, db)
+                port = free_port()
+                env = dict(os.environ, REALTY_DB=db, OPENAI_API_KEY="stub", REALTY_ASGI_DB_THREADS=str(args.db_threads),
+                           OPENAI_BASE_URL=f"http://127.0.0.1:{llm_port}/v1")
+                srv = start(cmd(port), env, port)
+                try:
+                    cpu0, llm_cpu0 = cpu_seconds(srv.pid), cpu_seconds(fake.pid)
+                    client0 = time.process_time()
+                    res = asyncio.run(run_load(port, c))
+                    res["client_cpu"] = time.process_time() - client0
+                    res["cpu"], res["llm_cpu"] = cpu_seconds(srv.pid) - cpu0, cpu_seconds(fake.pid) - llm_cpu0
+                finally:
+                    srv.terminate(); srv.wait()
+                print(f"{name:<16} {c:>8} {res['req_s']:>8.1f} {res['p50'] * 1000:>8.0f} {res['p95'] * 1000:>8.0f} "
+                      f"{res['wall']:>7.1f} {res['cpu']:>6.1f} {res['llm_cpu']:>6.1f} {res['client_cpu']:>6.1f} {res['errors']:>6}  {res['first_error']}")
+    finally:
+        fake.terminate()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# scripts/check_llm_context.py
+"""
+Does the LLM context keep knowledge-base lines next to listings?
+
+  python scripts/check_llm_context.py                       # built-in policy questions
+  python scripts/check_llm_context.py "can foreigners buy land in galle"
+
+For each question: listing candidates (db_context_lines, with a city/type session)
+and KB candidates (kb_context_lines) go through prompt_budget.pack the way a
+fallback turn does. A question that has both must keep at least one KB line;
+exit 1 otherwise. A synthetic case (8 long listing lines, 3 KB lines) runs first
+and needs no data. REALTY_DB selects the database.
+"""
+import os, sys, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("REALTY_KB_ROLLUP_S", "0")   # no background refresh for a one-shot check
+import app, prompt_budget
+
+QUESTIONS = [
+    ("what documents do I need to buy land in galle", {"city": "Galle", "type": "land"}),
+    ("tell me about apartments in colombo market", {"city": "Colombo 5", "type": "apartment"}),
+    ("how long does deed verification take for a house in kandy", {"city": "Kandy", "type": "house"}),
+    ("is the booking deposit refundable for rentals in colombo", {"city": "Colombo 5", "type": "apartment", "tenure": "rent"}),
+]
+
+def packed(question, listings, kb):
+    history = [{"role": "user", "content": question}]
+    _, ctx, info = prompt_budget.pack(app.SYSTEM_PROMPT, history, listings, kb=kb)
+    return ctx, info
+
+def main():
+    failed = 0
+    listing = " | ".join(["Apartment in Colombo 5 3 bed, 3 bath", "apartment", "Colombo 5", "3BR/3BA", "LKR 99,613,184"] * 3)
+    _, info = packed("what are your booking fees", [(i, f"#{i} | {listing}") for i in range(8)],
+                     ["(policy) Booking fees: " + "a refundable deposit of one month rent secures an apartment; " * 6] * 3)
+    print(f"synthetic: listings {info['context_kept']}/8, kb {info['kb_kept']}/3")
+    failed += not info["kb_kept"]
+
+    questions = [(q, {}) for q in sys.argv[1:]] or QUESTIONS
+    with app.conn() as cnx:
+        for q, session in questions:
+            listings = app.db_context_lines(cnx, dict(session), q)
+            kb = app.kb_context_lines(cnx, q)
+            _, info = packed(q, listings, kb)
+            ok = info["kb_kept"] >= 1 or not kb or not listings
+            failed += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {q!r}: listings {info['context_kept']}/{len(listings)}, kb {info['kb_kept']}/{len(kb)}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# scripts/eval_search.py
+"""
+Offline relevance + latency check for listing full-text search: the old
+retrieval (raw text MATCH / prefix-OR ordered by featured, created_at) against
+fts_search (safe compile, weighted bm25 + boosts) over a saved query log.
+
+Query log: --log FILE (.csv with a "request" column, .jsonl with "q" and
+optional "relevant": [property_id, ...], or one query per line); by default
+the chat-tone CSVs in reports/ plus msg_intents.user_text from the DB.
+
+Relevance labels: explicit "relevant" ids when given, otherwise graded from the
+slots the chatbot parses out of the query (city/district match 2, type 1,
+beds 1, purpose 1). Reports nDCG@k, precision@k, empty/error rates and
+latency percentiles per method.
+
+  REALTY_DB=/path/copy.db python scripts/eval_search.py [--k 8] [--log FILE] [--save-log FILE] [--repeat 3]
+"""
+import argparse, csv, glob, json, math, os, sqlite3, statistics, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+def read_log(path: str) -> list[dict]:
+    out = []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            out = [{"q": r["request"]} for r in csv.DictReader(f) if r.get("request")]
+        elif path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    d = json.loads(line); d["q"] = d.get("q") or d.get("query") or ""
+                    out.append(d)
+        else:
+            out = [{"q": line.strip()} for line in f if line.strip()]
+    return out
+
+def default_log(cnx) -> list[dict]:
+    out = []
+    for p in sorted(glob.glob(str(ROOT / "reports" / "*.csv"))):
+        try: out += read_log(p)
+        except (OSError, KeyError): pass
+    try:
+        out += [{"q": r[0]} for r in cnx.execute(
+            "SELECT DISTINCT user_text FROM msg_intents WHERE user_text IS NOT NULL ORDER BY id DESC LIMIT 2000")]
+    except sqlite3.Error:
+        pass
+    return out
+
+def synthetic_log(cnx, n: int, seed: int = 5) -> list[dict]:
+    """Search-style queries from live listing attributes; every other one shortens the
+    place name ("nuge", "mount lav") the way people type in a chat box."""
+    import random
+    rnd = random.Random(seed)
+    rows = cnx.execute("SELECT DISTINCT city, property_type, bedrooms FROM properties WHERE status='available' AND city IS NOT NULL").fetchall()
+    out = []
+    for i in range(min(n, len(rows) * 4) if rows else 0):
+        city, ptype, beds = rnd.choice(rows)
+        place = city if i % 2 else " ".join(w[:max(3, len(w) // 2 + 1)] for w in city.lower().split())
+        lead = f"{beds} bed " if beds and rnd.random() < 0.5 else ""
+        out.append({"q": rnd.choice(("{l}{t} in {c}", "any {l}{t} near {c}?", "looking for a {l}{t}, {c} area"))
+                    .format(l=lead, t=ptype, c=place)})
+    return out
+
+# ---------- retrieval methods ----------
+COLS = "p.property_id, p.city, p.district, p.property_type, p.purpose, p.bedrooms"
+
+def legacy_context(cnx, q, k):
+    """app.build_db_context before fts_search: the raw text straight into MATCH."""
+    return cnx.execute(f"""SELECT {COLS} FROM property_fts f JOIN properties p ON p.property_id = f.rowid
+                            WHERE property_fts MATCH ? AND p.status='available' LIMIT ?""", (q, k)).fetchall()
+
+def legacy_fts(cnx, q, k):
+    """db.search_properties_fts before fts_search: prefix OR, featured/newest first."""
+    import fts_search
+    words = [t for t in fts_search.tokens(q) if t not in fts_search.STOP][:8]
+    if not words: return []
+    return cnx.execute(f"""SELECT {COLS} FROM property_fts f JOIN properties p ON p.property_id = f.rowid
+                            WHERE property_fts MATCH ? AND p.status='available'
+                            ORDER BY p.featured DESC, p.created_at DESC, p.property_id ASC LIMIT ?""",
+                       (" OR ".join(w + "*" for w in words), k)).fetchall()
+
+def ranked(cnx, q, k, index):
+    import fts_search
+    from listing_query import ListingQuery
+    return fts_search.search(cnx, ListingQuery().select(*COLS.replace("p.", "").split(", ")),
+                             fts_search.tokens(q), index, k) or []
+
+# ---------- scoring ----------
+def grade(row, slots) -> int:
+    g = 0
+    city = (slots.get("city") or "").lower()
+    if city and city in ((row[1] or "").lower(), (row[2] or "").lower()): g += 2
+    if slots.get("type") and row[3] == slots["type"]: g += 1
+    if slots.get("beds") and (row[5] or 0) >= int(slots["beds"]): g += 1
+    if slots.get("tenure") and row[4] == slots["tenure"]: g += 1
+    return g
+
+def ndcg(gains: list, ideal: list, k: int) -> float:
+    dcg = sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(gains[:k]))
+    idcg = sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(sorted(ideal, reverse=True)[:k]))
+    return dcg / idcg if idcg else 0.0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--log")
+    ap.add_argument("--synthetic", type=int, default=0, help="add N search-style queries built from the catalog")
+    ap.add_argument("--save-log", help="write the query log used (JSONL) for later runs")
+    ap.add_argument("--repeat", type=int, default=3, help="timing repetitions per query")
+    args = ap.parse_args()
+    if not os.getenv("REALTY_DB"):
+        sys.exit("set REALTY_DB (a copy: importing app creates missing tables)")
+    import app, fts_search
+    cnx = sqlite3.connect(os.environ["REALTY_DB"])
+    log = read_log(args.log) if args.log else default_log(cnx)
+    if args.synthetic: log += synthetic_log(cnx, args.synthetic)
+    if args.save_log:
+        with open(args.save_log, "w", encoding="utf-8") as f:
+            for d in log: f.write(json.dumps(d, ensure_ascii=False) + "\n")
+    index = fts_search.load(cnx)
+    methods = {"legacy_context": lambda q: legacy_context(cnx, q, args.k),
+               "legacy_fts": lambda q: legacy_fts(cnx, q, args.k),
+               "ranked": lambda q: ranked(cnx, q, args.k, index)}
+    res = {m: {"lat": [], "ndcg": [], "p": [], "empty": 0, "errors": 0} for m in methods}
+    judged = 0
+    for d in log:
+        q = d["q"]
+        slots = {} if d.get("relevant") else app.parse_intent_slots(q, {})[2]
+        if slots.get("city"): slots["city"] = app.map_area_to_city(slots["city"])
+        relevant = set(d.get("relevant") or [])
+        pool_gain = None
+        if relevant or slots:
+            judged += 1
+            # ideal ranking: best grades among everything any method can reach for this query
+            sql = f"SELECT {COLS} FROM properties p WHERE p.status='available'"
+            pool_gain = [(1 if r[0] in relevant else 0) if relevant else grade(r, slots) for r in cnx.execute(sql)]
+        for name, run in methods.items():
+            r = res[name]
+            try:
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter(); rows = run(q); r["lat"].append((time.perf_counter() - t0) * 1000)
+            except sqlite3.OperationalError:
+                r["errors"] += 1; rows = []
+            if not rows: r["empty"] += 1
+            if pool_gain is not None:
+                gains = [(1 if row[0] in relevant else 0) if relevant else grade(row, slots) for row in rows]
+                r["ndcg"].append(ndcg(gains, pool_gain, args.k))
+                r["p"].append(sum(1 for g in gains if g > 0) / args.k)
+    n = len(log)
+    print(f"{n} queries ({judged} with relevance labels), k={args.k}, {len(index)} FTS terms")
+    print(f"{'method':<16} {'nDCG@k':>7} {'P@k':>6} {'empty':>6} {'errors':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    for name, r in res.items():
+        lat = sorted(r["lat"]) or [0.0]
+        print(f"{name:<16} {statistics.mean(r['ndcg'] or [0]):>7.3f} {statistics.mean(r['p'] or [0]):>6.3f} "
+              f"{r['empty']:>6} {r['errors']:>7} {statistics.median(lat):>7.2f} {lat[int(0.95 * (len(lat) - 1))]:>7.2f}")
+
+if __name__ == "__main__":
+    main()
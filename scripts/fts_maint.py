@@ -0,0 +1,98 @@
+# scripts/fts_maint.py
+"""
+Listing search index (property_fts) maintenance.
+
+  python scripts/fts_maint.py status     # layout, canonical or not, parity, size (default)
+  python scripts/fts_maint.py check      # parity + FTS integrity-check; exit 1 on drift
+  python scripts/fts_maint.py rebuild    # drop any layout, build fts_search.FTS_DDL + triggers, optimize
+  python scripts/fts_maint.py optimize   # merge all segments into one
+  python scripts/fts_maint.py merge [--pages 500]   # incremental merge (bounded work, safe while serving)
+
+Parity compares rows in properties with documents in the index
+(property_fts_docsize; COUNT(*) on an external-content table only counts
+properties again) plus the table counts reports/_counts.txt used to list.
+REALTY_DB selects the database.
+"""
+import argparse, os, sqlite3, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import fts_search
+
+DB = os.getenv("REALTY_DB", str(ROOT / "db" / "realty.db"))
+COUNT_TABLES = ("properties", "property_media", "investments", "investment_properties", "area_aliases", "type_synonyms")
+
+def count(cnx, table: str):
+    try: return cnx.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except sqlite3.Error: return None
+
+def index_bytes(cnx):
+    """Pages used by property_fts shadow tables (dbstat), else the raw segment bytes."""
+    try:
+        return cnx.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'property_fts%'").fetchone()[0]
+    except sqlite3.Error:
+        try: return cnx.execute("SELECT SUM(LENGTH(block)) FROM property_fts_data").fetchone()[0]
+        except sqlite3.Error: return None
+
+def integrity(cnx) -> str | None:
+    """None when the index matches properties, else SQLite's message."""
+    try:
+        cnx.execute("INSERT INTO property_fts(property_fts, rank) VALUES ('integrity-check', 1)")
+        return None
+    except sqlite3.Error as e:
+        return str(e)
+
+def status(cnx, check: bool = False) -> int:
+    lay = fts_search.layout(cnx)
+    if not lay["exists"]:
+        print("property_fts: missing (run: python scripts/fts_maint.py rebuild)"); return 1
+    props = cnx.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+    docs = count(cnx, "property_fts_docsize")
+    size = index_bytes(cnx)
+    print(f"property_fts columns : {', '.join(lay['columns'])}")
+    print(f"triggers             : {', '.join(sorted(lay['triggers'])) or '-'}")
+    print(f"canonical            : {'yes' if lay['canonical'] else 'no — ' + '; '.join(lay['problems'])}")
+    print(f"index size           : {size / 1024:.0f} KiB" if size else "index size           : ?")
+    print(f"segments (idx rows)  : {count(cnx, 'property_fts_idx')}")
+    print(f"{'table':24s} count")
+    for t in COUNT_TABLES:
+        c = count(cnx, t)
+        print(f"{t:24s} {c if c is not None else '(missing)'}")
+    print(f"{'property_fts (docs)':24s} {docs if docs is not None else '?'}")
+    bad = docs is not None and docs != props
+    if bad: print(f"PARITY: {props} properties vs {docs} indexed documents")
+    if check:
+        err = integrity(cnx)
+        print(f"integrity-check      : {err or 'ok'}")
+        bad = bad or bool(err)
+    return 1 if bad else 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", nargs="?", default="status", choices=("status", "check", "rebuild", "optimize", "merge"))
+    ap.add_argument("--pages", type=int, default=500, help="merge: pages of work per call")
+    args = ap.parse_args()
+    cnx = sqlite3.connect(DB, isolation_level=None)
+    cnx.execute("PRAGMA busy_timeout=5000")
+    t0 = time.perf_counter()
+    if args.cmd in ("status", "check"):
+        sys.exit(status(cnx, check=args.cmd == "check"))
+    before = index_bytes(cnx)
+    cnx.execute("BEGIN IMMEDIATE")
+    try:
+        if args.cmd == "rebuild":
+            fts_search.rebuild(cnx)
+        elif args.cmd == "optimize":
+            cnx.execute("INSERT INTO property_fts(property_fts) VALUES ('optimize')")
+        else:
+            cnx.execute("INSERT INTO property_fts(property_fts, rank) VALUES ('merge', ?)", (args.pages,))
+        cnx.execute("COMMIT")
+    except BaseException:
+        cnx.execute("ROLLBACK"); raise
+    after = index_bytes(cnx)
+    print(f"{args.cmd}: {time.perf_counter() - t0:.2f}s"
+          + (f", index {before / 1024:.0f} → {after / 1024:.0f} KiB" if before and after else ""))
+    sys.exit(status(cnx, check=True))
+
+if __name__ == "__main__":
+    main()
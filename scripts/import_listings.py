@@ -0,0 +1,257 @@
+# scripts/import_listings.py
+"""
+Bulk listing import from a CSV or JSONL feed, upserted by listing_code.
+
+  python scripts/import_listings.py feed.csv
+  python scripts/import_listings.py feed.jsonl --batch 5000 --commit-every 100000
+  python scripts/import_listings.py feed.csv --dry-run --rejects bad.jsonl   # validate only
+  python scripts/import_listings.py feed.csv --fts-every 200000              # index visible during long loads
+
+Rows are streamed (csv.DictReader / one JSON object per line) and never held
+beyond one batch, so memory stays flat however large the file is. Field names
+are properties columns (unknown ones are ignored); each row is checked against
+the table's CHECK enums (read from the live schema) and numeric types before
+it goes in; rejects are counted and optionally written to --rejects with their
+line number and reason.
+
+Only the fields a row supplies are written: a missing column, an empty CSV cell
+or a JSON null leaves the stored value alone, and column defaults apply only
+when the listing is new. Consecutive rows supplying the same set of fields go
+in together with executemany, in batches of up to --batch (a change of field
+set starts a new batch, so rows are written in file order and the last row for
+a listing_code wins) inside transactions of --commit-every rows, as INSERT ... ON CONFLICT(listing_code) DO UPDATE that
+skips rows whose fields did not change. A row without the fields a new listing
+needs (title, property_type) can only update: its listing_code must exist
+already, else it is rejected. Per-row index work is deferred: the
+property_fts, listing_facets and data-version triggers on properties are
+dropped for the load, and afterwards property_fts is rebuilt (fts_search.rebuild,
+which restores its triggers), listing_facets refreshed and the catalog version
+bumped once, so the app reloads its term index, facets and geo index. This
+also runs when the import fails part way. --fts-every also rebuilds the index
+every N rows (each rebuild reads the whole table). REALTY_DB selects the database.
+"""
+import argparse, csv, json, os, re, resource, sqlite3, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import data_versions, facets, fts_search
+
+DB = os.getenv("REALTY_DB", str(ROOT / "db" / "realty.db"))
+
+# schema.sql; the live table's CHECK clauses win when they can be read
+ENUMS = {
+    "property_type": {"apartment", "house", "land", "commercial", "office", "villa", "townhouse", "plot", "other"},
+    "purpose": {"sale", "rent", "investment", "lease"},
+    "status": {"available", "pending", "reserved", "sold", "rented", "offmarket"},
+    "price_period": {"total", "per_month", "per_year", "per_sqft"},
+}
+INTS  = {"bedrooms", "bathrooms", "parking", "build_year", "price_lkr", "listed_by_contact_id", "company_id"}
+REALS = {"latitude", "longitude", "area_sqm", "land_perch"}
+SKIP  = {"property_id", "created_at", "updated_at"}   # owned by the database
+TRUE, FALSE = {"1", "true", "yes", "y"}, {"0", "false", "no", "n", ""}
+_CHECK = re.compile(r"CHECK\s*\(\s*(\w+)\s+IN\s*\(([^)]*)\)\s*\)", re.I)
+
+# ---------- schema ----------
+def columns(cnx) -> list[tuple]:
+    """(name, notnull, default) for the importable properties columns."""
+    return [(r[1], bool(r[3]), r[4]) for r in cnx.execute("PRAGMA table_info(properties)") if r[1] not in SKIP]
+
+def enums(cnx) -> dict:
+    sql = (cnx.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'properties'").fetchone() or [""])[0]
+    out = {k: set(v) for k, v in ENUMS.items()}
+    for col, values in _CHECK.findall(sql):
+        if col in out: out[col] = {v.strip().strip("'\"") for v in values.split(",")}   # featured (0,1) is a flag
+    return out
+
+# ---------- reading ----------
+def read_rows(path: str, fmt: str | None = None):
+    """(line number, dict) for each record; a JSONL line that does not parse yields (line, error string)."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for n, line in enumerate(f, 1):
+                if not line.strip(): continue
+                try: yield n, json.loads(line)
+                except ValueError as e: yield n, f"bad json: {e}"
+    finally:
+        if f is not sys.stdin: f.close()
+
+class Validator:
+    """Raw record → (supplied column names, values) in schema order, or ValueError with the reason."""
+    def __init__(self, cnx):
+        self.cols = columns(cnx)
+        self.names = [c[0] for c in self.cols]
+        self.required = {n for n, notnull, default in self.cols if notnull and default is None}   # a new listing needs these
+        self.enums = enums(cnx)
+        self.ignored: set = set()
+
+    def insertable(self, names) -> bool:
+        return self.required <= set(names)
+
+    def __call__(self, raw: dict) -> tuple:
+        if not isinstance(raw, dict): raise ValueError(raw if isinstance(raw, str) else "not an object")
+        self.ignored.update(k for k in raw if k not in SKIP and k not in self.names)
+        names, out = [], []
+        for name, notnull, default in self.cols:
+            v = raw.get(name)
+            if isinstance(v, str): v = v.strip() or None
+            if v is None:
+                if name == "listing_code": raise ValueError("listing_code is required")
+                continue   # not supplied: keep the stored value (or the column default for a new row)
+            if name == "featured":
+                s = str(v).lower()
+                if s not in TRUE and s not in FALSE: raise ValueError(f"featured: {v!r} is not 0/1")
+                v = int(s in TRUE)
+            elif name in INTS:
+                try: v = int(float(str(v).replace(",", "")))
+                except ValueError: raise ValueError(f"{name}: {v!r} is not a number") from None
+            elif name in REALS:
+                try: v = float(str(v).replace(",", ""))
+                except ValueError: raise ValueError(f"{name}: {v!r} is not a number") from None
+            elif name in self.enums:
+                v = str(v).lower()
+                if v not in self.enums[name]: raise ValueError(f"{name}: {v!r} not in {sorted(self.enums[name])}")
+            names.append(name); out.append(v)
+        if len(names) == 1: raise ValueError("no fields besides listing_code")
+        return tuple(names), tuple(out)
+
+def upsert_sql(names) -> str:
+    """Insert or update the supplied columns by listing_code; unchanged rows are left alone (no updated_at touch, no write)."""
+    upd = [n for n in names if n != "listing_code"]
+    sql = f"INSERT INTO properties({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) ON CONFLICT(listing_code) DO "
+    if not upd: return sql + "NOTHING"
+    return sql + (f"UPDATE SET {', '.join(f'{n} = excluded.{n}' for n in upd)} "
+                  f"WHERE {' OR '.join(f'{n} IS NOT excluded.{n}' for n in upd)}")
+
+def update_sql(names) -> str:
+    """Update-only rows (no title/type to insert with); parameters: values, listing_code, values again."""
+    upd = [n for n in names if n != "listing_code"]
+    return (f"UPDATE properties SET {', '.join(f'{n} = ?' for n in upd)} WHERE listing_code = ? "
+            f"AND ({' OR '.join(f'{n} IS NOT ?' for n in upd)})")
+
+# ---------- deferred maintenance ----------
+def deferred_triggers(cnx) -> list[str]:
+    """Per-row triggers on properties that the import drops and rebuilds in bulk instead."""
+    dv = {f"dv_properties_{e}" for e in "iud"}
+    return [name for name, sql in cnx.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'properties'")
+            if "property_fts" in sql or name in facets.TRIGGER_NAMES or name in dv]
+
+def finish(cnx) -> dict:
+    """Rebuild property_fts (+ triggers), listing_facets (+ triggers), data-version triggers; bump catalog."""
+    t0 = time.perf_counter()
+    cnx.execute("BEGIN IMMEDIATE")
+    try:
+        fts_search.rebuild(cnx)
+        t1 = time.perf_counter()
+        facets.ensure(cnx)   # table (current layout) + triggers
+        n = facets.refresh(cnx, bump=False)
+        data_versions.ensure(cnx)
+        data_versions.bump(cnx, "catalog")
+        cnx.execute("COMMIT")
+    except BaseException:
+        cnx.execute("ROLLBACK"); raise
+    return {"fts_s": round(t1 - t0, 2), "facets": n, "facets_s": round(time.perf_counter() - t1, 2)}
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("file", help="CSV or JSONL feed ('-' for stdin)")
+    ap.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    ap.add_argument("--batch", type=int, default=2000, help="rows per executemany")
+    ap.add_argument("--commit-every", type=int, default=50000, help="rows per transaction")
+    ap.add_argument("--cache-mb", type=int, default=64, help="SQLite page cache for the import connection")
+    ap.add_argument("--fts-every", type=int, default=0, help="also rebuild property_fts every N rows (0: only at the end)")
+    ap.add_argument("--rejects", help="write rejected rows (line, reason, row) as JSONL")
+    ap.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = ap.parse_args()
+
+    cnx = sqlite3.connect(DB, isolation_level=None)
+    cnx.execute("PRAGMA busy_timeout=5000")
+    cnx.execute(f"PRAGMA cache_size=-{args.cache_mb * 1024}")   # index pages stay hot across batches
+    cnx.execute("PRAGMA synchronous=NORMAL")                    # WAL: durable at checkpoint, one fsync per commit skipped
+    check = Validator(cnx)
+    rejects = open(args.rejects, "w", encoding="utf-8") if args.rejects else None
+    stats = {"read": 0, "rejected": 0, "written": 0}
+    dropped = [] if args.dry_run else deferred_triggers(cnx)
+    batch, batch_names = [], None   # consecutive rows supplying the same columns: [(line, raw, values)]
+
+    def reject(n, raw, error):
+        stats["rejected"] += 1
+        if rejects: rejects.write(json.dumps({"line": n, "error": error, "row": raw}, default=str) + "\n")
+        if stats["rejected"] <= 5: print(f"reject line {n}: {error}", file=sys.stderr)
+
+    def flush():
+        """Write the pending batch (rows that all supply batch_names)."""
+        nonlocal batch
+        rows, names, batch = batch, batch_names, []
+        if not rows: return
+        if check.insertable(names):
+            if not args.dry_run: stats["written"] += cnx.executemany(upsert_sql(names), [v for _, _, v in rows]).rowcount
+            return
+        codes = [v[names.index("listing_code")] for _, _, v in rows]
+        known = {r[0] for r in cnx.execute(f"SELECT listing_code FROM properties WHERE listing_code IN ({','.join('?' * len(codes))})", codes)}
+        upd = [i for i, n in enumerate(names) if n != "listing_code"]
+        params = []
+        for (n, raw, v), code in zip(rows, codes):
+            if code not in known:
+                reject(n, raw, f"listing_code {code!r} is new but lacks {', '.join(sorted(check.required - set(names)))}")
+                continue
+            vals = [v[i] for i in upd]
+            params.append((*vals, code, *vals))
+        if params and not args.dry_run: stats["written"] += cnx.executemany(update_sql(names), params).rowcount
+
+    t0 = time.perf_counter()
+    try:
+        if dropped:
+            cnx.execute("BEGIN IMMEDIATE")
+            for name in dropped: cnx.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+            cnx.execute("COMMIT")
+        in_txn = 0
+        for n, raw in read_rows(args.file, args.format):
+            stats["read"] += 1
+            try:
+                names, values = check(raw)
+            except ValueError as e:
+                reject(n, raw, str(e)); continue
+            if not in_txn and not args.dry_run: cnx.execute("BEGIN IMMEDIATE")
+            if names != batch_names: flush(); batch_names = names
+            batch.append((n, raw if not check.insertable(names) else None, values))
+            in_txn += 1
+            if len(batch) >= args.batch: flush()
+            if in_txn >= args.commit_every:
+                flush()
+                if not args.dry_run: cnx.execute("COMMIT")
+                in_txn = 0
+                rate = stats["read"] / (time.perf_counter() - t0)
+                print(f"  {stats['read']:,} rows, {rate:,.0f} rows/s, peak {peak_rss_mb():.0f} MB", file=sys.stderr)
+            if args.fts_every and not args.dry_run and stats["read"] % args.fts_every == 0:
+                flush()
+                if in_txn: cnx.execute("COMMIT"); in_txn = 0
+                try: cnx.execute("INSERT INTO property_fts(property_fts) VALUES ('rebuild')")
+                except sqlite3.OperationalError: pass   # no index yet: finish() builds it
+        flush()
+        if in_txn and not args.dry_run: cnx.execute("COMMIT")
+    finally:
+        if cnx.in_transaction: cnx.execute("ROLLBACK")
+        load_s = time.perf_counter() - t0
+        done = finish(cnx) if dropped else {}
+        if rejects: rejects.close()
+
+    total_s = time.perf_counter() - t0
+    if check.ignored: print(f"ignored columns: {', '.join(sorted(check.ignored))}")
+    print(f"import: {stats['read']:,} rows read, {stats['read'] - stats['rejected']:,} accepted, {stats['rejected']:,} rejected, "
+          f"{stats['written']:,} inserted/changed{' (dry run)' if args.dry_run else ''}")
+    print(f"load {load_s:.1f}s ({stats['read'] / load_s if load_s else 0:,.0f} rows/s), total {total_s:.1f}s "
+          f"({stats['read'] / total_s if total_s else 0:,.0f} rows/s), peak memory {peak_rss_mb():.0f} MB"
+          + (f"; fts rebuild {done['fts_s']}s, {done['facets']} facets in {done['facets_s']}s" if done else ""))
+    sys.exit(1 if stats["rejected"] and stats["rejected"] == stats["read"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# scripts/ingest_kb.py
+"""
+Load policy / FAQ documents into the knowledge base (kb_chunks → kb_fts).
+
+  python scripts/ingest_kb.py docs/*.md                       # source 'policy'
+  python scripts/ingest_kb.py --source faq --replace faq.txt  # drop the file's old chunks first
+  python scripts/ingest_kb.py --max-words 80 --overlap 15 --optimize big.md
+
+Files (.txt / .md) are split at headings and blank lines into chunks of at most
+--max-words words (long paragraphs are cut with --overlap words repeated), each
+chunk prefixed with its heading. meta = {"doc": file name, "part": n}; --replace
+deletes chunks with the same doc first. Rows go in with executemany in
+BEGIN IMMEDIATE batches of --batch, so the app keeps reading between batches;
+the kb_fts triggers index them and the "kb" data version reloads KB caches.
+REALTY_DB selects the database.
+"""
+import argparse, json, os, re, sqlite3, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import kb
+
+DB = os.getenv("REALTY_DB", str(ROOT / "db" / "realty.db"))
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+
+def chunks(text: str, max_words: int = 120, overlap: int = 20):
+    """Chunk texts for one document: paragraphs packed up to max_words, headings carried along."""
+    heading, buf, out = "", [], []
+    def flush():
+        if buf: out.append(" ".join(([heading + ":"] if heading else []) + buf))
+        buf.clear()
+    for para in re.split(r"\n\s*\n", text):
+        lines = [l for l in para.strip().splitlines() if l.strip()]
+        if not lines: continue
+        h = _HEADING.match(lines[0])
+        if h:
+            flush(); heading = h.group(1).strip(); lines = lines[1:]
+        words = " ".join(lines).split()
+        if not words: continue
+        if len(buf) + len(words) > max_words: flush()
+        step = max(1, max_words - overlap)
+        while len(words) > max_words:   # one long paragraph: overlapping windows
+            buf.extend(words[:max_words]); flush(); words = words[step:]
+        buf.extend(words)
+    flush()
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--source", default="policy", help="kb_chunks.source (faq, service, policy, script, other)")
+    ap.add_argument("--max-words", type=int, default=120)
+    ap.add_argument("--overlap", type=int, default=20)
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--replace", action="store_true", help="delete each file's earlier chunks first")
+    ap.add_argument("--optimize", action="store_true", help="merge kb_fts segments afterwards")
+    args = ap.parse_args()
+
+    cnx = sqlite3.connect(DB, isolation_level=None)
+    cnx.execute("PRAGMA busy_timeout=5000")
+    cnx.execute("BEGIN IMMEDIATE")
+    kb.ensure(cnx)
+    cnx.execute("COMMIT")
+
+    t0, total, removed = time.perf_counter(), 0, 0
+    for path in args.files:
+        p = pathlib.Path(path)
+        rows = [(args.source, c, json.dumps({"doc": p.name, "part": i}))
+                for i, c in enumerate(chunks(p.read_text(encoding="utf-8"), args.max_words, args.overlap))]
+        if args.replace:
+            cnx.execute("BEGIN IMMEDIATE")
+            removed += cnx.execute("DELETE FROM kb_chunks WHERE json_extract(meta, '$.doc') = ?", (p.name,)).rowcount
+            cnx.execute("COMMIT")
+        for i in range(0, len(rows), args.batch):
+            cnx.execute("BEGIN IMMEDIATE")
+            try:
+                cnx.executemany("INSERT INTO kb_chunks(source, text, meta) VALUES (?, ?, ?)", rows[i:i + args.batch])
+                cnx.execute("COMMIT")
+            except BaseException:
+                cnx.execute("ROLLBACK"); raise
+        total += len(rows)
+        print(f"{p.name}: {len(rows)} chunks")
+    dt = time.perf_counter() - t0
+    if args.optimize:
+        cnx.execute("INSERT INTO kb_fts(kb_fts) VALUES ('optimize')")
+    print(f"ingest: {total} chunks ({removed} replaced) in {dt:.2f}s, {total / dt if dt else 0:.0f} chunks/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# scripts/refresh_facets.py
+"""
+Listing facets (listing_facets: count / min / median / max price per city, type,
+purpose and bedroom bucket) — see facets.py.
+
+  python scripts/refresh_facets.py            # create table + triggers if missing, rebuild, then check
+  python scripts/refresh_facets.py --check    # compare with live aggregates only; exit 1 on drift
+
+Triggers keep the table exact during normal writes; rebuild after bulk loads
+that dropped them or after restoring an old copy. REALTY_DB selects the database.
+"""
+import argparse, os, sqlite3, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import facets
+
+DB = os.getenv("REALTY_DB", str(ROOT / "db" / "realty.db"))
+
+def check(cnx) -> int:
+    t0 = time.perf_counter()
+    problems = facets.check(cnx)
+    n = cnx.execute("SELECT COUNT(*) FROM listing_facets").fetchone()[0]
+    for p in problems[:20]: print(p)
+    if len(problems) > 20: print(f"... {len(problems) - 20} more")
+    print(f"check: {n} facets, {len(problems)} differences ({time.perf_counter() - t0:.2f}s)")
+    return 1 if problems else 0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--check", action="store_true", help="only compare with live aggregates")
+    args = ap.parse_args()
+    cnx = sqlite3.connect(DB, isolation_level=None)
+    cnx.execute("PRAGMA busy_timeout=5000")
+    if args.check:
+        try: sys.exit(check(cnx))
+        except sqlite3.OperationalError as e: sys.exit(f"listing_facets: {e} (run without --check)")
+    t0 = time.perf_counter()
+    cnx.execute("BEGIN IMMEDIATE")
+    try:
+        facets.ensure(cnx)   # creates, or replaces an older layout
+        n = facets.refresh(cnx)
+        cnx.execute("COMMIT")
+    except BaseException:
+        cnx.execute("ROLLBACK"); raise
+    print(f"refresh: {n} facets in {time.perf_counter() - t0:.2f}s")
+    sys.exit(check(cnx))
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,4 @@ import db
 txt = db.refresh_featured_summary()
 print("\n=== Featured summary written to KB (source=featured_rollup) ===\n")
 print(txt)
+print("\nRollup chunks:", ", ".join(f"{s}={n}" for s, n in db.rollup_counts().items()))
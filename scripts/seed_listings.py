@@ -3,8 +3,13 @@ import argparse
 import os
 import random
 import sqlite3
+import sys
 from datetime import datetime, timedelta, timezone
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from geo import CENTROIDS   # area centroids (lat/lon) shared with the app
+import facets
+
 DB_PATH = os.getenv("REALTY_DB", os.path.join("db", "realty.db"))
 
 CITIES = [
@@ -32,8 +37,8 @@ TYPE_IMAGE = {
     "apartment": "/static/img/apartment.jpg",
     "house": "/static/img/house.jpg",
     "land": "/static/img/land.jpg",
-    "townhouse": "/static/img/townhouse.jpg",
-    "commercial": "/static/img/commercial.jpg",
+    "townhouse": "/static/img/placeholder.jpg",
+    "commercial": "/static/img/placeholder.jpg",
 }
 
 AREA_ALIASES = {
@@ -70,6 +75,8 @@ STATUS_CHOICES = (
 # allowed categories per your investments.category CHECK
 ALLOWED_CATEGORIES = {"off_plan","land_bank","reit","flip","rental_yield","development","other"}
 
+GEO_JITTER_DEG = 0.012   # ~1.3 km spread of seeded listings around their area centroid
+
 # ---------- small utils ----------
 def choice_weighted(pairs):
     r = random.random()
@@ -193,6 +200,7 @@ def seed_properties(con, n=500):
     have_desc    = "description" in pcols
     have_created = "created_at" in pcols
     have_status  = "status" in pcols
+    have_geo     = "latitude" in pcols and "longitude" in pcols
 
     ids = []
 
@@ -228,6 +236,10 @@ def seed_properties(con, n=500):
             row["status"] = choice_weighted(STATUS_CHOICES)
         if have_created:
             row["created_at"] = (datetime.now(timezone.utc) - timedelta(days=random.randint(0, 180))).isoformat(timespec="seconds")
+        if have_geo and city in CENTROIDS:
+            _, lat, lon = CENTROIDS[city]
+            row["latitude"] = round(random.gauss(lat, GEO_JITTER_DEG), 6)
+            row["longitude"] = round(random.gauss(lon, GEO_JITTER_DEG), 6)
 
         pid = insert_row(con, "properties", row)
         ids.append((pid, ptype))
@@ -236,7 +248,7 @@ def seed_properties(con, n=500):
         try:
             insert_row(con, "property_media", {
                 "property_id": pid,
-                "url": TYPE_IMAGE.get(ptype, "/static/img/listing.jpg"),
+                "url": TYPE_IMAGE.get(ptype, "/static/img/placeholder.jpg"),
                 "is_primary": 1,
                 "kind": "image",
             })
@@ -390,22 +402,49 @@ def fast_pragmas(con):
     con.execute("PRAGMA temp_store=MEMORY;")
     con.execute("PRAGMA cache_size=-20000;")
 
+def backfill_geo(con):
+    """Seeded/demo DBs only: place listings without coordinates near their city's centroid."""
+    centroids = {k.lower(): v for k, v in CENTROIDS.items()}
+    rows = con.execute("SELECT property_id, city, district FROM properties WHERE latitude IS NULL OR longitude IS NULL").fetchall()
+    done = 0
+    for pid, city, district in rows:
+        hit = centroids.get((city or "").lower()) or centroids.get((district or "").lower())
+        if not hit: continue
+        rnd = random.Random(pid)   # stable per listing
+        con.execute("UPDATE properties SET latitude=?, longitude=? WHERE property_id=?",
+                    (round(rnd.gauss(hit[1], GEO_JITTER_DEG), 6), round(rnd.gauss(hit[2], GEO_JITTER_DEG), 6), pid))
+        done += 1
+    return done, len(rows)
+
 # ---------- main ----------
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--n", type=int, default=500, help="number of listings to seed")
     parser.add_argument("--no-invest", action="store_true", help="seed listings only (skip investments)")
+    parser.add_argument("--backfill-geo", action="store_true",
+                        help="only give existing listings without coordinates a position near their city centroid")
     args = parser.parse_args()
 
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     con = sqlite3.connect(DB_PATH)
     fast_pragmas(con)
 
+    if args.backfill_geo:
+        with con:
+            done, missing = backfill_geo(con)
+        print(f"✅ Coordinates set for {done} of {missing} listings without them.")
+        con.close()
+        return
+
     try:
         with con:
             ensure_extra_tables(con)
             seed_aliases(con)
+            # facet triggers re-aggregate a whole group per row: drop them, rebuild once afterwards
+            had_facets = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'listing_facets'").fetchone()
+            facets.drop(con)
             props = seed_properties(con, n=args.n)
+            if had_facets: facets.ensure(con)
             if not args.no_invest:
                 seed_investments(con, props)
 
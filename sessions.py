@@ -0,0 +1,122 @@
+# sessions.py
+"""
+Chat session filters (city/type/budget slots) keyed by the browser's session id.
+
+SessionStore keeps `Session` objects in a backend:
+  - MemoryBackend: per-process LRU with a sliding TTL (default).
+  - SQLiteBackend: write-through to `conversation_state`, keyed by the session's
+    open conversation, so filters survive restarts and every worker process sees
+    the same state.
+Pick one with REALTY_SESSION_BACKEND=memory|sqlite.
+"""
+import os, json, secrets, sqlite3, threading, time
+from collections import OrderedDict
+
+SESSION_TTL_S = float(os.getenv("REALTY_SESSION_TTL_S", str(6 * 3600)))   # idle time before a session is forgotten
+SESSION_MAX   = int(os.getenv("REALTY_SESSION_MAX", "10000"))              # in-memory sessions per process
+
+class Session:
+    __slots__ = ("sid", "slots", "conversation_id", "expires_at")
+    def __init__(self, sid: str, slots: dict | None = None, conversation_id: int | None = None, ttl: float = SESSION_TTL_S):
+        self.sid, self.slots, self.conversation_id = sid, slots if slots is not None else {}, conversation_id
+        self.expires_at = time.monotonic() + ttl
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = SESSION_MAX, ttl: float = SESSION_TTL_S):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = self.expirations = 0
+
+    def load(self, sid: str) -> Session | None:
+        with self._lock:
+            s = self._data.get(sid)
+            if s is None: return None
+            if s.expires_at <= time.monotonic():
+                del self._data[sid]; self.expirations += 1
+                return None
+            self._data.move_to_end(sid)
+            return s
+
+    def save(self, s: Session) -> None:
+        s.expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[s.sid] = s
+            self._data.move_to_end(s.sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False); self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self._data), "maxsize": self.maxsize, "ttl_s": self.ttl,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+class SQLiteBackend:
+    """State lives in conversation_state; a session without a conversation yet has nothing to persist."""
+    def __init__(self, pool, ttl: float = SESSION_TTL_S):
+        self.pool, self.ttl = pool, ttl
+        self.loads = self.saves = 0
+
+    def load(self, sid: str) -> Session | None:
+        self.loads += 1
+        try:
+            with self.pool.reader(row_factory=None) as cx:
+                row = cx.execute("""
+                    SELECT c.conversation_id, cs.slots_json
+                      FROM conversations c
+                      LEFT JOIN conversation_state cs ON cs.conversation_id = c.conversation_id
+                     WHERE c.session_id = ? AND c.status = 'open'
+                       AND COALESCE(cs.updated_at, c.started_at) >= datetime('now', ?)
+                     ORDER BY c.started_at DESC LIMIT 1""", (sid, f"-{int(self.ttl)} seconds")).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row: return None
+        try: slots = json.loads(row[1] or "{}")
+        except ValueError: slots = {}
+        return Session(sid, slots, row[0], self.ttl)
+
+    def save(self, s: Session) -> None:
+        if s.conversation_id is None: return
+        self.saves += 1
+        with self.pool.writer(row_factory=None) as cx:   # joins the request's transaction when nested
+            cx.execute("""
+                INSERT INTO conversation_state (conversation_id, slots_json) VALUES (?, ?)
+                ON CONFLICT(conversation_id) DO UPDATE SET slots_json = excluded.slots_json, updated_at = CURRENT_TIMESTAMP
+            """, (s.conversation_id, json.dumps(s.slots, ensure_ascii=False)))
+
+    def purge(self) -> int:
+        """Drop state rows idle longer than the TTL (the lookup already ignores them)."""
+        with self.pool.writer(row_factory=None) as cx:
+            return cx.execute("DELETE FROM conversation_state WHERE updated_at < datetime('now', ?)",
+                              (f"-{int(self.ttl)} seconds",)).rowcount
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "ttl_s": self.ttl, "loads": self.loads, "saves": self.saves}
+
+class SessionStore:
+    """Same calls app.py always used (new/get/set); values are the plain slot dicts."""
+    def __init__(self, backend):
+        self.backend = backend
+
+    def new(self) -> str:
+        sid = secrets.token_hex(8)
+        self.backend.save(Session(sid))
+        return sid
+
+    def get(self, sid: str, default=None) -> dict:
+        s = self.backend.load(sid) if sid else None
+        return s.slots if s is not None else (default or {})
+
+    def set(self, sid: str, slots: dict, conversation_id: int | None = None) -> None:
+        if conversation_id is None:
+            prev = self.backend.load(sid)
+            conversation_id = prev.conversation_id if prev else None
+        self.backend.save(Session(sid, slots, conversation_id, getattr(self.backend, "ttl", SESSION_TTL_S)))
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+def make_store(pool=None, backend: str | None = None) -> SessionStore:
+    kind = (backend or os.getenv("REALTY_SESSION_BACKEND", "memory")).lower()
+    if kind == "sqlite" and pool is not None:
+        return SessionStore(SQLiteBackend(pool))
+    return SessionStore(MemoryBackend())
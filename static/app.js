@@ -85,6 +85,7 @@
       const sub = it.subtitle || '';
       const price = (it.price_lkr != null) ? `LKR ${numberFmt(it.price_lkr)}` : (it.min_investment_lkr != null ? `Min LKR ${numberFmt(it.min_investment_lkr)}` : '');
       card.innerHTML = `
+        ${it.image ? `<img class="rn-card-img" src="${it.image}" alt="" loading="lazy" decoding="async">` : ''}
         <div class="rn-ttl">${it.title || 'Listing'}</div>
         ${sub ? `<div class="rn-sub">${sub}</div>` : ''}
         ${price ? `<div class="rn-price">${price}</div>` : ''}
@@ -115,7 +116,8 @@
     if (!reply) return setChips(['3BR apartments in Galle under 80M','Houses in Kandy under 100M','Show investment plans','Reset']);
 
     if (reply.type === 'cards') {
-      setChips(['Increase budget by 25%','Filter by 3+ bedrooms','Show investment plans','Reset']);
+      // a cursor means the server has another page ("show more" pages on from the session)
+      setChips([...(reply.cursor ? ['Show more'] : []), 'Increase budget by 25%','Filter by 3+ bedrooms','Show investment plans','Reset']);
       return;
     }
     if (reply.type === 'investments') {
@@ -132,7 +134,7 @@
 
   /* ---------- Message Flow ---------- */
   const renderReply = (reply) => {
-    // reply = { type: 'text'|'cards'|'investments', content?, items?, preface? }
+    // reply = { type: 'text'|'cards'|'investments', content?, items?, preface?, cursor? }
     if (!reply) return;
 
     if (reply.preface) {
@@ -198,15 +200,14 @@
     showTyping();
 
     try {
-      const res = await fetch('/api/chat', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: text, session_id: sessionId })
-      });
-      const data = await res.json();
-
+      const data = await chatStream(text);
       hideTyping();
-      renderReply(data.reply);
+      if (data.streamed) {
+        finishStreamBubble(data.streamed, data.reply);
+        suggestFor(data.reply);
+      } else {
+        renderReply(data.reply);
+      }
       // store session context if server returns it
       if (data.session) {
         try { localStorage.setItem('rn_last_session', JSON.stringify(data.session)); } catch {}
@@ -217,6 +218,57 @@
     }
   };
 
+  /* ---------- Streaming (SSE over fetch) ---------- */
+  // /api/chat/stream sends `session`, then `reply` right away (cards/canned text) or
+  // `token` events while the model writes, then the final `reply` and `done`.
+  const finishStreamBubble = (row, reply) => {
+    const bubble = row.querySelector('.rn-bubble');
+    if (bubble && reply && reply.content) bubble.innerHTML = escapeHtml(reply.content);
+    scrollToBottom();
+  };
+
+  const chatStream = async (text) => {
+    const body = JSON.stringify({ message: text, session_id: sessionId });
+    const res = await fetch('/api/chat/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+      body
+    });
+    if (!res.ok || !res.body || !res.body.getReader) {
+      // no streaming support: plain JSON endpoint
+      const r = await fetch('/api/chat', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body });
+      return r.json();
+    }
+    const out = { reply: null, session: null, streamed: null };
+    let streamedText = '';
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let cut;
+      while ((cut = buf.indexOf('\n\n')) >= 0) {
+        const raw = buf.slice(0, cut); buf = buf.slice(cut + 2);
+        let event = 'message', data = '';
+        raw.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        const payload = data ? JSON.parse(data) : {};
+        if (event === 'session') out.session = payload.session;
+        else if (event === 'token') {
+          if (!out.streamed) { hideTyping(); out.streamed = makeBubble('bot', ''); }
+          streamedText += payload.text || '';
+          out.streamed.querySelector('.rn-bubble').innerHTML = escapeHtml(streamedText);
+          scrollToBottom(false);
+        } else if (event === 'reply') out.reply = payload;
+      }
+    }
+    return out;
+  };
+
   /* ---------- Open / Close ---------- */
   const openChat = () => {
     elChat.classList.remove('hidden');
@@ -0,0 +1,217 @@
+# telemetry.py
+"""
+Background writer for chat telemetry (messages + msg_intents).
+
+Request threads only enqueue; one daemon thread drains the bounded queue and
+writes everything it collected in one IMMEDIATE transaction with executemany,
+every FLUSH_MS or BATCH items. Message ids are allocated inside that
+transaction, so intents can point at messages that were queued, not written.
+Messages still in flight are visible through `pending_messages()` so chat
+history reads its own writes.
+"""
+import atexit, datetime as dt, json, os, queue, sqlite3, threading, time
+
+FLUSH_MS  = int(os.getenv("REALTY_TELEMETRY_FLUSH_MS", "200"))
+BATCH     = int(os.getenv("REALTY_TELEMETRY_BATCH", "500"))
+QUEUE_MAX = int(os.getenv("REALTY_TELEMETRY_QUEUE", "10000"))
+PUT_WAIT_S = float(os.getenv("REALTY_TELEMETRY_PUT_WAIT_S", "0.5"))   # backpressure before dropping
+
+INTENT_COLUMNS = ("conversation_id", "message_id", "session_id", "name", "intent", "score", "confidence",
+                  "user_text", "slots_json", "reply_type", "result_count", "notes", "created_at")
+
+def _now() -> str:
+    # same text format as CURRENT_TIMESTAMP, taken at enqueue time
+    return dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class MessageRef:
+    """A queued message; `message_id` is set once the writer has allocated it."""
+    __slots__ = ("conversation_id", "role", "content", "model", "tokens", "created_at", "message_id")
+    def __init__(self, conversation_id, role, content, model=None, tokens=None):
+        self.conversation_id, self.role, self.content, self.model, self.tokens = conversation_id, role, content, model, tokens
+        self.created_at, self.message_id = _now(), None
+
+class _Intent:
+    __slots__ = ("conversation_id", "message", "fields", "created_at")
+    def __init__(self, conversation_id, message, fields):
+        self.conversation_id, self.message, self.fields, self.created_at = conversation_id, message, fields, _now()
+
+class TelemetryWriter:
+    def __init__(self, pool, flush_ms: int = FLUSH_MS, batch: int = BATCH, maxsize: int = QUEUE_MAX):
+        self.pool, self.flush_s, self.batch = pool, flush_ms / 1000.0, batch
+        self._q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._inflight: dict[int, list] = {}      # conversation_id -> MessageRefs not committed yet
+        self._intent_cols: set | None = None      # msg_intents columns (PRAGMA once)
+        self._thread = None
+        self._stats = {"enqueued": 0, "written_messages": 0, "written_intents": 0, "batches": 0,
+                       "dropped": 0, "errors": 0, "last_batch": 0, "last_flush_ms": 0.0}
+
+    # ---- producer side (request threads) ----
+    def message(self, conversation_id: int, role: str, content: str, model: str | None = None,
+                tokens: int | None = None) -> MessageRef:
+        ref = MessageRef(conversation_id, role, content, model, tokens)
+        with self._lock:
+            self._inflight.setdefault(conversation_id, []).append(ref)
+        if not self._put(ref):
+            self._forget([ref])
+        return ref
+
+    def intent(self, conversation_id: int, message, **fields) -> None:
+        """`message` is a MessageRef or a plain message_id."""
+        self._put(_Intent(conversation_id, message, fields))
+
+    def pending_messages(self, conversation_id: int) -> list[MessageRef]:
+        with self._lock:
+            return list(self._inflight.get(conversation_id, ()))
+
+    def _put(self, item) -> bool:
+        self._ensure_thread()
+        try:
+            self._q.put(item, timeout=PUT_WAIT_S)
+        except queue.Full:
+            with self._lock: self._stats["dropped"] += 1
+            return False
+        with self._lock: self._stats["enqueued"] += 1
+        return True
+
+    # ---- lifecycle ----
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+                    self._thread.start()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is committed (or `timeout` passes)."""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._q.unfinished_tasks == 0:
+                return True
+            time.sleep(0.005)
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, queued=self._q.qsize(), maxsize=self._q.maxsize)
+
+    # ---- writer thread ----
+    def _run(self):
+        while True:
+            items = [self._q.get()]
+            deadline = time.monotonic() + self.flush_s
+            while len(items) < self.batch:
+                left = deadline - time.monotonic()
+                if left <= 0: break
+                try: items.append(self._q.get(timeout=left))
+                except queue.Empty: break
+            try:
+                self._write_or_split(items)
+            finally:
+                for _ in items: self._q.task_done()
+
+    def _write_or_split(self, items: list, retries: int = 3) -> None:
+        try:
+            self._write(items)
+            return
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e) and retries:
+                time.sleep(self.flush_s)   # a request holds the write lock past busy_timeout
+                return self._write_or_split(items, retries - 1)
+            err = e
+        except sqlite3.IntegrityError as e:
+            if len(items) > 1:
+                # one bad row (e.g. its conversation was rolled back) must not sink the batch
+                for item in items: self._write_or_split([item])
+                return
+            err = e
+        except Exception as e:
+            err = e
+        with self._lock: self._stats["errors"] += 1
+        self._forget([i for i in items if isinstance(i, MessageRef)])
+        print("telemetry warning:", err)
+
+    def _columns(self, cx) -> set:
+        if self._intent_cols is None:
+            self._intent_cols = {r[1] for r in cx.execute("PRAGMA table_info(msg_intents)")}
+        return self._intent_cols
+
+    def _write(self, items: list) -> None:
+        t0 = time.perf_counter()
+        msgs = [i for i in items if isinstance(i, MessageRef)]
+        intents = [i for i in items if isinstance(i, _Intent)]
+        try:
+            with self.pool.writer(row_factory=None) as cx:
+                cx.execute("BEGIN IMMEDIATE")   # no other writer between MAX() and the inserts
+                if msgs:
+                    next_id = (cx.execute("SELECT MAX(message_id) FROM messages").fetchone()[0] or 0) + 1
+                    for ref in msgs:
+                        ref.message_id, next_id = next_id, next_id + 1
+                    cx.executemany(
+                        "INSERT INTO messages(message_id, conversation_id, role, content, model, tokens, created_at) VALUES (?,?,?,?,?,?,?)",
+                        [(m.message_id, m.conversation_id, m.role, m.content, m.model, m.tokens, m.created_at) for m in msgs])
+                if intents:
+                    self._write_intents(cx, intents)
+        except Exception:
+            for ref in msgs: ref.message_id = None   # rolled back
+            raise
+        self._forget(msgs)
+        with self._lock:
+            s = self._stats
+            s["written_messages"] += len(msgs); s["written_intents"] += len(intents); s["batches"] += 1
+            s["last_batch"] = len(items); s["last_flush_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    def _write_intents(self, cx, intents: list) -> None:
+        cols = [c for c in INTENT_COLUMNS if c in self._columns(cx)]
+        if not cols:
+            return
+        sessions = {}
+        if "session_id" in cols:
+            conv_ids = sorted({i.conversation_id for i in intents})
+            qs = ",".join("?" * len(conv_ids))
+            sessions = dict(cx.execute(
+                f"SELECT conversation_id, session_id FROM conversations WHERE conversation_id IN ({qs})", conv_ids))
+        rows = []
+        for i in intents:
+            f, score = i.fields, float(i.fields.get("score") or 0.0)
+            mid = i.message.message_id if isinstance(i.message, MessageRef) else i.message
+            if mid is None:
+                continue   # its message was dropped
+            row = {"conversation_id": i.conversation_id, "message_id": mid, "session_id": sessions.get(i.conversation_id) or "unknown",
+                   "name": f.get("name"), "intent": f.get("name"), "score": score, "confidence": score,
+                   "user_text": f.get("user_text") or "", "slots_json": json.dumps(f.get("slots") or {}, ensure_ascii=False),
+                   "reply_type": f.get("reply_type"), "result_count": f.get("result_count"), "notes": f.get("notes"),
+                   "created_at": i.created_at}
+            rows.append(tuple(row[c] for c in cols))
+        try:
+            cx.executemany(f"INSERT INTO msg_intents({','.join(cols)}) VALUES({','.join('?' * len(cols))})", rows)
+        except sqlite3.OperationalError:
+            self._intent_cols = None   # schema changed under us: re-read columns on the next batch
+            raise
+
+    def _forget(self, refs: list) -> None:
+        if not refs: return
+        with self._lock:
+            for ref in refs:
+                lst = self._inflight.get(ref.conversation_id)
+                if lst is None: continue
+                try: lst.remove(ref)
+                except ValueError: pass
+                if not lst: del self._inflight[ref.conversation_id]
+
+_WRITERS: dict[int, TelemetryWriter] = {}
+_WRITERS_LOCK = threading.Lock()
+
+def writer(pool) -> TelemetryWriter:
+    with _WRITERS_LOCK:
+        w = _WRITERS.get(id(pool))
+        if w is None:
+            w = _WRITERS[id(pool)] = TelemetryWriter(pool)
+        return w
+
+@atexit.register
+def _flush_all():
+    for w in list(_WRITERS.values()):
+        w.flush(timeout=10.0)
@@ -0,0 +1,113 @@
+# tools/fake_llm.py
+"""
+Local stand-in for the OpenAI chat completions API (streaming and non-streaming),
+for exercising /api/chat and /api/chat/stream without a key or network.
+
+  python tools/fake_llm.py --port 8001 --ttft 0.4 --token-delay 0.03
+  OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python app.py
+
+GET /stats returns how many completions were requested (to check caching/coalescing).
+Faults for timeout/circuit-breaker tests: --fail-rate (HTTP 500s), --stall-rate/--stall-s
+(extra delay before the first token); POST /control {"ttft": 5, "fail_rate": 0.5, ...}
+changes any of them while the server runs.
+"""
+import argparse, json, random, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARGS = None
+COUNTS = {"completions": 0, "streams": 0}
+_count_lock = threading.Lock()
+
+def _answer(messages: list) -> str:
+    last = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    has_ctx = any("Database context" in (m.get("content") or "") for m in messages if m.get("role") == "system")
+    return (f"(stub) You asked: “{last[:120]}”. "
+            + ("I found a few listings in our database that may fit. " if has_ctx else "")
+            + "Tell me a city, property type and budget and I’ll narrow it down.")
+
+class Server(ThreadingHTTPServer):
+    request_queue_size = 2048   # many concurrent chats connect at once
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not ARGS.quiet: super().handle_error(request, client_address)   # clients that timed out and left
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        if not ARGS.quiet: super().log_message(fmt, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self.send_error(404); return
+        self._json(200, COUNTS)
+
+    def _json(self, status: int, obj) -> None:
+        out = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self.path.rstrip("/") == "/control":
+            for k in ("ttft", "token_delay", "fail_rate", "stall_rate", "stall_s"):
+                if k in body: setattr(ARGS, k, float(body[k]))
+            self._json(200, {k: getattr(ARGS, k) for k in ("ttft", "token_delay", "fail_rate", "stall_rate", "stall_s")})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404); return
+        model, text = body.get("model") or "stub", _answer(body.get("messages") or [])
+        cid, created = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time())
+        with _count_lock: COUNTS["streams" if body.get("stream") else "completions"] += 1
+        if random.random() < ARGS.fail_rate:
+            self._json(500, {"error": {"message": "injected failure", "type": "server_error"}}); return
+        time.sleep(ARGS.ttft + (ARGS.stall_s if random.random() < ARGS.stall_rate else 0.0))
+        if not body.get("stream"):
+            time.sleep(ARGS.token_delay * len(text.split()))
+            self._json(200, {"id": cid, "object": "chat.completion", "created": created, "model": model,
+                             "choices": [{"index": 0, "finish_reason": "stop",
+                                          "message": {"role": "assistant", "content": text}}],
+                             "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": 0}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        def chunk(delta, finish=None):
+            data = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode()); self.wfile.flush()
+        try:
+            chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(text.split(" ")):
+                chunk({"content": word if i == 0 else " " + word})
+                time.sleep(ARGS.token_delay)
+            chunk({}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n"); self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+def main():
+    global ARGS
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--ttft", type=float, default=0.4, help="seconds before the first token")
+    ap.add_argument("--token-delay", type=float, default=0.03, help="seconds between streamed words")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    ap.add_argument("--stall-rate", type=float, default=0.0, help="share of requests delayed by --stall-s")
+    ap.add_argument("--stall-s", type=float, default=10.0)
+    ap.add_argument("--quiet", action="store_true")
+    ARGS = ap.parse_args()
+    print(f"fake LLM on http://{ARGS.host}:{ARGS.port}/v1")
+    Server((ARGS.host, ARGS.port), Handler).serve_forever()
+
+if __name__ == "__main__":
+    main()